@@ -0,0 +1,51 @@
+'''Compare decoding and processing cached payloads inline against a process pool.
+
+Run from magic_formula_digest/: python -m benchmarks.bench_parallel_processor --tickers 2000 --days 1000
+
+Timings include starting the worker processes (a second or two, since they are
+spawned), so use a universe large enough for that to amortize. process_many
+caps the workers at the CPU count and stays inline for batches under two
+chunks per worker, so on a one-CPU host every row measures the inline path.
+'''
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+from benchmarks.synthetic import stock_payloads, tickers
+from utils.api_client import ALPHA_VANTAGE_URL
+from utils.http_cache import ResponseCache, cache_key
+from utils.parallel_processor import process_many
+from utils.stock_client import iter_cached_raw_payloads, request_params
+
+def fill_cache(cache: ResponseCache, tickers: int, days: int):
+    for ticker, overview, time_series in stock_payloads(tickers, days):
+        cache.set(cache_key(ALPHA_VANTAGE_URL, request_params('OVERVIEW', ticker)), overview, ttl=3600)
+        cache.set(cache_key(ALPHA_VANTAGE_URL, request_params('TIME_SERIES_DAILY', ticker, outputsize='full')), time_series, ttl=3600)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--tickers', type=int, default=2000)
+    parser.add_argument('--days', type=int, default=1000, help='Daily bars per ticker; a full backfill is ~6000')
+    parser.add_argument('--chunk-size', type=int, default=100)
+    parser.add_argument('--workers', type=int, nargs='*', default=sorted({1, 2, 4, os.cpu_count() or 1}))
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ResponseCache(str(Path(tmp) / 'http_cache.db'), max_bytes=1 << 40)
+        fill_cache(cache, args.tickers, args.days)
+        # Read the blobs once so every run measures decoding and processing only
+        payloads = list(iter_cached_raw_payloads(tickers(args.tickers), cache))
+
+        print(f'{args.tickers} tickers x {args.days} days, {os.cpu_count()} CPUs (workers above that run as {os.cpu_count()})')
+        baseline = None
+        for workers in args.workers:
+            start = time.perf_counter()
+            processed = sum(len(ranked) for _, ranked, _ in process_many(payloads, workers=workers, chunk_size=args.chunk_size))
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f'workers={workers:<3} {elapsed:7.2f}s  {args.tickers / elapsed:9.0f} tickers/s  speedup {baseline / elapsed:4.2f}x  ({processed} ranked)')
+        cache.close()
+
+if __name__ == '__main__':
+    main()
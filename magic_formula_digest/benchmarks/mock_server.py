@@ -0,0 +1,99 @@
+'''Local stand-in for the Alpha Vantage and NewsAPI endpoints, serving synthetic payloads.
+
+Run from magic_formula_digest/ with: python -m benchmarks.mock_server --port 8765
+then point the app at it with ALPHA_VANTAGE_URL and NEWS_API_URL as printed.
+'''
+import argparse
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import threading
+from urllib.parse import parse_qsl, urlsplit
+from benchmarks import synthetic
+
+COMPACT_DAYS = 100
+
+class MockAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive, like the real APIs
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query))
+        payload = self.server.payload(url.path, params)
+        body = json.dumps(payload).encode() if payload is not None else b'{}'
+        self.send_response(200 if payload is not None else 404)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+class MockAPIServer(ThreadingHTTPServer):
+    '''Serve /query (OVERVIEW, TIME_SERIES_DAILY) and /v2/everything from a background thread.
+
+    Every ticker's data is derived from its symbol, so repeated requests agree
+    with each other and with benchmarks.synthetic.stock_payloads.
+    '''
+    daemon_threads = True
+
+    def __init__(self, port: int = 0, days: int = 1000, seed: int = 0):
+        super().__init__(('127.0.0.1', port), MockAPIHandler)
+        self.days = days
+        self.seed = seed
+        self.requests = 0
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        return f'http://127.0.0.1:{self.server_port}'
+
+    @property
+    def alpha_vantage_url(self) -> str:
+        return f'{self.base_url}/query'
+
+    @property
+    def news_api_url(self) -> str:
+        return f'{self.base_url}/v2/everything'
+
+    def payload(self, path: str, params: dict):
+        self.requests += 1
+        if path == '/query':
+            ticker = params.get('symbol', '')
+            rng = synthetic.ticker_rng(ticker, self.seed)
+            overview = synthetic.overview(ticker, rng)
+            if params.get('function') == 'OVERVIEW':
+                return overview
+            if params.get('function') == 'TIME_SERIES_DAILY':
+                days = synthetic.trading_days(self.days)
+                # Generate the full history so compact output is its tail, as with the real API
+                time_series = synthetic.time_series(ticker, days, rng)
+                if params.get('outputsize', 'compact') == 'compact':
+                    bars = time_series['Time Series (Daily)']
+                    time_series['Time Series (Daily)'] = dict(list(bars.items())[:COMPACT_DAYS])
+                return time_series
+        elif path == '/v2/everything':
+            return synthetic.news(params.get('q', ''), synthetic.ticker_rng(params.get('q', ''), self.seed))
+        return None
+
+    def __enter__(self):
+        self.thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.shutdown()
+        self.server_close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--days', type=int, default=1000)
+    args = parser.parse_args()
+    server = MockAPIServer(args.port, args.days)
+    print(f'ALPHA_VANTAGE_URL={server.alpha_vantage_url}')
+    print(f'NEWS_API_URL={server.news_api_url}')
+    server.serve_forever()
+
+if __name__ == '__main__':
+    main()
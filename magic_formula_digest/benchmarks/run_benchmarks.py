@@ -0,0 +1,193 @@
+'''Time ingest, rank, DB query and render at several universe sizes against recorded baselines.
+
+Run from magic_formula_digest/:
+    python -m benchmarks.run_benchmarks                  # compare with benchmarks/baselines.json
+    python -m benchmarks.run_benchmarks --record         # re-record the baselines
+    python -m benchmarks.run_benchmarks --sizes 10 1000 --only rank render --check
+
+Everything runs against synthetic data in a temporary directory; ingest talks
+HTTP to a local mock of both APIs with rate limits lifted, so nothing here
+touches the real APIs or the data/ directory.
+'''
+import argparse
+from contextlib import ExitStack
+import json
+import os
+from pathlib import Path
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List
+from unittest.mock import patch
+from benchmarks import synthetic
+from benchmarks.mock_server import MockAPIServer
+from utils import api_client, news_client, stock_client
+from utils.db import open_db, replace_day_rankings
+from utils.digest import load_digest_data
+from utils.email_template import generate_email_content
+from utils.http_cache import ResponseCache
+from utils.news_client import fetch_news_many, store_news
+from utils.price_store import PriceStore
+from utils.processor import process_stock_data, rank_stocks
+from utils.rate_limiter import Quota, RateLimiter
+
+BASELINES = Path(__file__).with_name('baselines.json')
+SIZES = [10, 1000, 10000]
+BENCHMARKS = ['ingest', 'rank', 'db_query', 'render']
+UNLIMITED = Quota(requests_per_minute=10 ** 9, requests_per_day=10 ** 9)
+# Ratios to the baseline beyond which a result is reported as a change
+SLOWER, FASTER = 1.25, 0.8
+
+class Workspace:
+    '''Temporary data directory, a running mock API server, and per-size synthetic data built once.'''
+
+    def __init__(self, root: Path, days: int, history_days: int):
+        self.root = root
+        self.days = days
+        self.history_days = history_days
+        self.stack = ExitStack()
+        self.server = self.stack.enter_context(MockAPIServer(days=days))
+        self.cache = ResponseCache(str(root / 'http_cache.db'), max_bytes=1 << 40)
+        self.stack.callback(self.cache.close)
+        for target, name, value in [
+            (api_client, '_rate_limiter', RateLimiter({api_client.ALPHA_VANTAGE: UNLIMITED, api_client.NEWS_API: UNLIMITED})),
+            (api_client, '_response_cache', self.cache),
+            (stock_client, 'ALPHA_VANTAGE_URL', self.server.alpha_vantage_url),
+            (news_client, 'NEWS_API_URL', self.server.news_api_url),
+        ]:
+            self.stack.enter_context(patch.object(target, name, value))
+        self.stocks: Dict[int, Dict[str, Dict]] = {}
+        self.databases: Dict[int, str] = {}
+
+    def processed_stocks(self, n: int) -> Dict[str, Dict]:
+        if n not in self.stocks:
+            stocks = {}
+            for ticker, overview, time_series in synthetic.stock_payloads(n, days=2):
+                processed = process_stock_data(ticker, overview, time_series)
+                if processed:
+                    stocks[ticker] = processed
+            self.stocks[n] = stocks
+        return self.stocks[n]
+
+    def database(self, n: int) -> str:
+        '''A history.db with `history_days` days of rankings for `n` tickers and news for the top 10.'''
+        if n not in self.databases:
+            db_path = str(self.root / f'history_{n}.db')
+            ranked = rank_stocks(self.processed_stocks(n))
+            with open_db(db_path) as conn:
+                for day in synthetic.trading_days(self.history_days):
+                    date = day.strftime('%Y%m%d')
+                    # Rotate the order a little each day so top-10 streaks vary
+                    shift = day.toordinal() % 7
+                    replace_day_rankings(conn, date, [
+                        (date, stock['Ticker'], stock['EarningsYield'], stock['ROC'], (rank + shift) % len(ranked) + 1)
+                        for rank, stock in enumerate(ranked)
+                    ])
+                top = [stock['Ticker'] for stock in ranked[:10]]
+                store_news(conn, fetch_news_many(top), date)
+            self.databases[n] = db_path
+        return self.databases[n]
+
+    def close(self):
+        self.stack.close()
+
+def bench_ingest(ws: Workspace, n: int) -> Callable[[], object]:
+    '''Fetch both endpoints for `n` tickers over HTTP, merge prices and compute metrics.'''
+    ws.cache.clear()
+    price_store = PriceStore(str(ws.root / f'prices_{time.monotonic_ns()}'))
+    tickers = synthetic.tickers(n)
+
+    def run():
+        stocks = {}
+        for ticker, overview, time_series in stock_client.fetch_many(tickers, concurrency=8, price_store=price_store):
+            processed = process_stock_data(ticker, overview, time_series) if overview and time_series else None
+            if processed:
+                stocks[ticker] = processed
+        return stocks
+    return run
+
+def bench_rank(ws: Workspace, n: int) -> Callable[[], object]:
+    stocks = ws.processed_stocks(n)
+    return lambda: rank_stocks(stocks)
+
+def bench_db_query(ws: Workspace, n: int) -> Callable[[], object]:
+    db_path = ws.database(n)
+    return lambda: load_digest_data(db_path)
+
+def bench_render(ws: Workspace, n: int) -> Callable[[], object]:
+    digest = load_digest_data(ws.database(n))
+    return lambda: generate_email_content(digest)
+
+def measure(setup: Callable[[Workspace, int], Callable], ws: Workspace, n: int, repeat: int) -> float:
+    '''Median wall time of `repeat` runs, each with a fresh setup.'''
+    times = []
+    for _ in range(repeat):
+        run = setup(ws, n)
+        start = time.perf_counter()
+        run()
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+def machine() -> Dict:
+    return {'python': platform.python_version(), 'platform': platform.platform(), 'cpus': os.cpu_count()}
+
+def compare(results: Dict[str, Dict[str, float]], baselines: Dict[str, Dict[str, float]]) -> List[str]:
+    '''Print a results table next to the baselines; return the benchmarks that got slower.'''
+    regressions = []
+    print(f'{"benchmark":<10} {"tickers":>8} {"seconds":>10} {"baseline":>10} {"ratio":>7}')
+    for name, sizes in results.items():
+        for size, seconds in sizes.items():
+            baseline = baselines.get(name, {}).get(size)
+            if baseline:
+                ratio = seconds / baseline
+                flag = 'slower' if ratio > SLOWER else 'faster' if ratio < FASTER else ''
+                if flag == 'slower':
+                    regressions.append(f'{name}[{size}]')
+                print(f'{name:<10} {size:>8} {seconds:>10.4f} {baseline:>10.4f} {ratio:>6.2f}x {flag}')
+            else:
+                print(f'{name:<10} {size:>8} {seconds:>10.4f} {"-":>10}')
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--only', nargs='+', choices=BENCHMARKS, default=BENCHMARKS)
+    parser.add_argument('--days', type=int, default=100, help='Daily bars served per ticker')
+    parser.add_argument('--history-days', type=int, default=30, help='Days of stored rankings for db_query and render')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--record', action='store_true', help='Write the results to benchmarks/baselines.json')
+    parser.add_argument('--check', action='store_true', help='Exit non-zero if anything is slower than its baseline')
+    args = parser.parse_args()
+
+    recorded = json.loads(BASELINES.read_text()) if BASELINES.exists() else {}
+    results: Dict[str, Dict[str, float]] = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        ws = Workspace(Path(tmp), args.days, args.history_days)
+        try:
+            for name in args.only:
+                setup = globals()[f'bench_{name}']
+                for size in args.sizes:
+                    results.setdefault(name, {})[str(size)] = measure(setup, ws, size, args.repeat)
+        finally:
+            ws.close()
+
+    regressions = compare(results, recorded.get('results', {}))
+    if args.record:
+        merged = recorded.get('results', {})
+        for name, sizes in results.items():
+            merged.setdefault(name, {}).update({size: round(seconds, 5) for size, seconds in sizes.items()})
+        BASELINES.write_text(json.dumps({
+            'machine': machine(),
+            'days': args.days,
+            'history_days': args.history_days,
+            'results': merged,
+        }, indent=2) + '\n')
+        print(f'Recorded baselines to {BASELINES}')
+    elif args.check and regressions:
+        print(f'Slower than baseline: {", ".join(regressions)}')
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+from datetime import date, timedelta
+import random
+from typing import Dict, Iterator, List
+
+def tickers(n: int) -> List[str]:
+    '''`n` distinct made-up ticker symbols (AAAA, AAAB, ...).'''
+    symbols = []
+    for i in range(n):
+        symbol = ''
+        for _ in range(4):
+            i, letter = divmod(i, 26)
+            symbol = chr(ord('A') + letter) + symbol
+        symbols.append(symbol)
+    return symbols
+
+def trading_days(days: int, end: date = date(2025, 6, 30)) -> List[date]:
+    '''The last `days` weekdays up to `end`, oldest first.'''
+    result = []
+    day = end
+    while len(result) < days:
+        if day.weekday() < 5:
+            result.append(day)
+        day -= timedelta(days=1)
+    return result[::-1]
+
+def overview(ticker: str, rng: random.Random) -> Dict:
+    '''An Alpha Vantage OVERVIEW payload with the fields the digest uses and typical filler.'''
+    enterprise_value = rng.uniform(5e8, 2e12)
+    ebit = enterprise_value * rng.uniform(-0.05, 0.2)
+    payload = {
+        'Symbol': ticker,
+        'AssetType': 'Common Stock',
+        'Name': f'{ticker} Holdings Inc',
+        'Description': ' '.join(rng.choice(['global', 'leading', 'provider', 'solutions', 'products', 'services']) for _ in range(60)),
+        'Exchange': rng.choice(['NYSE', 'NASDAQ']),
+        'Currency': 'USD',
+        'Sector': rng.choice(['TECHNOLOGY', 'ENERGY', 'HEALTHCARE', 'FINANCE']),
+        'MarketCapitalization': str(int(enterprise_value * rng.uniform(0.7, 1.1))),
+        'EBIT': str(int(ebit)),
+        'EnterpriseValue': str(int(enterprise_value)),
+        'NetFixedAssets': str(int(enterprise_value * rng.uniform(0.05, 0.5))),
+        'WorkingCapital': str(int(enterprise_value * rng.uniform(-0.02, 0.2))),
+    }
+    # Pad with the many other numeric fields a real OVERVIEW carries
+    payload.update({f'Field{i}': f'{rng.uniform(-100, 100):.4f}' for i in range(40)})
+    return payload
+
+def time_series(ticker: str, days: List[date], rng: random.Random) -> Dict:
+    '''A TIME_SERIES_DAILY payload over `days`, newest bar first like Alpha Vantage returns it.'''
+    close = rng.uniform(5, 500)
+    bars = {}
+    for day in days:
+        close *= 1 + rng.gauss(0, 0.02)
+        bars[day.isoformat()] = {
+            '1. open': f'{close * rng.uniform(0.99, 1.01):.4f}',
+            '2. high': f'{close * 1.02:.4f}',
+            '3. low': f'{close * 0.98:.4f}',
+            '4. close': f'{close:.4f}',
+            '5. volume': str(rng.randint(10_000, 50_000_000)),
+        }
+    return {
+        'Meta Data': {'1. Information': 'Daily Prices', '2. Symbol': ticker},
+        'Time Series (Daily)': dict(reversed(bars.items())),
+    }
+
+NEWS_SOURCES = ['Bloomberg', 'Reuters', 'CNBC', 'MarketWatch']
+
+def news(ticker: str, rng: random.Random, articles: int = 20) -> Dict:
+    '''A NewsAPI /v2/everything payload. Some URLs are shared across tickers, as with real market roundups.'''
+    return {
+        'status': 'ok',
+        'totalResults': articles,
+        'articles': [
+            {
+                'source': {'id': None, 'name': rng.choice(NEWS_SOURCES)},
+                'author': 'Staff',
+                'title': f'{ticker} {rng.choice(["rallies", "slips", "reports earnings", "announces buyback"])} #{i}',
+                'description': ' '.join(rng.choice(['shares', 'market', 'quarter', 'guidance', 'analysts']) for _ in range(30)),
+                'url': (
+                    f'https://news.example.com/markets/roundup-{rng.randint(0, 50)}'
+                    if rng.random() < 0.1 else f'https://news.example.com/{ticker.lower()}/{i}'
+                ),
+                'publishedAt': f'2025-06-{rng.randint(1, 30):02d}T{rng.randint(0, 23):02d}:00:00Z',
+                'content': 'Lorem ipsum ' * 20,
+            }
+            for i in range(articles)
+        ],
+    }
+
+def ticker_rng(ticker: str, seed: int = 0) -> random.Random:
+    '''A generator seeded by ticker, so a ticker's data is the same however it is requested.'''
+    return random.Random(f'{seed}:{ticker}')
+
+def stock_payloads(n: int, days: int = 100, seed: int = 0) -> Iterator[tuple]:
+    '''Yield (ticker, overview, time_series) for `n` tickers over `days` trading days.'''
+    calendar = trading_days(days)
+    for ticker in tickers(n):
+        rng = ticker_rng(ticker, seed)
+        yield ticker, overview(ticker, rng), time_series(ticker, calendar, rng)
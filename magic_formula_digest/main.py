@@ -1,18 +1,25 @@
 import logging
 import json
 import argparse
-from utils.stock_client import fetch_stock_data
-from utils.processor import process_stock_data, save_ranked_stocks
-from utils.news_client import fetch_news, save_news
+import pandas as pd
+from datetime import datetime
+from utils.stock_client import fetch_many, iter_cached_raw_payloads
+from utils.digest import DigestData, DigestStock, fetch_top_rankings
+from utils.processor import compute_earnings_yield, compute_roc, export_ranked_stocks, process_stock_data, save_ranked_stocks
+from utils.data_lake import DataLake
+from utils.db import DB_PATH, load_ticker_metrics, open_db, save_ticker_metrics
+from utils.news_client import fetch_news_many, news_frame, store_news, tickers_with_news
+from utils.parallel_processor import metrics_records, process_many
+from utils.pipeline import DONE, Pipeline, Stage
 from utils.email_sender import send_daily_digest, generate_email_content
-from utils.config import TO_EMAIL
+from utils.config import METRICS_DIR, MIN_MARKET_CAP, TO_EMAIL, UNIVERSE_CHUNK_SIZE
+from utils import instrumentation
+from utils.rate_limiter import QuotaExceededError
+from utils.universe import build_universe, iter_chunks, passes_market_cap
 
-# Configure logging
-logging.basicConfig(
-    filename="data/system.log",
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+FETCH_CONCURRENCY = 8
+DEFAULT_TICKERS = ["AAPL", "MSFT", "GOOGL", "AMZN", "TSLA"]
+STAGES = ["fetch", "rank", "news", "export", "email"]
 
 def load_mock_data():
     """Load mock data from test fixtures"""
@@ -28,9 +35,19 @@ def run_test_mode():
     
     # Load mock data
     stocks, news_data = load_mock_data()
-    
+    digest = DigestData(date=None, stocks=[
+        DigestStock(
+            ticker=ticker,
+            earnings_yield=compute_earnings_yield(stock["EBIT"], stock["EnterpriseValue"]),
+            roc=compute_roc(stock["EBIT"], stock["NetFixedAssets"], stock["WorkingCapital"]),
+            rank=stock["Rank"],
+            news=news_data.get(ticker, []),
+        )
+        for ticker, stock in stocks.items()
+    ])
+
     # Generate email content
-    subject, body = generate_email_content(stocks, news_data)
+    _, body = generate_email_content(digest)
     
     # Save test email output
     with open("tests/output/test_email.html", "w") as f:
@@ -39,58 +56,144 @@ def run_test_mode():
     logging.info("Test email saved to tests/output/test_email.html")
     return True
 
-def run_production_mode():
-    """Run the application in production mode"""
-    tickers = ["AAPL", "MSFT", "GOOGL", "AMZN", "TSLA"]
-    stocks = {}
-
-    # Fetch and process stock data
-    for ticker in tickers:
-        try:
-            overview, time_series = fetch_stock_data(ticker)
-            processed_data = process_stock_data(ticker, overview, time_series)
-            if processed_data:
-                stocks[ticker] = processed_data
-        except Exception as e:
-            logging.error(f"Failed to fetch or process data for {ticker}: {e}")
-
-    # Save ranked stocks
-    try:
-        save_ranked_stocks(stocks)
-        logging.info("Successfully saved ranked stocks.")
-    except Exception as e:
-        logging.error(f"Failed to save ranked stocks: {e}")
-
-    # Fetch news for top 10 stocks
-    top_tickers = [stock["Ticker"] for stock in sorted(stocks.values(), key=lambda x: x["Rank"])[:10]]
-    for ticker in top_tickers:
-        try:
-            news = fetch_news(ticker)
-            save_news(ticker, news)
-        except Exception as e:
-            logging.error(f"Failed to fetch or save news for {ticker}: {e}")
-
-    # Send daily digest email
+def fetch_stage(ctx, tickers, lake, rank_partial=False):
+    """Fetch and process stock data chunk by chunk, checkpointing each chunk's metrics.
+
+    A ticker is checkpointed once its data arrived (or it was screened out), so
+    failed fetches are retried when the run resumes. Running out of API quota
+    fails the stage, leaving the rest for the next run, unless `rank_partial`
+    asks to rank whatever was fetched so far.
+    """
+    done = ctx.completed_tickers()
+    remaining = [ticker for ticker in tickers if ticker not in done]
+
+    # Tickers whose payloads are still cached are decoded and processed across worker processes
+    cached = set()
+    payloads = iter_cached_raw_payloads(remaining)
+    for chunk_tickers, processed, metrics in process_many(payloads, chunk_size=UNIVERSE_CHUNK_SIZE, min_market_cap=MIN_MARKET_CAP, lake=lake, date=ctx.run_id):
+        with open_db(ctx.db_path) as conn:
+            save_ticker_metrics(conn, ctx.run_id, metrics_records(processed, metrics))
+            ctx.mark_tickers_done(chunk_tickers, conn)
+        cached.update(chunk_tickers)
+        instrumentation.count("tickers_processed", len(processed), source="cache")
+    remaining = [ticker for ticker in remaining if ticker not in cached]
+    logging.info(f"Processed {len(cached)} cached tickers, fetching {len(remaining)}, {len(done)} already done in this run")
     try:
-        if send_daily_digest(TO_EMAIL):
-            logging.info("Successfully sent daily digest email.")
-            return True
-        else:
-            logging.error("Failed to send daily digest email.")
-            return False
-    except Exception as e:
-        logging.error(f"Failed to send daily digest email: {e}")
-        return False
+        for chunk in iter_chunks(remaining, UNIVERSE_CHUNK_SIZE):
+            stocks, overviews, fetched = [], [], []
+            try:
+                # Handle each ticker as soon as it arrives so raw payloads are released immediately
+                for ticker, overview, time_series in fetch_many(chunk, concurrency=FETCH_CONCURRENCY):
+                    # Without both payloads the ticker stays unchecked and is fetched again on resume,
+                    # unless its market cap already rules it out
+                    if not overview:
+                        continue
+                    try:
+                        screened_out = not passes_market_cap(overview, MIN_MARKET_CAP)
+                        if not screened_out and not time_series:
+                            continue
+                        fetched.append(ticker)
+                        overviews.append(overview)
+                        if screened_out:
+                            continue
+                        processed_data = process_stock_data(ticker, overview, time_series)
+                        if processed_data:
+                            stocks.append(processed_data)
+                    except Exception as e:
+                        logging.error(f"Failed to fetch or process data for {ticker}: {e}")
+            finally:
+                # Checkpoint whatever arrived, even when the chunk was cut short.
+                # Naming the part after its first ticker keeps a resumed run from overwriting earlier parts.
+                if overviews:
+                    lake.append("overview", ctx.run_id, pd.DataFrame(overviews, dtype=str), part=chunk[0])
+                with open_db(ctx.db_path) as conn:
+                    save_ticker_metrics(conn, ctx.run_id, stocks)
+                    ctx.mark_tickers_done(fetched, conn)
+                instrumentation.count("tickers_processed", len(stocks), source="api")
+            logging.info(f"Fetched {len(fetched)} tickers in chunk starting at {chunk[0]}")
+    except QuotaExceededError as e:
+        if not rank_partial:
+            raise
+        logging.error(f"Stopped fetching stock data, ranking the stocks fetched so far: {e}")
+
+def rank_stage(ctx):
+    """Rank every stock checkpointed by the fetch stage into history.db, where news and the digest read the top stocks"""
+    with open_db(ctx.db_path) as conn:
+        stocks = load_ticker_metrics(conn, ctx.run_id)
+    save_ranked_stocks(stocks, db_path=ctx.db_path, date=ctx.run_id)
+    logging.info(f"Successfully saved {len(stocks)} ranked stocks.")
+
+def export_stage(ctx, lake):
+    """Write the day's full ranking to the data lake; nothing downstream waits for it"""
+    with open_db(ctx.db_path) as conn:
+        stocks = load_ticker_metrics(conn, ctx.run_id)
+    export_ranked_stocks(stocks, lake, date=ctx.run_id)
+
+def news_stage(ctx, lake):
+    """Fetch news for the top 10 stocks, skipping any already stored in this run"""
+    with open_db(ctx.db_path) as conn:
+        _, rows = fetch_top_rankings(conn, 10)
+        top_tickers = [row[0] for row in rows]
+        stored = tickers_with_news(conn, ctx.run_id, top_tickers)
+    news = fetch_news_many([ticker for ticker in top_tickers if ticker not in stored])
+    with open_db(ctx.db_path) as conn:
+        store_news(conn, news, ctx.run_id)
+        lake.write("news", ctx.run_id, news_frame(conn, ctx.run_id))
+
+def email_stage(ctx):
+    """Send the daily digest email"""
+    if not send_daily_digest(TO_EMAIL):
+        raise RuntimeError("Failed to send daily digest email")
+    logging.info("Successfully sent daily digest email.")
+
+def build_pipeline(tickers, lake, run_id, db_path=DB_PATH, rank_partial=False):
+    """The daily job as a DAG of checkpointed stages
+
+    News starts as soon as the ranking is in history.db, while the lake export
+    of the same ranking runs alongside it; the email only waits for news.
+    """
+    return Pipeline([
+        Stage("fetch", lambda ctx: fetch_stage(ctx, tickers, lake, rank_partial)),
+        Stage("rank", lambda ctx: rank_stage(ctx), depends_on=("fetch",)),
+        Stage("news", lambda ctx: news_stage(ctx, lake), depends_on=("rank",)),
+        Stage("export", lambda ctx: export_stage(ctx, lake), depends_on=("rank",)),
+        Stage("email", lambda ctx: email_stage(ctx), depends_on=("news",)),
+    ], run_id=run_id, db_path=db_path)
+
+def run_production_mode(universe=False, from_stage=None, rank_partial=False):
+    """Run the application in production mode, resuming today's run if it was interrupted"""
+    if universe:
+        tickers = build_universe()
+    else:
+        tickers = DEFAULT_TICKERS
+
+    pipeline = build_pipeline(tickers, DataLake(), run_id=datetime.now().strftime("%Y%m%d"), rank_partial=rank_partial)
+    statuses = pipeline.run(from_stage=from_stage)
+    return statuses["email"] == DONE
 
 def main():
     parser = argparse.ArgumentParser(description="Stock Analysis Tool")
     parser.add_argument("--test", action="store_true", help="Run in test mode using mock data")
+    parser.add_argument("--universe", action="store_true", help="Screen every active NYSE/NASDAQ stock instead of the default tickers")
+    parser.add_argument("--from-stage", choices=STAGES, help="Rerun today's job from this stage, even if it already finished")
+    parser.add_argument("--rank-partial", action="store_true", help="If the API quota runs out, rank the stocks fetched so far instead of stopping")
     args = parser.parse_args()
-    
-    if args.test:
-        return run_test_mode()
-    else:
-        return run_production_mode()
+
+    instrumentation.setup_logging()
+    date_str = datetime.now().strftime("%Y%m%d")
+    metrics = instrumentation.configure(
+        events_path=f"{METRICS_DIR}/run_{date_str}.jsonl",
+        prometheus_path=f"{METRICS_DIR}/magic_formula.prom",
+    )
+    try:
+        with instrumentation.span("run", mode="test" if args.test else "production", universe=args.universe):
+            if args.test:
+                return run_test_mode()
+            else:
+                return run_production_mode(universe=args.universe, from_stage=args.from_stage, rank_partial=args.rank_partial)
+    finally:
+        metrics.export()
+        metrics.close()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
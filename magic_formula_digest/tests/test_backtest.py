@@ -0,0 +1,98 @@
+import tempfile
+import unittest
+from pathlib import Path
+import numpy as np
+import pandas as pd
+from utils.backtest import forward_fill, load_backtest_data, rebalance_indices, run_backtest, sweep
+from utils.data_lake import DataLake
+from utils.db import open_db, replace_day_rankings
+from utils.price_store import PriceStore
+
+def time_series(closes):
+    '''TIME_SERIES_DAILY payload, newest bar first like Alpha Vantage returns it.'''
+    bars = {
+        day: {'1. open': str(close), '2. high': str(close), '3. low': str(close), '4. close': str(close), '5. volume': '1000'}
+        for day, close in sorted(closes.items(), reverse=True)
+    }
+    return {'Meta Data': {}, 'Time Series (Daily)': bars}
+
+class TestBacktest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = str(Path(self.tmp.name) / 'history.db')
+        self.store = PriceStore(str(Path(self.tmp.name) / 'prices'))
+
+        days = ['2025-01-30', '2025-01-31', '2025-02-03', '2025-02-04', '2025-03-03']
+        closes = {
+            'AAPL': [100, 110, 120, 120, 132],
+            'MSFT': [50, 50, 25, 25, 50],
+            'TSLA': [10, 10, 10, 20, 20],
+        }
+        for ticker, values in closes.items():
+            self.store.merge(ticker, time_series(dict(zip(days, map(float, values)))))
+
+        with open_db(self.db_path) as conn:
+            replace_day_rankings(conn, '20250130', [
+                ('20250130', 'AAPL', 0.2, 0.3, 1),
+                ('20250130', 'MSFT', 0.1, 0.2, 2),
+                ('20250130', 'TSLA', 0.05, 0.1, 3),
+            ])
+            # February: TSLA jumps to first and AAPL drops out of the ranking entirely
+            replace_day_rankings(conn, '20250203', [
+                ('20250203', 'TSLA', 0.3, 0.5, 1),
+                ('20250203', 'MSFT', 0.1, 0.05, 2),
+            ])
+
+    def test_reads_rankings_from_the_lake(self):
+        lake = DataLake(str(Path(self.tmp.name) / 'lake'))
+        with open_db(self.db_path) as conn:
+            rows = pd.read_sql_query('SELECT * FROM stock_rankings', conn)
+        for date, day in rows.groupby('date'):
+            lake.write('rankings', date, day.drop(columns='date').rename(columns={'ticker': 'Ticker', 'earnings_yield': 'EarningsYield', 'roc': 'ROC', 'rank': 'Rank'}))
+        from_db = load_backtest_data(self.db_path, self.store)
+        from_lake = load_backtest_data(price_store=self.store, lake=lake)
+        self.assertEqual(from_lake.tickers, from_db.tickers)
+        np.testing.assert_array_equal(from_lake.ranks, from_db.ranks)
+        np.testing.assert_array_equal(from_lake.snapshot, from_db.snapshot)
+        self.assertEqual(run_backtest(from_lake, top_n=1).holdings, run_backtest(from_db, top_n=1).holdings)
+
+    def test_forward_fill(self):
+        values = np.array([[np.nan, 1.0], [2.0, np.nan], [np.nan, 3.0]])
+        filled = forward_fill(values)
+        self.assertTrue(np.isnan(filled[0, 0]))
+        self.assertEqual(filled[1:].tolist(), [[2.0, 1.0], [2.0, 3.0]])
+
+    def test_monthly_rebalance(self):
+        data = load_backtest_data(self.db_path, self.store)
+        self.assertEqual(data.dates.tolist(), [20250130, 20250131, 20250203, 20250204, 20250303])
+        self.assertEqual(rebalance_indices(data, 'monthly').tolist(), [0, 2, 4])
+        self.assertEqual(rebalance_indices(data, 'annual').tolist(), [0])
+
+        result = run_backtest(data, top_n=1, frequency='monthly')
+        self.assertEqual(result.rebalances, [20250130, 20250203, 20250303])
+        self.assertEqual(result.holdings, [['AAPL'], ['TSLA'], ['TSLA']])
+        # AAPL 100 -> 120 over January, then TSLA doubles in February
+        np.testing.assert_allclose(result.equity, [1.0, 1.1, 1.2, 2.4, 2.4])
+        self.assertAlmostEqual(result.stats['total_return'], 1.4)
+        self.assertAlmostEqual(result.stats['turnover'], 0.5)
+
+    def test_annual_rebalance_drifts_and_filters(self):
+        data = load_backtest_data(self.db_path, self.store)
+        result = run_backtest(data, top_n=2, frequency='annual')
+        self.assertEqual(result.holdings, [['AAPL', 'MSFT']])
+        # Equal weight at the start, then each position follows its own price
+        np.testing.assert_allclose(result.equity, [1.0, 1.05, 0.85, 0.85, 1.16])
+        self.assertAlmostEqual(result.stats['max_drawdown'], 1 - 0.85 / 1.05)
+
+        filtered = run_backtest(data, top_n=2, frequency='monthly', min_roc=0.25)
+        self.assertEqual(filtered.holdings, [['AAPL'], ['TSLA'], ['TSLA']])
+
+    def test_sweep(self):
+        data = load_backtest_data(self.db_path, self.store)
+        results = sweep(data, top_ns=(1, 2), frequencies=('monthly', 'annual'), filters={'none': {}, 'roc': {'min_roc': 0.25}})
+        self.assertEqual(len(results), 8)
+        self.assertIn('cagr', results.columns)
+
+if __name__ == '__main__':
+    unittest.main()
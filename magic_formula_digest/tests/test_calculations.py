@@ -1,7 +1,8 @@
 import unittest
 from unittest.mock import patch
-from utils.processor import calculate_earnings_yield, calculate_roc
-from utils.news_client import filter_news
+from utils import news_client
+from utils.news_client import fetch_news
+from utils.processor import compute_earnings_yield, compute_roc
 
 class TestCalculations(unittest.TestCase):
     def test_earnings_yield(self):
@@ -9,11 +10,11 @@ class TestCalculations(unittest.TestCase):
         ebit = 1000000
         enterprise_value = 5000000
         expected_yield = 0.2  # 20%
-        self.assertAlmostEqual(calculate_earnings_yield(ebit, enterprise_value), expected_yield)
+        self.assertAlmostEqual(compute_earnings_yield(ebit, enterprise_value), expected_yield)
 
-        # Test edge case with zero enterprise value
-        with self.assertRaises(ValueError):
-            calculate_earnings_yield(ebit, 0)
+        # Test edge cases with a zero or negative enterprise value
+        self.assertIsNone(compute_earnings_yield(ebit, 0))
+        self.assertIsNone(compute_earnings_yield(ebit, -1))
 
     def test_roc(self):
         # Test ROC calculation
@@ -21,33 +22,23 @@ class TestCalculations(unittest.TestCase):
         net_fixed_assets = 2000000
         working_capital = 500000
         expected_roc = 0.2  # 20%
-        self.assertAlmostEqual(calculate_roc(ebit, net_fixed_assets, working_capital), expected_roc)
+        self.assertAlmostEqual(compute_roc(ebit, net_fixed_assets, working_capital), expected_roc)
 
         # Test edge case with zero denominator
-        with self.assertRaises(ValueError):
-            calculate_roc(ebit, 0, 0)
+        self.assertIsNone(compute_roc(ebit, 0, 0))
 
-    def test_news_filtering(self):
-        # Test news filtering logic
-        test_articles = [
-            {"source": {"name": "CNN"}, "title": "Market Update"},
-            {"source": {"name": "Unknown Blog"}, "title": "Random Thoughts"},
-            {"source": {"name": "Reuters"}, "title": "Economic Report"},
-            {"source": {"name": "Bloomberg"}, "title": "Stock Analysis"},
-            {"source": {"name": "Random Site"}, "title": "Investment Tips"}
-        ]
-        
-        expected_filtered = [
-            {"source": {"name": "CNN"}, "title": "Market Update"},
-            {"source": {"name": "Reuters"}, "title": "Economic Report"},
-            {"source": {"name": "Bloomberg"}, "title": "Stock Analysis"}
-        ]
-        
-        filtered_articles = filter_news(test_articles)
-        self.assertEqual(filtered_articles, expected_filtered)
-        
-        # Test empty input
-        self.assertEqual(filter_news([]), [])
+    def test_news_sources(self):
+        # Outlets are restricted by the NewsAPI request itself
+        articles = [{"source": {"name": "Reuters"}, "title": "Economic Report"}]
+        with patch.object(news_client, 'get_json', return_value={"articles": articles}) as get_json:
+            self.assertEqual(fetch_news('AAPL', session=object()), articles)
+        params = get_json.call_args.args[2]
+        self.assertEqual(params['q'], 'AAPL')
+        self.assertEqual(params['sources'], 'bloomberg,reuters,cnbc,marketwatch')
+
+        # Test a request that returned nothing
+        with patch.object(news_client, 'get_json', return_value=None):
+            self.assertEqual(fetch_news('AAPL', session=object()), [])
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,45 @@
+import tempfile
+import unittest
+import pandas as pd
+from utils.data_lake import DataLake
+
+class TestDataLake(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.lake = DataLake(self.tmp.name)
+
+    def rankings(self, tickers):
+        return pd.DataFrame({
+            'Ticker': tickers,
+            'EarningsYield': [0.1 * (i + 1) for i in range(len(tickers))],
+            'Rank': list(range(1, len(tickers) + 1)),
+        })
+
+    def test_reads_selected_columns_and_dates(self):
+        self.lake.write('rankings', '20250101', self.rankings(['AAPL', 'MSFT']))
+        self.lake.write('rankings', '20250102', self.rankings(['MSFT', 'TSLA']))
+        self.lake.write('rankings', '20250103', self.rankings(['TSLA']))
+
+        frame = self.lake.read('rankings', columns=['Ticker', 'Rank'], start='20250102', end='20250103')
+        self.assertEqual(list(frame.columns), ['Ticker', 'Rank', 'date'])
+        self.assertEqual(frame['Ticker'].tolist(), ['MSFT', 'TSLA', 'TSLA'])
+        self.assertEqual(frame['date'].tolist(), ['20250102', '20250102', '20250103'])
+        self.assertEqual(self.lake.dates('rankings'), ['20250101', '20250102', '20250103'])
+
+    def test_write_replaces_partition_and_append_adds_parts(self):
+        self.lake.append('overview', '20250101', pd.DataFrame({'Symbol': ['AAPL']}), part='0')
+        self.lake.append('overview', '20250101', pd.DataFrame({'Symbol': ['MSFT'], 'EBIT': ['5']}), part='1')
+        frame = self.lake.read('overview')
+        self.assertEqual(frame['Symbol'].tolist(), ['AAPL', 'MSFT'])
+
+        self.lake.write('overview', '20250101', pd.DataFrame({'Symbol': ['GOOGL']}))
+        self.assertEqual(self.lake.read('overview')['Symbol'].tolist(), ['GOOGL'])
+
+    def test_missing_dataset(self):
+        frame = self.lake.read('news', columns=['ticker'])
+        self.assertTrue(frame.empty)
+        self.assertEqual(self.lake.dates('news'), [])
+
+if __name__ == "__main__":
+    unittest.main()
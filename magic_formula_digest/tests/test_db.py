@@ -0,0 +1,122 @@
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+from utils.db import RankingWriter, connect, load_top10_changes, open_db, rebuild_top10_streaks, replace_day_rankings
+
+class TestDatabase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = str(Path(self.tmp.name) / 'history.db')
+
+    def test_migrates_legacy_table(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('CREATE TABLE stock_rankings (date TEXT, ticker TEXT, earnings_yield REAL, roc REAL, rank INTEGER)')
+            conn.executemany('INSERT INTO stock_rankings VALUES (?, ?, ?, ?, ?)', [
+                ('20250101', 'AAPL', 0.1, 0.2, 2),
+                ('20250101', 'AAPL', 0.1, 0.2, 1),  # Same-day rerun
+                ('20250101', 'MSFT', 0.1, 0.2, 2),
+            ])
+        conn.close()
+
+        conn = connect(self.db_path)
+        self.assertEqual(conn.execute('PRAGMA journal_mode').fetchone()[0], 'wal')
+        rows = conn.execute('SELECT ticker, rank FROM stock_rankings ORDER BY ticker').fetchall()
+        self.assertEqual(rows, [('AAPL', 1), ('MSFT', 2)])
+        plan = ' '.join(row[-1] for row in conn.execute(
+            'EXPLAIN QUERY PLAN SELECT COUNT(*) FROM stock_rankings WHERE ticker = ? AND rank <= 10', ('AAPL',)
+        ))
+        self.assertIn('idx_stock_rankings_ticker_rank', plan)
+        conn.close()
+
+    def test_same_day_rerun_replaces_rows(self):
+        with open_db(self.db_path) as conn:
+            replace_day_rankings(conn, '20250101', [('20250101', 'AAPL', 0.1, 0.2, 1), ('20250101', 'TSLA', 0.1, 0.1, 2)])
+        with open_db(self.db_path) as conn:
+            replace_day_rankings(conn, '20250101', [('20250101', 'AAPL', 0.3, 0.2, 1), ('20250101', 'MSFT', 0.1, 0.2, 2)])
+            rows = conn.execute('SELECT ticker, earnings_yield FROM stock_rankings ORDER BY rank').fetchall()
+        self.assertEqual(rows, [('AAPL', 0.3), ('MSFT', 0.1)])
+
+    def test_ranking_writer_batches_one_transaction(self):
+        rows = [(f'2025{day:04d}', f'T{i}', 0.1, 0.2, i) for day in range(1, 11) for i in range(1, 101)]
+        with RankingWriter(self.db_path, batch_size=128) as writer:
+            writer.add_many(rows)
+        self.assertEqual(writer.rows_written, 1000)
+        with open_db(self.db_path) as conn:
+            self.assertEqual(conn.execute('SELECT COUNT(*) FROM stock_rankings').fetchone()[0], 1000)
+
+        with self.assertRaises(RuntimeError):
+            with RankingWriter(self.db_path, batch_size=10) as writer:
+                writer.add_many((f'2026{i:04d}', 'X', 0.1, 0.2, 1) for i in range(25))
+                raise RuntimeError('boom')
+        with open_db(self.db_path) as conn:
+            self.assertEqual(conn.execute('SELECT COUNT(*) FROM stock_rankings').fetchone()[0], 1000)
+
+class TestTop10Streaks(unittest.TestCase):
+    # Top-10 tickers per day; AAPL drops out on day 3 and comes back on day 4
+    DAYS = {
+        '20250101': ['AAPL', 'MSFT'],
+        '20250102': ['AAPL', 'MSFT', 'TSLA'],
+        '20250103': ['MSFT', 'TSLA'],
+        '20250106': ['AAPL', 'MSFT'],
+    }
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = str(Path(self.tmp.name) / 'history.db')
+
+    def rows(self, date, top):
+        # Every day also ranks a ticker outside the top 10
+        return [(date, ticker, 0.1, 0.2, rank) for rank, ticker in enumerate(top, start=1)] + [(date, 'NFLX', 0.1, 0.2, 11)]
+
+    def streaks(self, conn):
+        return conn.execute('SELECT ticker, top10_days, streak, last_top10_date FROM ticker_streaks ORDER BY ticker').fetchall()
+
+    def changes(self, conn):
+        return conn.execute('SELECT date, ticker, change FROM top10_changes ORDER BY date, ticker').fetchall()
+
+    def test_incremental_matches_rebuild(self):
+        with open_db(self.db_path) as conn:
+            for date, top in self.DAYS.items():
+                replace_day_rankings(conn, date, self.rows(date, top))
+            streaks, changes = self.streaks(conn), self.changes(conn)
+            rebuild_top10_streaks(conn)
+            self.assertEqual(self.streaks(conn), streaks)
+            self.assertEqual(self.changes(conn), changes)
+            self.assertEqual(load_top10_changes(conn, '20250106'), (['AAPL'], ['TSLA']))
+        self.assertEqual(streaks, [
+            ('AAPL', 3, 1, '20250106'),
+            ('MSFT', 4, 4, '20250106'),
+            ('TSLA', 2, 2, '20250103'),
+        ])
+
+    def test_same_day_rerun_counts_once(self):
+        with open_db(self.db_path) as conn:
+            replace_day_rankings(conn, '20250101', self.rows('20250101', ['AAPL', 'MSFT']))
+            replace_day_rankings(conn, '20250102', self.rows('20250102', ['AAPL', 'TSLA']))
+            replace_day_rankings(conn, '20250102', self.rows('20250102', ['MSFT', 'TSLA']))
+            self.assertEqual(self.streaks(conn), [
+                ('AAPL', 1, 1, '20250101'),
+                ('MSFT', 2, 2, '20250102'),
+                ('TSLA', 1, 1, '20250102'),
+            ])
+            self.assertEqual(load_top10_changes(conn, '20250102'), (['TSLA'], ['AAPL']))
+
+    def test_migration_backfills_history(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute('CREATE TABLE stock_rankings (date TEXT, ticker TEXT, earnings_yield REAL, roc REAL, rank INTEGER)')
+            for date, top in self.DAYS.items():
+                conn.executemany('INSERT INTO stock_rankings VALUES (?, ?, ?, ?, ?)', self.rows(date, top))
+        conn.close()
+
+        with open_db(self.db_path) as conn:
+            self.assertEqual(self.streaks(conn)[0], ('AAPL', 3, 1, '20250106'))
+            self.assertEqual(load_top10_changes(conn, '20250103'), ([], ['AAPL']))
+            # The next day continues from the backfilled state
+            replace_day_rankings(conn, '20250107', self.rows('20250107', ['AAPL']))
+            self.assertEqual(self.streaks(conn)[0], ('AAPL', 4, 2, '20250107'))
+
+if __name__ == "__main__":
+    unittest.main()
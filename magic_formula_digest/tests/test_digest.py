@@ -0,0 +1,66 @@
+import tempfile
+import unittest
+from pathlib import Path
+from utils.db import RankingWriter, open_db, replace_day_rankings
+from utils.digest import load_digest_data
+from utils.email_template import generate_email_content
+from utils.news_client import store_news
+
+class TestDigestData(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = str(Path(self.tmp.name) / 'history.db')
+        with RankingWriter(self.db_path) as writer:
+            # AAPL is top 10 on all three days, MSFT on two, TSLA drops out on the last day
+            writer.add_many([
+                ('20250101', 'AAPL', 0.2, 0.4, 1), ('20250101', 'TSLA', 0.1, 0.1, 2),
+                ('20250102', 'AAPL', 0.2, 0.4, 1), ('20250102', 'MSFT', 0.1, 0.3, 2),
+                ('20250103', 'MSFT', 0.3, 0.3, 1), ('20250103', 'AAPL', 0.2, 0.4, 2),
+                ('20250103', 'TSLA', 0.0, 0.1, 11),
+            ])
+        with open_db(self.db_path) as conn:
+            store_news(conn, {
+                'MSFT': [{'title': 'Microsoft Cloud Revenue Soars', 'source': {'name': 'Bloomberg'}, 'url': 'https://example.com/msft'}],
+                'OTHER': [{'title': 'Unrelated', 'source': {'name': 'Reuters'}, 'url': 'https://example.com/other'}],
+            }, date='20250103')
+
+    def test_assembles_latest_top_stocks(self):
+        digest = load_digest_data(self.db_path)
+        self.assertEqual(digest.date, '20250103')
+        self.assertEqual([stock.ticker for stock in digest.stocks], ['MSFT', 'AAPL', 'TSLA'])
+        self.assertEqual([stock.top10_days for stock in digest.stocks], [2, 3, 1])
+        self.assertEqual([stock.streak for stock in digest.stocks], [2, 3, 0])
+        self.assertEqual(digest.stocks[0].news[0]['source']['name'], 'Bloomberg')
+        self.assertEqual(digest.stocks[1].news, [])
+
+    def test_renders_without_io(self):
+        digest = load_digest_data(self.db_path)
+        text, html = generate_email_content(digest)
+        self.assertIn('Ranked top 10 for 3 days', text)
+        self.assertIn('href="https://example.com/msft"', html)
+
+    def test_loads_watchlist_stocks(self):
+        digest = load_digest_data(self.db_path, limit=1, watchlist_tickers=['TSLA', 'MSFT', 'NFLX'])
+        self.assertEqual([stock.ticker for stock in digest.stocks], ['MSFT'])
+        self.assertEqual(sorted(digest.watchlist), ['MSFT', 'TSLA'])
+        self.assertEqual(digest.watchlist['TSLA'].rank, 11)
+        self.assertEqual(digest.watchlist['TSLA'].top10_days, 1)
+        self.assertEqual(len(digest.watchlist['MSFT'].news), 1)
+
+    def test_top10_changes(self):
+        with open_db(self.db_path) as conn:
+            replace_day_rankings(conn, '20250106', [('20250106', 'TSLA', 0.1, 0.1, 1), ('20250106', 'AAPL', 0.2, 0.4, 12)])
+        digest = load_digest_data(self.db_path)
+        self.assertEqual((digest.entered, digest.dropped), (['TSLA'], ['AAPL', 'MSFT']))
+        text, html = generate_email_content(digest)
+        self.assertIn('New in the top 10: TSLA', text)
+        self.assertIn('<p>Dropped out of the top 10: AAPL, MSFT</p>', html)
+
+    def test_empty_database(self):
+        digest = load_digest_data(str(Path(self.tmp.name) / 'empty.db'))
+        self.assertIsNone(digest.date)
+        self.assertEqual(digest.stocks, [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import socketserver
+import threading
+import unittest
+from utils.email_sender import Mailer, build_message
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+    '''Just enough of an SMTP server to accept messages, in the spirit of aiosmtpd's Sink.'''
+
+    def reply(self, line):
+        self.wfile.write(f'{line}\r\n'.encode())
+
+    def handle(self):
+        server = self.server
+        server.connections += 1
+        self.reply('220 localhost stand-in SMTP')
+        recipients = []
+        while line := self.rfile.readline():
+            command = line.decode().strip()
+            verb = command.split(' ', 1)[0].upper()
+            if verb in ('EHLO', 'HELO'):
+                self.reply('250-localhost')
+                self.reply('250 AUTH PLAIN')
+            elif verb == 'AUTH':
+                server.logins += 1
+                self.reply('535 Authentication credentials invalid' if server.reject_logins else '235 Accepted')
+            elif verb == 'MAIL':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'RCPT':
+                recipient = command.split(':', 1)[1].strip('<> ')
+                if recipient in server.fail_once:
+                    server.fail_once.discard(recipient)
+                    self.reply('451 Try again later')
+                else:
+                    recipients.append(recipient)
+                    self.reply('250 OK')
+            elif verb == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                while self.rfile.readline() not in (b'.\r\n', b''):
+                    pass
+                server.delivered.extend(recipients)
+                self.reply('250 Queued')
+            elif verb == 'RSET':
+                recipients = []
+                self.reply('250 OK')
+            elif verb == 'QUIT':
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('250 OK')
+
+class StandInSMTPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.connections = 0
+        self.delivered = []
+        self.fail_once = set()
+        self.logins = 0
+        self.reject_logins = False
+
+class TestMailer(unittest.TestCase):
+    def setUp(self):
+        self.server = StandInSMTPServer()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        self.sleeps = []
+
+    def mailer(self):
+        host, port = self.server.server_address
+        return Mailer(host=host, port=port, user=None, password=None, use_ssl=False, retry_delay=5, sleep=self.sleeps.append)
+
+    def messages(self, recipients):
+        return [build_message(recipient, 'Digest', 'text', '<p>html</p>') for recipient in recipients]
+
+    def test_batch_uses_one_session(self):
+        recipients = [f'user{i}@example.com' for i in range(5)]
+        with self.mailer() as mailer:
+            results = mailer.send_batch(self.messages(recipients))
+        self.assertTrue(all(results.values()))
+        self.assertEqual(self.server.delivered, recipients)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_retry_does_not_hold_up_other_recipients(self):
+        self.server.fail_once.add('first@example.com')
+        with self.mailer() as mailer:
+            results = mailer.send_batch(self.messages(['first@example.com', 'second@example.com']))
+        self.assertEqual(results, {'first@example.com': True, 'second@example.com': True})
+        # The second recipient is delivered before the first one's retry comes due
+        self.assertEqual(self.server.delivered, ['second@example.com', 'first@example.com'])
+        self.assertEqual(len(self.sleeps), 1)
+
+    def test_gives_up_after_max_attempts(self):
+        host, port = self.server.server_address
+        self.server.server_close()  # Nothing listening any more
+        mailer = Mailer(host=host, port=port, user=None, password=None, use_ssl=False, max_attempts=2, sleep=self.sleeps.append)
+        results = mailer.send_batch(self.messages(['user@example.com']))
+        self.assertEqual(results, {'user@example.com': False})
+        self.assertEqual(len(self.sleeps), 1)
+
+    def test_bad_credentials_abort_the_batch(self):
+        self.server.reject_logins = True
+        host, port = self.server.server_address
+        recipients = [f'user{i}@example.com' for i in range(3)]
+        with Mailer(host=host, port=port, user='user', password='wrong', use_ssl=False, sleep=self.sleeps.append) as mailer:
+            results = mailer.send_batch(self.messages(recipients))
+        self.assertEqual(results, dict.fromkeys(recipients, False))
+        self.assertEqual(self.server.logins, 1)
+        self.assertEqual(self.server.delivered, [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+import unittest
+from unittest.mock import patch
+from utils import email_template
+from utils.digest import DigestData, DigestStock
+from utils.email_template import DigestRenderer, generate_email_content, safe_url
+
+class TestDigestRenderer(unittest.TestCase):
+    def setUp(self):
+        news = [{'title': 'Earnings <beat>', 'source': {'name': 'Reuters'}, 'url': 'https://example.com/a?x=1&y=2'}]
+        self.digest = DigestData(
+            date='20250103',
+            stocks=[DigestStock('MSFT', 0.3, 0.3, 1, 2, 2, news), DigestStock('AAPL', 0.2, 0.4, 2, 3, 1)],
+            watchlist={'TSLA': DigestStock('TSLA', 0.1, 0.1, 40), 'AAPL': DigestStock('AAPL', 0.2, 0.4, 2, 3)},
+        )
+
+    def test_renders_top_stocks_escaped(self):
+        text, html = generate_email_content(self.digest)
+        self.assertIn('Ranked top 10 for 3 days', text)
+        self.assertIn('Ranked top 10 for 2 days, the last 2 in a row', text)
+        self.assertNotIn('New in the top 10', text)
+        self.assertIn('- Earnings <beat> (Reuters)', text)
+        self.assertIn('Earnings &lt;beat&gt;', html)
+        self.assertIn('href="https://example.com/a?x=1&amp;y=2"', html)
+        self.assertNotIn('Your Watchlist', html)
+
+    def test_only_links_http_urls(self):
+        self.assertEqual(safe_url('HTTPS://example.com/a'), 'HTTPS://example.com/a')
+        self.assertEqual(safe_url('javascript:alert(1)'), '#')
+        self.digest.stocks[0].news[0]['url'] = 'javascript:alert(1)'
+        self.assertIn('<a href="#">Reuters</a>', generate_email_content(self.digest)[1])
+
+    def test_watchlists_share_rendered_rows(self):
+        renderer = DigestRenderer(self.digest)
+        with patch.object(email_template, 'render_stock', wraps=email_template.render_stock) as render_stock:
+            _, first = renderer.render(['TSLA', 'AAPL', 'NFLX'])
+            _, second = renderer.render(['TSLA'])
+        # TSLA's row is rendered once for both recipients; AAPL's was already rendered for the top section
+        self.assertEqual(render_stock.call_count, 1)
+        self.assertIn('Your Watchlist', first)
+        self.assertLess(first.index('<td>TSLA</td>'), first.rindex('<td>AAPL</td>'))
+        self.assertIn('Not ranked today: NFLX', first)
+        self.assertNotIn('Not ranked today', second)
+
+if __name__ == '__main__':
+    unittest.main()
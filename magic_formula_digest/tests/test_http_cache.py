@@ -0,0 +1,66 @@
+from datetime import datetime
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+from utils import http_cache
+from utils.http_cache import MARKET_TZ, ResponseCache, cache_key, seconds_until_market_close
+
+class TestResponseCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+
+    def test_round_trip_and_expiry(self):
+        cache = ResponseCache(f'{self.tmp.name}/cache.db')
+        cache.set('fresh', {'a': 1}, ttl=60)
+        cache.set('stale', {'b': 2}, ttl=-1)
+        self.assertEqual(cache.get('fresh'), {'a': 1})
+        self.assertIsNone(cache.get('stale'))
+        self.assertIsNone(cache.get('missing'))
+        cache.close()
+
+    def test_persists_across_instances(self):
+        path = f'{self.tmp.name}/cache.db'
+        cache = ResponseCache(path)
+        cache.set('key', {'a': 1}, ttl=60)
+        cache.close()
+        self.assertEqual(ResponseCache(path).get('key'), {'a': 1})
+
+    def test_evicts_least_recently_used(self):
+        cache = ResponseCache(f'{self.tmp.name}/cache.db', max_bytes=2000)
+        now = [1000.0]
+        with patch.object(http_cache.time, 'time', lambda: now[0]):
+            for i in range(20):
+                now[0] += 1
+                cache.set(f'key{i}', {'data': os.urandom(150).hex()}, ttl=3600)
+                if i > 0:
+                    cache.get('key0')  # Keep the first entry hot
+            self.assertIsNotNone(cache.get('key0'))
+            self.assertIsNone(cache.get('key1'))
+            self.assertIsNotNone(cache.get('key19'))
+        self.assertLessEqual(cache.total_bytes, 2000)
+        cache.close()
+
+class TestCacheKey(unittest.TestCase):
+    def test_ignores_credentials_and_order(self):
+        a = cache_key('url', {'function': 'OVERVIEW', 'symbol': 'AAPL', 'apikey': 'one'})
+        b = cache_key('url', {'symbol': 'AAPL', 'apikey': 'two', 'function': 'OVERVIEW'})
+        c = cache_key('url', {'function': 'OVERVIEW', 'symbol': 'MSFT', 'apikey': 'one'})
+        self.assertEqual(a, b)
+        self.assertNotEqual(a, c)
+
+class TestMarketClose(unittest.TestCase):
+    def test_before_and_after_close(self):
+        # Tuesday 2025-01-07
+        morning = datetime(2025, 1, 7, 10, 0, tzinfo=MARKET_TZ)
+        evening = datetime(2025, 1, 7, 18, 0, tzinfo=MARKET_TZ)
+        self.assertEqual(seconds_until_market_close(morning), 6 * 3600)
+        self.assertEqual(seconds_until_market_close(evening), 22 * 3600)
+
+    def test_skips_weekend(self):
+        friday_evening = datetime(2025, 1, 10, 17, 0, tzinfo=MARKET_TZ)
+        self.assertEqual(seconds_until_market_close(friday_evening), (2 * 24 + 23) * 3600)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+import json
+import logging
+import tempfile
+import unittest
+from pathlib import Path
+from utils.instrumentation import Instrumentation, setup_logging
+
+class TestInstrumentation(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.events_path = Path(self.tmp.name) / 'metrics' / 'run.jsonl'
+        self.prometheus_path = Path(self.tmp.name) / 'metrics' / 'digest.prom'
+        self.metrics = Instrumentation(str(self.events_path), str(self.prometheus_path))
+        self.addCleanup(self.metrics.close)
+
+    def events(self):
+        return [json.loads(line) for line in self.events_path.read_text().splitlines()]
+
+    def test_spans_nest_and_record_errors(self):
+        with self.metrics.span('stage', metric_labels={'stage': 'fetch'}, run_id='20250101'):
+            with self.metrics.span('ticker_fetch', ticker='AAPL') as attributes:
+                attributes['complete'] = True
+            with self.assertRaises(ValueError):
+                with self.metrics.span('ticker_fetch', ticker='MSFT'):
+                    raise ValueError('bad payload')
+
+        aapl, msft, stage = self.events()
+        self.assertEqual(stage['parent'], None)
+        self.assertEqual(aapl['parent'], stage['id'])
+        self.assertEqual((aapl['ticker'], aapl['complete'], aapl['status']), ('AAPL', True, 'ok'))
+        self.assertEqual((msft['status'], msft['error']), ('error', 'ValueError: bad payload'))
+        self.assertEqual(stage['stage'], 'fetch')
+        # Tickers are span attributes only, so the histogram has one series
+        snapshot = self.metrics.snapshot()
+        histograms = {(h['name'], tuple(h['labels'].items())): h['count'] for h in snapshot['histograms']}
+        self.assertEqual(histograms, {('stage_seconds', (('stage', 'fetch'),)): 1, ('ticker_fetch_seconds', ()): 2})
+
+    def test_prometheus_export(self):
+        self.metrics.count('api_requests', provider='news_api', status=200)
+        self.metrics.count('api_requests', 2, provider='news_api', status=200)
+        self.metrics.count('cache_hits', provider='alpha_vantage')
+        self.metrics.observe('api_request_seconds', 0.02, provider='news_api')
+        self.metrics.observe('api_request_seconds', 3, provider='news_api')
+        self.metrics.export()
+
+        text = self.prometheus_path.read_text()
+        self.assertIn('# TYPE magic_formula_api_requests_total counter', text)
+        self.assertIn('magic_formula_api_requests_total{provider="news_api",status="200"} 3', text)
+        self.assertIn('magic_formula_cache_hits_total{provider="alpha_vantage"} 1', text)
+        self.assertIn('magic_formula_api_request_seconds_bucket{provider="news_api",le="0.025"} 1', text)
+        self.assertIn('magic_formula_api_request_seconds_bucket{provider="news_api",le="+Inf"} 2', text)
+        self.assertIn('magic_formula_api_request_seconds_count{provider="news_api"} 2', text)
+        self.assertFalse(self.prometheus_path.with_suffix('.tmp').exists())
+
+        snapshot = self.events()[-1]
+        self.assertEqual(snapshot['type'], 'metrics')
+        self.assertEqual(snapshot['counters'][0], {'name': 'api_requests', 'labels': {'provider': 'news_api', 'status': '200'}, 'value': 3})
+
+    def test_setup_logging_routes_by_level(self):
+        root = logging.getLogger()
+        saved = (root.handlers[:], root.level)
+        log_path = Path(self.tmp.name) / 'system.log'
+        error_path = Path(self.tmp.name) / 'error.log'
+        try:
+            setup_logging(str(log_path), str(error_path))
+            setup_logging(str(log_path), str(error_path))  # Calling twice must not duplicate lines
+            logging.info('stage started')
+            logging.error('stage failed')
+            for handler in root.handlers:
+                handler.flush()
+        finally:
+            for handler in root.handlers:
+                handler.close()
+            root.handlers[:], root.level = saved
+        self.assertEqual(len(log_path.read_text().splitlines()), 2)
+        self.assertEqual(len(error_path.read_text().splitlines()), 1)
+        self.assertIn('stage failed', error_path.read_text())
+
+if __name__ == '__main__':
+    unittest.main()
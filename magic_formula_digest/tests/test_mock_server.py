@@ -0,0 +1,25 @@
+import unittest
+import requests
+from benchmarks import synthetic
+from benchmarks.mock_server import COMPACT_DAYS, MockAPIServer
+
+class TestMockServer(unittest.TestCase):
+    def test_serves_both_apis_consistently(self):
+        with MockAPIServer(days=150) as server:
+            overview = requests.get(server.alpha_vantage_url, params={'function': 'OVERVIEW', 'symbol': 'AAAB'}).json()
+            full = requests.get(server.alpha_vantage_url, params={'function': 'TIME_SERIES_DAILY', 'symbol': 'AAAB', 'outputsize': 'full'}).json()
+            compact = requests.get(server.alpha_vantage_url, params={'function': 'TIME_SERIES_DAILY', 'symbol': 'AAAB'}).json()
+            news = requests.get(server.news_api_url, params={'q': 'AAAB'}).json()
+            missing = requests.get(f'{server.base_url}/unknown')
+
+        _, expected_overview, expected_series = next(payload for payload in synthetic.stock_payloads(2, days=150) if payload[0] == 'AAAB')
+        self.assertEqual(overview, expected_overview)
+        self.assertEqual(full, expected_series)
+        bars = list(full['Time Series (Daily)'].items())
+        self.assertEqual(list(compact['Time Series (Daily)'].items()), bars[:COMPACT_DAYS])
+        self.assertEqual(news['status'], 'ok')
+        self.assertTrue(news['articles'][0]['url'].startswith('https://'))
+        self.assertEqual(missing.status_code, 404)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+from utils import news_client
+from utils.db import open_db
+from utils.news_client import dedupe_articles, fetch_news_many, load_news, store_news, tickers_with_news, url_hash
+
+def article(title, url, source='Reuters', published_at='2025-01-03T12:00:00Z'):
+    return {'title': title, 'url': url, 'source': {'name': source}, 'publishedAt': published_at}
+
+class TestNewsStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = str(Path(self.tmp.name) / 'history.db')
+
+    def test_url_hash_normalizes(self):
+        self.assertEqual(url_hash('https://Reuters.com/markets/apple/'), url_hash('https://reuters.com/markets/apple#top'))
+        self.assertNotEqual(url_hash('https://reuters.com/a'), url_hash('https://reuters.com/b'))
+
+    def test_dedupes_articles_shared_by_tickers(self):
+        shared = article('Big Tech Rally', 'https://reuters.com/big-tech')
+        news = {
+            'AAPL': [shared, article('Apple Earnings', 'https://reuters.com/apple')],
+            'MSFT': [dict(shared)],
+        }
+        articles, links = dedupe_articles(news)
+        self.assertEqual(len(articles), 2)
+        self.assertEqual(len(links), 3)
+
+        with open_db(self.db_path) as conn:
+            self.assertEqual(store_news(conn, news, date='20250103'), 3)
+            self.assertEqual(store_news(conn, news, date='20250103'), 0)  # Rerun stores nothing new
+            self.assertEqual(conn.execute('SELECT COUNT(*) FROM news_articles').fetchone()[0], 2)
+            loaded = load_news(conn, '20250103', ['AAPL', 'MSFT', 'TSLA'])
+            self.assertEqual(tickers_with_news(conn, '20250103', ['AAPL', 'TSLA']), {'AAPL'})
+        self.assertEqual(len(loaded['AAPL']), 2)
+        self.assertEqual(loaded['MSFT'][0]['title'], 'Big Tech Rally')
+        self.assertNotIn('TSLA', loaded)
+
+    def test_fetches_many_tickers(self):
+        with patch.object(news_client, 'fetch_news', lambda ticker, session: [article(ticker, f'https://x.com/{ticker}')]):
+            news = fetch_news_many(['AAPL', 'MSFT'], concurrency=2)
+        self.assertEqual(sorted(news), ['AAPL', 'MSFT'])
+
+if __name__ == "__main__":
+    unittest.main()
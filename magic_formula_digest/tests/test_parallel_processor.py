@@ -0,0 +1,88 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import numpy as np
+from utils.api_client import ALPHA_VANTAGE_URL
+from utils.data_lake import DataLake
+from utils.http_cache import ResponseCache, cache_key, encode_payload
+from utils import parallel_processor
+from utils.parallel_processor import METRIC_FIELDS, metrics_records, process_many
+from utils.price_store import PriceStore
+from utils.processor import process_stock_data
+from utils.stock_client import iter_cached_raw_payloads, request_params
+from benchmarks.synthetic import stock_payloads
+
+class TestParallelProcessor(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.cache = ResponseCache(str(Path(self.tmp.name) / 'http_cache.db'))
+        self.addCleanup(self.cache.close)
+        self.payloads = list(stock_payloads(12, days=5))
+        for ticker, overview, time_series in self.payloads:
+            self.cache.set(cache_key(ALPHA_VANTAGE_URL, request_params('OVERVIEW', ticker)), overview, ttl=60)
+            outputsize = 'compact' if ticker != 'AAAB' else 'full'
+            self.cache.set(cache_key(ALPHA_VANTAGE_URL, request_params('TIME_SERIES_DAILY', ticker, outputsize=outputsize)), time_series, ttl=60)
+        self.tickers = [ticker for ticker, _, _ in self.payloads]
+        self.price_store = PriceStore(str(Path(self.tmp.name) / 'prices'))
+
+    def test_reads_only_fully_cached_tickers(self):
+        raw = list(iter_cached_raw_payloads([*self.tickers, 'MISSING'], self.cache))
+        self.assertEqual([ticker for ticker, _, _ in raw], self.tickers)
+        self.assertIsInstance(raw[0][1], bytes)
+
+    def test_matches_inline_processing(self):
+        expected = {}
+        for ticker, overview, time_series in self.payloads:
+            processed = process_stock_data(ticker, overview, time_series)
+            if processed:
+                expected[ticker] = processed
+
+        # Pretend to have two CPUs so the pool is used even on a one-CPU host
+        for workers, chunk_size in ((1, 5), (2, 3)):
+            lake = DataLake(str(Path(self.tmp.name) / f'lake{workers}'))
+            raw = iter_cached_raw_payloads(self.tickers, self.cache)
+            with patch.object(parallel_processor.os, 'cpu_count', return_value=2):
+                results = list(process_many(raw, workers=workers, chunk_size=chunk_size, lake=lake, date='20250101', price_store=self.price_store))
+            expected_chunks = [self.tickers[start:start + chunk_size] for start in range(0, len(self.tickers), chunk_size)]
+            self.assertEqual([chunk for chunk, _, _ in results], expected_chunks)
+            stocks = {}
+            for _, tickers, metrics in results:
+                self.assertEqual(metrics.shape, (len(tickers), len(METRIC_FIELDS)))
+                stocks.update({stock['Ticker']: stock for stock in metrics_records(tickers, metrics)})
+            self.assertEqual(stocks.keys(), expected.keys())
+            for ticker, stock in stocks.items():
+                np.testing.assert_allclose([stock[name] for name in METRIC_FIELDS], [expected[ticker][name] for name in METRIC_FIELDS])
+            # Every overview is exported, one lake part per chunk
+            self.assertEqual(len(lake.read('overview', columns=['Symbol'])), 12)
+
+    def test_small_batches_and_single_cpu_skip_the_pool(self):
+        raw = list(iter_cached_raw_payloads(self.tickers, self.cache))
+        cases = (
+            (1, 4, 3),  # One CPU
+            (4, 4, 5),  # Three chunks, fewer than two per worker
+        )
+        for cpus, workers, chunk_size in cases:
+            with self.subTest(cpus=cpus, workers=workers), \
+                    patch.object(parallel_processor.os, 'cpu_count', return_value=cpus), \
+                    patch.object(parallel_processor, 'ProcessPoolExecutor', side_effect=AssertionError('pool started')):
+                results = list(process_many(raw, workers=workers, chunk_size=chunk_size, price_store=self.price_store))
+            self.assertEqual(sum(len(chunk) for chunk, _, _ in results), len(self.tickers))
+
+    def test_skips_undecodable_payloads(self):
+        _, tickers, metrics = next(process_many([('BAD', b'not zlib', b'')], workers=1, price_store=self.price_store))
+        self.assertEqual(tickers, [])
+        self.assertEqual(metrics.shape, (0, len(METRIC_FIELDS)))
+
+    def test_reads_closes_from_the_price_store(self):
+        ticker, overview, time_series = next(payload for payload in self.payloads if process_stock_data(*payload))
+        self.price_store.merge(ticker, time_series)
+        # The time series blob is never decoded when the store has the closes
+        _, tickers, metrics = next(process_many([(ticker, encode_payload(overview), b'not zlib')], workers=1, price_store=self.price_store))
+        self.assertEqual(tickers, [ticker])
+        expected = process_stock_data(ticker, overview, time_series)
+        np.testing.assert_allclose(metrics[0], [expected[name] for name in METRIC_FIELDS])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,189 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+import main
+from benchmarks import synthetic
+from utils.data_lake import DataLake
+from utils.rate_limiter import QuotaExceededError
+from utils.db import load_ticker_metrics, open_db, save_ticker_metrics
+from utils.pipeline import DONE, FAILED, SKIPPED, Pipeline, Stage
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = str(Path(self.tmp.name) / 'history.db')
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def record(self, name, error=None):
+        def run(ctx):
+            with self.lock:
+                self.calls.append(name)
+            if error:
+                raise error
+        return run
+
+    def pipeline(self, fail=None):
+        return Pipeline([
+            Stage('fetch', self.record('fetch')),
+            Stage('rank', self.record('rank', RuntimeError('boom') if fail == 'rank' else None), depends_on=('fetch',)),
+            Stage('news', self.record('news'), depends_on=('rank',)),
+            Stage('export', self.record('export'), depends_on=('rank',)),
+            Stage('email', self.record('email'), depends_on=('news', 'export')),
+        ], run_id='20250101', db_path=self.db_path)
+
+    def test_runs_stages_after_their_dependencies(self):
+        statuses = self.pipeline().run()
+        self.assertEqual(set(statuses.values()), {DONE})
+        self.assertEqual(self.calls[:2], ['fetch', 'rank'])
+        self.assertEqual(set(self.calls[2:4]), {'news', 'export'})
+        self.assertEqual(self.calls[4], 'email')
+
+    def test_failure_skips_dependents_and_resume_reruns_them(self):
+        statuses = self.pipeline(fail='rank').run()
+        self.assertEqual(statuses['fetch'], DONE)
+        self.assertEqual(statuses['rank'], FAILED)
+        self.assertEqual({statuses['news'], statuses['export'], statuses['email']}, {SKIPPED})
+        with open_db(self.db_path) as conn:
+            error = conn.execute("SELECT error FROM pipeline_stages WHERE stage = 'rank'").fetchone()[0]
+        self.assertEqual(error, 'boom')
+
+        self.calls.clear()
+        statuses = self.pipeline().run()
+        self.assertEqual(set(statuses.values()), {DONE})
+        self.assertNotIn('fetch', self.calls)
+        self.assertEqual(len(self.calls), 4)
+
+    def test_from_stage_reruns_downstream_only(self):
+        self.pipeline().run()
+        self.calls.clear()
+        self.pipeline().run()
+        self.assertEqual(self.calls, [])
+
+        self.pipeline().run(from_stage='news')
+        self.assertEqual(sorted(self.calls), ['email', 'news'])
+        with self.assertRaises(ValueError):
+            self.pipeline().run(from_stage='missing')
+
+    def test_from_stage_requires_finished_upstream_stages(self):
+        with self.assertRaisesRegex(ValueError, 'fetch has not finished'):
+            self.pipeline().run(from_stage='rank')
+        self.assertEqual(self.calls, [])
+
+        self.pipeline(fail='rank').run()
+        self.calls.clear()
+        with self.assertRaisesRegex(ValueError, 'rank has not finished'):
+            self.pipeline().run(from_stage='news')
+        self.assertEqual(self.pipeline().run(from_stage='rank')['email'], DONE)
+        self.assertEqual(self.calls[0], 'rank')
+
+    def test_independent_stages_overlap(self):
+        # Each side waits for the other, so this only finishes if both run at once
+        barrier = threading.Barrier(2, timeout=5)
+        pipeline = Pipeline([
+            Stage('rank', self.record('rank')),
+            Stage('news', lambda ctx: barrier.wait(), depends_on=('rank',)),
+            Stage('export', lambda ctx: barrier.wait(), depends_on=('rank',)),
+        ], run_id='20250101', db_path=self.db_path)
+        self.assertEqual(set(pipeline.run().values()), {DONE})
+
+    def test_ticker_checkpoints_survive_a_crash(self):
+        def fetch(ctx):
+            for ticker in ['AAPL', 'MSFT']:
+                if ticker in ctx.completed_tickers():
+                    continue
+                if ticker == 'MSFT' and 'crash' not in ctx.values:
+                    ctx.values['crash'] = True
+                    raise RuntimeError('killed')
+                with open_db(ctx.db_path) as conn:
+                    save_ticker_metrics(conn, ctx.run_id, [{'Ticker': ticker, 'Price': 1.0, 'PctChange': 0.0, 'EarningsYield': 0.1, 'ROC': 0.2}])
+                    ctx.mark_tickers_done([ticker], conn)
+                self.calls.append(ticker)
+
+        pipeline = Pipeline([Stage('fetch', fetch)], run_id='20250101', db_path=self.db_path)
+        self.assertEqual(pipeline.run()['fetch'], FAILED)
+        self.assertEqual(pipeline.run()['fetch'], DONE)
+        self.assertEqual(self.calls, ['AAPL', 'MSFT'])
+        with open_db(self.db_path) as conn:
+            self.assertEqual(sorted(load_ticker_metrics(conn, '20250101')), ['AAPL', 'MSFT'])
+
+    def test_unknown_dependency(self):
+        with self.assertRaises(ValueError):
+            Pipeline([Stage('rank', self.record('rank'), depends_on=('fetch',))], run_id='20250101', db_path=self.db_path)
+
+class TestDailyPipeline(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = str(Path(self.tmp.name) / 'history.db')
+
+    def test_news_overlaps_the_lake_export(self):
+        barrier = threading.Barrier(2, timeout=5)
+        finished = []
+        stages = {
+            'fetch_stage': lambda ctx, tickers, lake, rank_partial: None,
+            'rank_stage': lambda ctx: None,
+            'news_stage': lambda ctx, lake: barrier.wait(),
+            'export_stage': lambda ctx, lake: barrier.wait(),
+            'email_stage': lambda ctx: finished.append('email'),
+        }
+        with patch.multiple(main, **stages):
+            pipeline = main.build_pipeline(['AAPL'], DataLake(str(Path(self.tmp.name) / 'lake')), '20250101', db_path=self.db_path)
+            statuses = pipeline.run()
+        self.assertEqual(set(statuses.values()), {DONE})
+        self.assertEqual(pipeline.stages['email'].depends_on, ('news',))
+        self.assertEqual(finished, ['email'])
+
+class TestFetchStage(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = str(Path(self.tmp.name) / 'history.db')
+        self.lake = DataLake(str(Path(self.tmp.name) / 'lake'))
+        days = synthetic.trading_days(5)
+        self.payloads = {}
+        for ticker in ['AAPL', 'MSFT', 'TINY']:
+            rng = synthetic.ticker_rng(ticker)
+            self.payloads[ticker] = (synthetic.overview(ticker, rng), synthetic.time_series(ticker, days, rng))
+        self.payloads['TINY'][0]['MarketCapitalization'] = '1'
+        for target, value in [('iter_cached_raw_payloads', lambda tickers: iter(())), ('MIN_MARKET_CAP', 1e6)]:
+            patcher = patch.object(main, target, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_fetch(self, results, quota_after=None, rank_partial=False):
+        def fetch_many(chunk, concurrency=8):
+            for i, ticker in enumerate(chunk):
+                if i == quota_after:
+                    raise QuotaExceededError('Our standard API rate limit is 25 requests per day.')
+                yield results.get(ticker, (ticker, None, None))
+
+        with patch.object(main, 'fetch_many', fetch_many):
+            pipeline = main.build_pipeline(['AAPL', 'MSFT', 'TINY', 'NFLX'], self.lake, '20250101', self.db_path, rank_partial)
+            return Pipeline([pipeline.stages['fetch']], run_id='20250101', db_path=self.db_path).run()['fetch']
+
+    def test_only_checkpoints_tickers_whose_data_arrived(self):
+        # MSFT's time series failed and NFLX returned nothing; TINY is screened out by market cap
+        results = {
+            'AAPL': ('AAPL', *self.payloads['AAPL']),
+            'MSFT': ('MSFT', self.payloads['MSFT'][0], None),
+            'TINY': ('TINY', *self.payloads['TINY']),
+        }
+        self.assertEqual(self.run_fetch(results), DONE)
+        with open_db(self.db_path) as conn:
+            done = {row[0] for row in conn.execute('SELECT ticker FROM pipeline_tickers')}
+            self.assertEqual(sorted(load_ticker_metrics(conn, '20250101')), ['AAPL'])
+        self.assertEqual(done, {'AAPL', 'TINY'})
+
+    def test_quota_leaves_the_stage_to_resume(self):
+        results = {ticker: (ticker, *payload) for ticker, payload in self.payloads.items()}
+        self.assertEqual(self.run_fetch(results, quota_after=1), FAILED)
+        self.assertEqual(self.run_fetch(results, quota_after=1, rank_partial=True), DONE)
+        with open_db(self.db_path) as conn:
+            self.assertEqual(sorted(load_ticker_metrics(conn, '20250101')), ['AAPL', 'MSFT'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+from datetime import date
+import tempfile
+import unittest
+from utils.price_store import CLOSE, PriceStore
+
+def time_series(closes):
+    '''TIME_SERIES_DAILY payload, newest bar first like Alpha Vantage returns it.'''
+    bars = {
+        day: {'1. open': str(close), '2. high': str(close), '3. low': str(close), '4. close': str(close), '5. volume': '1000'}
+        for day, close in sorted(closes.items(), reverse=True)
+    }
+    return {'Meta Data': {}, 'Time Series (Daily)': bars}
+
+class TestPriceStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = PriceStore(self.tmp.name)
+
+    def test_backfill_then_compact(self):
+        self.assertEqual(self.store.outputsize('AAPL'), 'full')
+        self.store.merge('AAPL', time_series({'2025-01-02': 100.0, '2025-01-03': 101.0}))
+        self.assertEqual(self.store.outputsize('AAPL', today=date(2025, 1, 6)), 'compact')
+        # Stale data needs a full refetch to fill the gap compact output cannot cover
+        self.assertEqual(self.store.outputsize('AAPL', today=date(2025, 12, 1)), 'full')
+
+    def test_merge_adds_only_new_bars(self):
+        self.assertEqual(self.store.merge('AAPL', time_series({'2025-01-02': 100.0, '2025-01-03': 101.0})), 2)
+        # Compact refresh overlaps the stored history and corrects the 3rd's close
+        self.assertEqual(self.store.merge('AAPL', time_series({'2025-01-03': 101.5, '2025-01-06': 103.0})), 1)
+        prices = self.store.load('AAPL')
+        self.assertEqual(prices.shape[1], 3)
+        self.assertEqual(prices[CLOSE].tolist(), [100.0, 101.5, 103.0])
+        self.assertEqual(self.store.last_date('AAPL'), date(2025, 1, 6))
+
+    def test_last_closes(self):
+        self.store.merge('MSFT', time_series({'2025-01-02': 10.0, '2025-01-03': 11.0, '2025-01-06': 12.0}))
+        self.assertEqual(self.store.last_closes('MSFT', 2).tolist(), [11.0, 12.0])
+        self.assertEqual(len(self.store.last_closes('NONE', 2)), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+import numpy as np
+import pandas as pd
+from utils.processor import rank_stocks
+from utils.ranking import compute_metrics, rank_fundamentals, valid_mask
+
+class TestComputeMetrics(unittest.TestCase):
+    def test_masks_invalid_denominators(self):
+        earnings_yield, roc = compute_metrics(
+            ebit=[100, 100, 100],
+            enterprise_value=[500, 0, -10],
+            net_fixed_assets=[200, 0, 100],
+            working_capital=[50, 0, 50],
+        )
+        self.assertAlmostEqual(earnings_yield[0], 0.2)
+        self.assertAlmostEqual(roc[0], 0.4)
+        self.assertTrue(np.isnan(earnings_yield[1]) and np.isnan(roc[1]))
+        self.assertTrue(np.isnan(earnings_yield[2]))
+        self.assertEqual(valid_mask(earnings_yield, roc).tolist(), [True, False, False])
+
+class TestMagicFormulaRanking(unittest.TestCase):
+    def test_ranks_by_sum_of_ranks(self):
+        stocks = {
+            # Highest earnings yield but the worst return on capital
+            'AAA': {'Ticker': 'AAA', 'Price': 1.0, 'PctChange': 0.0, 'EarningsYield': 0.30, 'ROC': 0.05},
+            'BBB': {'Ticker': 'BBB', 'Price': 1.0, 'PctChange': 0.0, 'EarningsYield': 0.20, 'ROC': 0.40},
+            'CCC': {'Ticker': 'CCC', 'Price': 1.0, 'PctChange': 0.0, 'EarningsYield': 0.10, 'ROC': 0.50},
+            'DDD': {'Ticker': 'DDD', 'Price': 1.0, 'PctChange': 0.0, 'EarningsYield': 0.25, 'ROC': 0.30},
+        }
+        ranked = rank_stocks(stocks)
+        # Combined ranks: AAA 1+4=5, BBB 3+2=5, CCC 4+1=5, DDD 2+3=5 -> ties broken by earnings yield
+        self.assertEqual([stock['Ticker'] for stock in ranked], ['AAA', 'DDD', 'BBB', 'CCC'])
+        self.assertEqual([stock['Rank'] for stock in ranked], [1, 2, 3, 4])
+
+        stocks['BBB']['ROC'] = 0.60
+        # Now BBB: 3+1=4 beats everyone else
+        self.assertEqual(rank_stocks(stocks)[0]['Ticker'], 'BBB')
+
+    def test_rank_fundamentals_drops_invalid_rows(self):
+        fundamentals = pd.DataFrame({
+            'Ticker': ['AAPL', 'MSFT', 'LOSS'],
+            'EBIT': [100.0, 60.0, -5.0],
+            'EnterpriseValue': [500.0, 400.0, 100.0],
+            'NetFixedAssets': [200.0, 150.0, 10.0],
+            'WorkingCapital': [50.0, 40.0, 10.0],
+        })
+        ranked = rank_fundamentals(fundamentals)
+        self.assertEqual(ranked['Ticker'].tolist(), ['AAPL', 'MSFT'])
+        self.assertEqual(ranked['Rank'].tolist(), [1, 2])
+
+    def test_empty_input(self):
+        self.assertEqual(rank_stocks({}), [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,158 @@
+import tempfile
+import unittest
+from unittest.mock import patch
+import requests
+from utils import api_client
+from utils.http_cache import ResponseCache
+from utils.rate_limiter import Quota, QuotaExceededError, RateLimiter, TokenBucket, is_daily_limit, throttle_message
+
+class FakeClock:
+    '''Manual clock whose sleep() simply advances time.'''
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+class FakeResponse:
+    def __init__(self, payload, status_code=200):
+        self.payload = payload
+        self.status_code = status_code
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(f'HTTP {self.status_code}')
+
+    def json(self):
+        return self.payload
+
+class FakeSession:
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        return self.responses.pop(0)
+
+class TestTokenBucket(unittest.TestCase):
+    def test_refills_over_time(self):
+        clock = FakeClock()
+        bucket = TokenBucket(capacity=2, refill_per_second=1, clock=clock)
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertEqual(bucket.try_acquire(), 0)
+        self.assertAlmostEqual(bucket.try_acquire(), 1.0)
+        clock.now += 1
+        self.assertEqual(bucket.try_acquire(), 0)
+
+class TestRateLimiter(unittest.TestCase):
+    def test_enforces_requests_per_minute(self):
+        clock = FakeClock()
+        limiter = RateLimiter({'api': Quota(requests_per_minute=5, requests_per_day=100)}, clock=clock, sleep=clock.sleep)
+        for _ in range(6):
+            limiter.acquire('api')
+        # The first five go out immediately, the sixth waits for one token (60s / 5)
+        self.assertAlmostEqual(clock.now, 12.0)
+
+    def test_enforces_requests_per_day(self):
+        clock = FakeClock()
+        limiter = RateLimiter({'api': Quota(requests_per_minute=60, requests_per_day=2)}, clock=clock, sleep=clock.sleep)
+        limiter.acquire('api')
+        limiter.acquire('api')
+        with self.assertRaises(QuotaExceededError):
+            limiter.acquire('api')
+
+    def test_pause_holds_back_requests(self):
+        clock = FakeClock()
+        limiter = RateLimiter({'api': Quota(requests_per_minute=60, requests_per_day=100)}, clock=clock, sleep=clock.sleep)
+        limiter.pause('api', 30)
+        limiter.acquire('api')
+        self.assertGreaterEqual(clock.now, 30)
+
+class TestThrottleDetection(unittest.TestCase):
+    def test_alpha_vantage_note(self):
+        payload = {'Note': 'Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute.'}
+        self.assertIsNotNone(throttle_message(payload))
+        self.assertIsNone(throttle_message({'Symbol': 'AAPL'}))
+
+    def test_per_minute_note_is_not_daily(self):
+        minute = ('Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute and 500 calls per day. '
+                  'Please visit https://www.alphavantage.co/premium/ if you would like to target a higher API call frequency.')
+        day = ('Thank you for using Alpha Vantage! Our standard API rate limit is 25 requests per day. '
+               'Please subscribe to any of the premium plans at https://www.alphavantage.co/premium/ to instantly remove all daily rate limits.')
+        self.assertFalse(is_daily_limit(minute))
+        self.assertTrue(is_daily_limit(day))
+
+    def test_news_api_error(self):
+        payload = {'status': 'error', 'code': 'rateLimited', 'message': 'Too many requests'}
+        self.assertIsNotNone(throttle_message(payload))
+        self.assertIsNone(throttle_message({'status': 'ok', 'articles': []}))
+
+class TestGetJson(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.limiter = RateLimiter({'api': Quota(60, 100)}, clock=self.clock, sleep=self.clock.sleep)
+        patcher = patch.object(api_client, 'sleep', self.clock.sleep)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_retries_after_throttle_body(self):
+        session = FakeSession([
+            FakeResponse({'Note': 'Our standard API call frequency is 5 calls per minute.'}),
+            FakeResponse({'Symbol': 'AAPL'}),
+        ])
+        payload = api_client.get_json(session, 'url', {}, 'test', provider='api', limiter=self.limiter)
+        self.assertEqual(payload, {'Symbol': 'AAPL'})
+        self.assertEqual(session.calls, 2)
+
+    def test_per_minute_note_keeps_fetching(self):
+        session = FakeSession([
+            FakeResponse({'Note': 'Thank you for using Alpha Vantage! Our standard API call frequency is 5 calls per minute and 500 calls per day.'}),
+            FakeResponse({'Symbol': 'AAPL'}),
+        ])
+        payload = api_client.get_json(session, 'url', {}, 'test', provider='api', limiter=self.limiter)
+        self.assertEqual(payload, {'Symbol': 'AAPL'})
+        self.assertGreater(self.limiter.remaining_today('api'), 0)
+
+    def test_daily_limit_stops_requests(self):
+        session = FakeSession([
+            FakeResponse({'Information': 'Our standard API rate limit is 25 requests per day.'}),
+        ])
+        with self.assertRaises(QuotaExceededError):
+            api_client.get_json(session, 'url', {}, 'test', provider='api', limiter=self.limiter)
+        with self.assertRaises(QuotaExceededError):
+            self.limiter.acquire('api')
+
+    def test_client_errors_are_not_retried(self):
+        session = FakeSession([FakeResponse({}, status_code=401)])
+        self.assertIsNone(api_client.get_json(session, 'url', {}, 'test', provider='api', limiter=self.limiter))
+        self.assertEqual(session.calls, 1)
+
+    def test_errors_are_not_cached(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        cache = ResponseCache(f'{tmp.name}/cache.db')
+        self.addCleanup(cache.close)
+        errors = [
+            {'Error Message': 'Invalid API call. Please retry or visit the documentation for OVERVIEW.'},
+            {'Information': 'This is a premium endpoint.'},
+            {'status': 'error', 'code': 'parameterInvalid', 'message': 'Bad sources.'},
+        ]
+        for error in errors:
+            with self.subTest(error=error):
+                session = FakeSession([FakeResponse(error), FakeResponse({'Symbol': 'AAPL'})])
+                get = lambda: api_client.get_json(session, 'url', {'symbol': 'AAPL'}, 'test', provider='api', limiter=self.limiter, cache_ttl=3600, cache=cache)
+                self.assertEqual(get(), error)
+                # The next call goes back to the network and caches real data
+                self.assertEqual(get(), {'Symbol': 'AAPL'})
+                self.assertEqual(get(), {'Symbol': 'AAPL'})
+                self.assertEqual(session.calls, 2)
+                cache.clear()
+
+if __name__ == "__main__":
+    unittest.main()
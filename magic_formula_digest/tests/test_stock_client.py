@@ -0,0 +1,87 @@
+import asyncio
+import tempfile
+import threading
+import time
+import unittest
+from unittest.mock import patch
+from utils import api_client, stock_client
+from utils.http_cache import ResponseCache
+from utils.price_store import PriceStore
+from utils.rate_limiter import Quota, RateLimiter
+
+class FakeResponse:
+    status_code = 200
+
+    def __init__(self, payload):
+        self.payload = payload
+
+    def raise_for_status(self):
+        pass
+
+    def json(self):
+        return self.payload
+
+class FakeSession:
+    '''Session stand-in that records how many requests overlap.'''
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def get(self, url, params=None, timeout=None):
+        with self.lock:
+            self.in_flight += 1
+            self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay)
+        with self.lock:
+            self.in_flight -= 1
+        return FakeResponse({'function': params['function'], 'symbol': params['symbol']})
+
+class TestFetchMany(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        limiter = RateLimiter({api_client.ALPHA_VANTAGE: Quota(10000, 10000)})
+        patcher = patch.object(api_client, '_rate_limiter', limiter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        cache = ResponseCache(f'{self.tmp.name}/cache.db')
+        patcher = patch.object(api_client, '_response_cache', cache)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(cache.close)
+        self.addCleanup(self.tmp.cleanup)
+
+    def collect(self, tickers, concurrency, session):
+        async def run():
+            price_store = PriceStore(f'{self.tmp.name}/prices')
+            return [result async for result in stock_client.fetch_many_async(tickers, concurrency, session, price_store)]
+        return asyncio.run(run())
+
+    def test_fetches_both_endpoints_concurrently(self):
+        session = FakeSession()
+        tickers = ['AAPL', 'MSFT', 'GOOGL', 'AMZN']
+        results = self.collect(tickers, 4, session)
+
+        self.assertEqual(sorted(ticker for ticker, _, _ in results), sorted(tickers))
+        for ticker, overview, time_series in results:
+            self.assertEqual(overview['function'], 'OVERVIEW')
+            self.assertEqual(time_series['function'], 'TIME_SERIES_DAILY')
+            self.assertEqual(overview['symbol'], ticker)
+        self.assertEqual(session.max_in_flight, 4)
+
+    def test_reruns_are_served_from_cache(self):
+        tickers = ['AAPL', 'MSFT']
+        self.collect(tickers, 2, FakeSession(delay=0))
+        session = FakeSession(delay=0)
+        results = self.collect(tickers, 2, session)
+        self.assertEqual(len(results), 2)
+        self.assertEqual(session.max_in_flight, 0)
+
+    def test_respects_concurrency_limit(self):
+        session = FakeSession(delay=0.01)
+        self.collect([f'T{i}' for i in range(10)], 3, session)
+        self.assertLessEqual(session.max_in_flight, 3)
+
+if __name__ == "__main__":
+    unittest.main()
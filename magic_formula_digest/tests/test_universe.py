@@ -0,0 +1,37 @@
+import tempfile
+import unittest
+from pathlib import Path
+from utils.universe import filter_listings, iter_chunks, iter_listings, passes_market_cap
+
+LISTING_CSV = '''symbol,name,exchange,assetType,ipoDate,delistingDate,status
+AAPL,Apple Inc,NASDAQ,Stock,1980-12-12,null,Active
+SPY,SPDR S&P 500 ETF Trust,NYSE ARCA,ETF,1993-01-29,null,Active
+IBM,International Business Machines Corp,NYSE,Stock,1962-01-02,null,Active
+QQQ,Invesco QQQ Trust,NASDAQ,ETF,1999-03-10,null,Active
+XYZ,Some OTC Co,BATS,Stock,2020-01-01,null,Active
+'''
+
+class TestUniverse(unittest.TestCase):
+    def test_filters_streamed_listings(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            listing_file = Path(tmp) / 'listing_status.csv'
+            listing_file.write_text(LISTING_CSV)
+            self.assertEqual(list(filter_listings(iter_listings(listing_file))), ['AAPL', 'IBM'])
+            etfs = filter_listings(iter_listings(listing_file), asset_types=['ETF'], exchanges=['NASDAQ'])
+            self.assertEqual(list(etfs), ['QQQ'])
+
+    def test_market_cap_floor(self):
+        self.assertTrue(passes_market_cap({'MarketCapitalization': '3000000000'}, 1e9))
+        self.assertFalse(passes_market_cap({'MarketCapitalization': '500000000'}, 1e9))
+        self.assertFalse(passes_market_cap({'MarketCapitalization': 'None'}, 1e9))
+        self.assertFalse(passes_market_cap(None, 1e9))
+        self.assertTrue(passes_market_cap(None, 0))
+
+    def test_chunks_lazily(self):
+        def tickers():
+            yield from ['A', 'B', 'C', 'D', 'E']
+        self.assertEqual(list(iter_chunks(tickers(), 2)), [['A', 'B'], ['C', 'D'], ['E']])
+        self.assertEqual(list(iter_chunks([], 2)), [])
+
+if __name__ == "__main__":
+    unittest.main()
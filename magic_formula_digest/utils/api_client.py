@@ -0,0 +1,151 @@
+import logging
+from time import perf_counter, sleep
+from typing import Dict, Optional
+import requests
+from requests.adapters import HTTPAdapter
+from utils.config import (
+    ALPHA_VANTAGE_REQUESTS_PER_DAY,
+    ALPHA_VANTAGE_REQUESTS_PER_MINUTE,
+    ALPHA_VANTAGE_URL,
+    HTTP_CACHE_MAX_MB,
+    NEWS_API_REQUESTS_PER_DAY,
+    NEWS_API_REQUESTS_PER_MINUTE,
+)
+from utils.http_cache import ResponseCache, cache_key
+from utils.instrumentation import count, observe
+from utils.rate_limiter import Quota, QuotaExceededError, RateLimiter, backoff_delay, is_daily_limit, throttle_message
+
+REQUEST_TIMEOUT = 30
+
+# Provider names used as rate limiter keys
+ALPHA_VANTAGE = 'alpha_vantage'
+NEWS_API = 'news_api'
+
+_session: Optional[requests.Session] = None
+_rate_limiter: Optional[RateLimiter] = None
+_response_cache: Optional[ResponseCache] = None
+
+def create_session(pool_size: int = 10) -> requests.Session:
+    '''Create an HTTP session whose connection pool can be shared across threads.'''
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount('https://', adapter)
+    session.mount('http://', adapter)
+    return session
+
+def get_session() -> requests.Session:
+    '''Return the process-wide default session, creating it on first use.'''
+    global _session
+    if _session is None:
+        _session = create_session()
+    return _session
+
+def get_rate_limiter() -> RateLimiter:
+    '''Return the rate limiter shared by every outbound API client.'''
+    global _rate_limiter
+    if _rate_limiter is None:
+        _rate_limiter = RateLimiter({
+            ALPHA_VANTAGE: Quota(ALPHA_VANTAGE_REQUESTS_PER_MINUTE, ALPHA_VANTAGE_REQUESTS_PER_DAY),
+            NEWS_API: Quota(NEWS_API_REQUESTS_PER_MINUTE, NEWS_API_REQUESTS_PER_DAY),
+        })
+    return _rate_limiter
+
+def get_response_cache() -> ResponseCache:
+    '''Return the on-disk response cache shared by every outbound API client.'''
+    global _response_cache
+    if _response_cache is None:
+        _response_cache = ResponseCache(max_bytes=HTTP_CACHE_MAX_MB * 1024 * 1024)
+    return _response_cache
+
+def _is_retryable(response: requests.Response) -> bool:
+    return response.status_code == 429 or response.status_code >= 500
+
+def _is_cacheable(payload: Dict) -> bool:
+    '''Whether a payload holds data rather than an error or notice that should not outlive this request.'''
+    if not isinstance(payload, dict):
+        return True
+    # Alpha Vantage answers 200 OK with these for bad symbols, premium endpoints and quota notices
+    if any(key in payload for key in ('Error Message', 'Information', 'Note')):
+        return False
+    # NewsAPI reports every error as {'status': 'error', ...}
+    return payload.get('status') != 'error'
+
+def get_json(
+    session: requests.Session,
+    url: str,
+    params: Dict,
+    description: str,
+    provider: Optional[str] = None,
+    retries: int = 3,
+    limiter: Optional[RateLimiter] = None,
+    cache_ttl: Optional[float] = None,
+    cache: Optional[ResponseCache] = None,
+) -> Optional[Dict]:
+    '''GET a JSON payload within the provider's quota, backing off on failures and throttling.
+
+    When `cache_ttl` is given, a cached response younger than that is returned
+    without touching the network, and fresh responses are stored for `cache_ttl`
+    seconds. Returns None once retries are exhausted or the request is rejected
+    outright. Raises QuotaExceededError when the provider's daily budget is
+    spent, so callers stop queueing requests that can only fail.
+    '''
+    if cache_ttl:
+        cache = cache or get_response_cache()
+        key = cache_key(url, params)
+        payload = cache.get(key)
+        if payload is not None:
+            count('cache_hits', provider=provider or 'other')
+            return payload
+        count('cache_misses', provider=provider or 'other')
+        payload = get_json(session, url, params, description, provider, retries, limiter)
+        if payload is not None and _is_cacheable(payload):
+            cache.set(key, payload, cache_ttl)
+        return payload
+
+    limiter = limiter or get_rate_limiter()
+    label = provider or 'other'
+    for attempt in range(retries):
+        if attempt:
+            count('api_retries', provider=label)
+        if provider:
+            limiter.acquire(provider)
+        start = perf_counter()
+        try:
+            try:
+                response = session.get(url, params=params, timeout=REQUEST_TIMEOUT)
+            finally:
+                observe('api_request_seconds', perf_counter() - start, provider=label)
+            count('api_requests', provider=label, status=response.status_code)
+            if not _is_retryable(response):
+                response.raise_for_status()
+            try:
+                payload = response.json()
+            except ValueError:
+                payload = None
+            message = throttle_message(payload)
+            if message is None and not _is_retryable(response):
+                return payload
+        except requests.exceptions.RequestException as e:
+            if not isinstance(e, requests.exceptions.HTTPError):
+                count('api_requests', provider=label, status='error')
+            logging.error(f'Failed to fetch {description}: {e}')
+            if isinstance(e, requests.exceptions.HTTPError):
+                return None  # Client errors will not succeed on retry
+            if attempt < retries - 1:
+                sleep(backoff_delay(attempt))
+            continue
+
+        message = message or f'HTTP {response.status_code}'
+        logging.error(f'Throttled while fetching {description}: {message}')
+        count('api_throttled', provider=label)
+        if provider and is_daily_limit(message):
+            count('api_quota_exhausted', provider=label)
+            limiter.exhaust(provider)
+            raise QuotaExceededError(message)
+        if attempt < retries - 1:
+            if provider:
+                # Hold back every queued request to this provider, not just this one
+                limiter.pause(provider, backoff_delay(attempt + 1))
+            else:
+                sleep(backoff_delay(attempt + 1))
+    return None
@@ -0,0 +1,222 @@
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+from utils.data_lake import DataLake
+from utils.db import DB_PATH, open_db
+from utils.price_store import CLOSE, DATE, PriceStore
+
+TRADING_DAYS = 252
+FREQUENCIES = {'monthly': 100, 'annual': 10000}  # Divisors turning YYYYMMDD into a period key
+
+@dataclass
+class BacktestData:
+    '''Stored rankings and closing prices aligned on one trading-day axis.
+
+    Rankings are kept as snapshots, one row per ranking date; `snapshot[i]` is
+    the latest snapshot on or before trading day i (-1 before the first), so a
+    ticker missing from a later ranking is not carried forward.
+    '''
+    dates: np.ndarray  # (n_days,) YYYYMMDD as int64
+    tickers: List[str]
+    closes: np.ndarray  # (n_days, n_tickers), forward-filled, NaN before a ticker's first bar
+    snapshot: np.ndarray  # (n_days,) index into the ranking rows below
+    ranks: np.ndarray  # (n_snapshots, n_tickers), NaN where a ticker was not ranked
+    earnings_yield: np.ndarray
+    roc: np.ndarray
+
+@dataclass
+class BacktestResult:
+    dates: np.ndarray
+    equity: np.ndarray  # Portfolio value per trading day, starting at 1.0 on the first rebalance
+    rebalances: List[int] = field(default_factory=list)  # YYYYMMDD of each rebalance
+    holdings: List[List[str]] = field(default_factory=list)
+    stats: Dict[str, float] = field(default_factory=dict)
+
+def forward_fill(values: np.ndarray) -> np.ndarray:
+    '''Fill NaNs down each column with the last value above them.'''
+    rows = np.where(np.isnan(values), 0, np.arange(values.shape[0])[:, None])
+    np.maximum.accumulate(rows, axis=0, out=rows)
+    # Leading NaNs point at row 0, so they stay NaN
+    return np.take_along_axis(values, rows, axis=0)
+
+def load_rankings(
+    db_path: str = DB_PATH,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    lake: Optional[DataLake] = None,
+) -> pd.DataFrame:
+    '''Stored daily rankings between `start` and `end` (inclusive, YYYYMMDD).
+
+    With a `lake`, only the needed columns of the date partitions in range are
+    read from its rankings dataset instead of querying history.db.
+    '''
+    if lake is not None:
+        frame = lake.read('rankings', columns=['Ticker', 'EarningsYield', 'ROC', 'Rank'], start=start, end=end)
+        frame = frame.rename(columns={'Ticker': 'ticker', 'EarningsYield': 'earnings_yield', 'ROC': 'roc', 'Rank': 'rank'})
+        return frame[['date', 'ticker', 'earnings_yield', 'roc', 'rank']].sort_values('date', kind='stable', ignore_index=True)
+    with open_db(db_path) as conn:
+        return pd.read_sql_query('''
+            SELECT date, ticker, earnings_yield, roc, rank
+            FROM stock_rankings
+            WHERE date >= ? AND date <= ?
+            ORDER BY date
+        ''', conn, params=(start or '00000000', end or '99999999'))
+
+def load_backtest_data(
+    db_path: str = DB_PATH,
+    price_store: Optional[PriceStore] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    lake: Optional[DataLake] = None,
+) -> BacktestData:
+    '''Load rankings from history.db (or `lake`) and closes from the price store into aligned arrays.
+
+    Everything is loaded once, so any number of backtests can then run over it
+    without touching disk.
+    '''
+    price_store = price_store or PriceStore()
+    rankings = load_rankings(db_path, start, end, lake)
+    tickers = sorted(rankings['ticker'].unique())
+    low, high = int(start or 0), int(end or 99999999)
+
+    series = []
+    for ticker in tickers:
+        prices = price_store.load(ticker)
+        if prices is None:
+            series.append((np.empty(0, np.int64), np.empty(0)))
+            continue
+        in_range = (prices[DATE] >= low) & (prices[DATE] <= high)
+        series.append((prices[DATE, in_range].astype(np.int64), np.array(prices[CLOSE, in_range])))
+
+    dates = np.unique(np.concatenate([ticker_dates for ticker_dates, _ in series] or [np.empty(0, np.int64)]))
+    closes = np.full((len(dates), len(tickers)), np.nan)
+    for column, (ticker_dates, ticker_closes) in enumerate(series):
+        closes[np.searchsorted(dates, ticker_dates), column] = ticker_closes
+
+    # Pivot the long ranking table into one row per ranking date
+    ranking_dates = np.unique(rankings['date'].astype(np.int64).to_numpy())
+    row = np.searchsorted(ranking_dates, rankings['date'].astype(np.int64).to_numpy())
+    column = np.searchsorted(tickers, rankings['ticker'].to_numpy())
+    snapshots = {}
+    for name in ('rank', 'earnings_yield', 'roc'):
+        matrix = np.full((len(ranking_dates), len(tickers)), np.nan)
+        matrix[row, column] = rankings[name].to_numpy(dtype=np.float64)
+        snapshots[name] = matrix
+
+    return BacktestData(
+        dates=dates,
+        tickers=tickers,
+        closes=forward_fill(closes),
+        snapshot=np.searchsorted(ranking_dates, dates, side='right') - 1,
+        ranks=snapshots['rank'],
+        earnings_yield=snapshots['earnings_yield'],
+        roc=snapshots['roc'],
+    )
+
+def rebalance_indices(data: BacktestData, frequency: str = 'monthly') -> np.ndarray:
+    '''Trading-day indices to rebalance on: the first day with a ranking, then the first day of each period.'''
+    if frequency not in FREQUENCIES:
+        raise ValueError(f'Unknown rebalance frequency {frequency}, expected one of {sorted(FREQUENCIES)}')
+    ranked = np.flatnonzero(data.snapshot >= 0)
+    if len(ranked) == 0:
+        return ranked
+    period = data.dates // FREQUENCIES[frequency]
+    starts = np.flatnonzero(np.diff(period, prepend=-1))
+    return np.union1d(ranked[:1], starts[starts > ranked[0]])
+
+def select_holdings(
+    data: BacktestData,
+    day: int,
+    top_n: int,
+    min_earnings_yield: Optional[float] = None,
+    min_roc: Optional[float] = None,
+) -> np.ndarray:
+    '''Column indices of the `top_n` best-ranked tickers that pass the filters and have a price on `day`.'''
+    snapshot = data.snapshot[day]
+    ranks = data.ranks[snapshot]
+    valid = ~np.isnan(ranks) & (data.closes[day] > 0)
+    if min_earnings_yield is not None:
+        valid &= data.earnings_yield[snapshot] >= min_earnings_yield
+    if min_roc is not None:
+        valid &= data.roc[snapshot] >= min_roc
+    candidates = np.flatnonzero(valid)
+    return candidates[np.argsort(ranks[candidates], kind='stable')[:top_n]]
+
+def summarize(equity: np.ndarray, turnover: Iterable[float] = ()) -> Dict[str, float]:
+    '''Total return, CAGR, annualized volatility and Sharpe ratio, max drawdown and mean turnover.'''
+    turnover = list(turnover)
+    if len(equity) < 2:
+        return {'total_return': 0.0, 'cagr': 0.0, 'volatility': 0.0, 'sharpe': 0.0, 'max_drawdown': 0.0,
+                'turnover': float(np.mean(turnover)) if turnover else 0.0}
+    returns = np.diff(equity) / equity[:-1]
+    years = len(returns) / TRADING_DAYS
+    volatility = float(returns.std() * np.sqrt(TRADING_DAYS))
+    return {
+        'total_return': float(equity[-1] / equity[0] - 1),
+        'cagr': float((equity[-1] / equity[0]) ** (1 / years) - 1),
+        'volatility': volatility,
+        'sharpe': float(returns.mean() * TRADING_DAYS / volatility) if volatility > 0 else 0.0,
+        'max_drawdown': float((1 - equity / np.maximum.accumulate(equity)).max()),
+        'turnover': float(np.mean(turnover)) if turnover else 0.0,
+    }
+
+def run_backtest(
+    data: BacktestData,
+    top_n: int = 10,
+    frequency: str = 'monthly',
+    min_earnings_yield: Optional[float] = None,
+    min_roc: Optional[float] = None,
+) -> BacktestResult:
+    '''Hold an equal-weight portfolio of the top `top_n` stocks, rebalancing at the start of each period.
+
+    Positions drift with their prices between rebalances, and a period with no
+    eligible stocks is held in cash. Each period's equity curve is one
+    vectorized slice of the close matrix, so a run costs one small NumPy
+    operation per rebalance.
+    '''
+    days = rebalance_indices(data, frequency)
+    if len(days) == 0:
+        return BacktestResult(dates=data.dates[:0], equity=np.empty(0))
+
+    first = days[0]
+    equity = np.empty(len(data.dates) - first)
+    result = BacktestResult(dates=data.dates[first:], equity=equity)
+    value, previous, turnover = 1.0, None, []
+    for start, stop in zip(days, [*days[1:], len(data.dates) - 1]):
+        held = select_holdings(data, start, top_n, min_earnings_yield, min_roc)
+        if len(held):
+            growth = (data.closes[start:stop + 1, held] / data.closes[start, held]).mean(axis=1)
+        else:
+            growth = np.ones(stop - start + 1)
+        equity[start - first:stop - first + 1] = value * growth
+        value = equity[stop - first]
+
+        if previous is not None:
+            turnover.append(1 - len(np.intersect1d(previous, held)) / max(len(previous), len(held), 1))
+        previous = held
+        result.rebalances.append(int(data.dates[start]))
+        result.holdings.append([data.tickers[column] for column in held])
+
+    result.stats = summarize(equity, turnover)
+    return result
+
+def sweep(
+    data: BacktestData,
+    top_ns: Iterable[int] = (5, 10, 20, 30),
+    frequencies: Iterable[str] = ('monthly', 'annual'),
+    filters: Optional[Dict[str, Dict]] = None,
+) -> pd.DataFrame:
+    '''Run a backtest for every combination of top-N, rebalance frequency and named filter set.
+
+    `filters` maps a label to keyword arguments for run_backtest, e.g.
+    {'roc>=20%': {'min_roc': 0.2}}. Returns one row of stats per combination.
+    '''
+    filters = filters or {'none': {}}
+    rows = []
+    for frequency in frequencies:
+        for top_n in top_ns:
+            for label, kwargs in filters.items():
+                result = run_backtest(data, top_n=top_n, frequency=frequency, **kwargs)
+                rows.append({'frequency': frequency, 'top_n': top_n, 'filter': label, **result.stats})
+    return pd.DataFrame(rows)
@@ -9,3 +9,34 @@ ALPHA_VANTAGE_API_KEY = os.getenv('ALPHA_VANTAGE_API_KEY')
 NEWS_API_KEY = os.getenv('NEWS_API_KEY')
 SMTP_USER = os.getenv('SMTP_USER')
 SMTP_PASSWORD = os.getenv('SMTP_PASSWORD')
+SMTP_HOST = os.getenv('SMTP_HOST', 'smtp.gmail.com')
+SMTP_PORT = int(os.getenv('SMTP_PORT', 465))
+SMTP_USE_SSL = os.getenv('SMTP_USE_SSL', 'true').lower() == 'true'
+
+# Digest recipients, comma separated
+TO_EMAIL = [address.strip() for address in os.getenv('TO_EMAIL', '').split(',') if address.strip()]
+# Optional JSON file mapping a recipient to the tickers they want to follow
+WATCHLISTS_FILE = os.getenv('WATCHLISTS_FILE', 'data/watchlists.json')
+
+# API endpoints, overridable to point the app at a local mock server (benchmarks/mock_server.py)
+ALPHA_VANTAGE_URL = os.getenv('ALPHA_VANTAGE_URL', 'https://www.alphavantage.co/query')
+NEWS_API_URL = os.getenv('NEWS_API_URL', 'https://newsapi.org/v2/everything')
+
+# Per-provider request quotas (free tiers by default)
+ALPHA_VANTAGE_REQUESTS_PER_MINUTE = int(os.getenv('ALPHA_VANTAGE_REQUESTS_PER_MINUTE', 5))
+ALPHA_VANTAGE_REQUESTS_PER_DAY = int(os.getenv('ALPHA_VANTAGE_REQUESTS_PER_DAY', 25))
+NEWS_API_REQUESTS_PER_MINUTE = int(os.getenv('NEWS_API_REQUESTS_PER_MINUTE', 60))
+NEWS_API_REQUESTS_PER_DAY = int(os.getenv('NEWS_API_REQUESTS_PER_DAY', 100))
+
+# Size limit for the on-disk API response cache
+HTTP_CACHE_MAX_MB = int(os.getenv('HTTP_CACHE_MAX_MB', 256))
+
+# Full-universe screening
+MIN_MARKET_CAP = float(os.getenv('MIN_MARKET_CAP', 0))
+UNIVERSE_CHUNK_SIZE = int(os.getenv('UNIVERSE_CHUNK_SIZE', 200))
+
+# Worker processes for decoding cached payloads and computing metrics
+PROCESS_WORKERS = int(os.getenv('PROCESS_WORKERS', os.cpu_count() or 1))
+
+# Run traces (JSON lines) and the Prometheus textfile
+METRICS_DIR = os.getenv('METRICS_DIR', 'data/metrics')
@@ -0,0 +1,63 @@
+import os
+from pathlib import Path
+import shutil
+from typing import List, Optional, Sequence
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+class DataLake:
+    '''Columnar store of daily datasets, partitioned as <root>/<dataset>/date=<YYYYMMDD>/part-*.parquet.
+
+    Readers pick the columns and date range they need; only those partitions
+    are opened, and files are memory-mapped rather than read into buffers.
+    '''
+
+    def __init__(self, root: str = 'data/lake'):
+        self.root = Path(root)
+
+    def partition(self, dataset: str, date: str) -> Path:
+        return self.root / dataset / f'date={date}'
+
+    def dates(self, dataset: str) -> List[str]:
+        '''Dates with data for a dataset, oldest first.'''
+        dataset_dir = self.root / dataset
+        if not dataset_dir.exists():
+            return []
+        return sorted(path.name.split('=', 1)[1] for path in dataset_dir.glob('date=*') if any(path.glob('*.parquet')))
+
+    def _write_file(self, path: Path, frame: pd.DataFrame):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_suffix('.tmp')
+        pq.write_table(pa.Table.from_pandas(frame, preserve_index=False), tmp_path, compression='zstd')
+        os.replace(tmp_path, path)
+
+    def write(self, dataset: str, date: str, frame: pd.DataFrame):
+        '''Replace a day's partition with `frame`, e.g. when a run is repeated.'''
+        partition = self.partition(dataset, date)
+        if partition.exists():
+            shutil.rmtree(partition)
+        self._write_file(partition / 'part-0.parquet', frame)
+
+    def append(self, dataset: str, date: str, frame: pd.DataFrame, part: str):
+        '''Add (or overwrite) one named part of a day's partition, e.g. one fetch chunk.'''
+        self._write_file(self.partition(dataset, date) / f'part-{part}.parquet', frame)
+
+    def read(
+        self,
+        dataset: str,
+        columns: Optional[Sequence[str]] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None,
+    ) -> pd.DataFrame:
+        '''Load `columns` of a dataset for dates in [start, end], with a `date` column added.'''
+        tables = []
+        for date in self.dates(dataset):
+            if (start and date < start) or (end and date > end):
+                continue
+            for path in sorted(self.partition(dataset, date).glob('*.parquet')):
+                table = pq.read_table(path, columns=list(columns) if columns else None, memory_map=True)
+                tables.append(table.append_column('date', pa.array([date] * table.num_rows, pa.string())))
+        if not tables:
+            return pd.DataFrame(columns=[*(columns or []), 'date'])
+        return pa.concat_tables(tables, promote_options='default').to_pandas()
@@ -1,19 +1,321 @@
+from contextlib import contextmanager
+import json
 import sqlite3
 from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from utils.instrumentation import count
 
-def init_db(db_path: str = 'data/history.db'):
-    '''Initialize the SQLite database and create the stock_rankings table.'''
+DB_PATH = 'data/history.db'
+
+RankingRow = Tuple[str, str, float, float, int]  # (date, ticker, earnings_yield, roc, rank)
+
+TOP_N = 10
+
+# Rebuild ticker_streaks and top10_changes from the full ranking history. A streak
+# counts consecutive ranking dates in the top 10 (gaps-and-islands over day numbers).
+BACKFILL_STREAKS = f'''
+    CREATE TEMP VIEW IF NOT EXISTS top10_runs AS
+    WITH days AS (
+        SELECT date, ROW_NUMBER() OVER (ORDER BY date) AS day FROM (SELECT DISTINCT date FROM stock_rankings)
+    ), top AS (
+        SELECT stock_rankings.ticker, stock_rankings.date, days.day,
+            days.day - ROW_NUMBER() OVER (PARTITION BY stock_rankings.ticker ORDER BY days.day) AS island
+        FROM stock_rankings JOIN days ON days.date = stock_rankings.date
+        WHERE stock_rankings.rank <= {TOP_N}
+    )
+    SELECT ticker, date, day,
+        COUNT(*) OVER (PARTITION BY ticker, island ORDER BY day) AS streak,
+        ROW_NUMBER() OVER (PARTITION BY ticker ORDER BY day DESC) AS recency,
+        COUNT(*) OVER (PARTITION BY ticker) AS top10_days,
+        (SELECT MIN(date) FROM stock_rankings later WHERE later.date > top.date) AS next_date
+    FROM top;
+    INSERT INTO ticker_streaks (ticker, top10_days, streak, last_top10_date, previous_top10_date, previous_streak)
+    SELECT latest.ticker, latest.top10_days, latest.streak, latest.date, previous.date, COALESCE(previous.streak, 0)
+    FROM top10_runs latest
+    LEFT JOIN top10_runs previous ON previous.ticker = latest.ticker AND previous.recency = 2
+    WHERE latest.recency = 1;
+    INSERT INTO top10_changes (date, ticker, change)
+    SELECT date, ticker, 'entered' FROM top10_runs WHERE streak = 1
+    UNION ALL
+    SELECT runs.next_date, runs.ticker, 'dropped' FROM top10_runs runs
+    WHERE runs.next_date IS NOT NULL AND NOT EXISTS (
+        SELECT 1 FROM top10_runs following WHERE following.ticker = runs.ticker AND following.day = runs.day + 1
+    );
+    DROP VIEW top10_runs;
+'''
+
+# Each entry upgrades the schema by one version; PRAGMA user_version records how many have run.
+MIGRATIONS = [
+    # 1: the original table, kept so existing databases and new ones start from the same place
+    '''
+    CREATE TABLE IF NOT EXISTS stock_rankings (
+        date TEXT,
+        ticker TEXT,
+        earnings_yield REAL,
+        roc REAL,
+        rank INTEGER
+    );
+    ''',
+    # 2: key rankings on (date, ticker), dropping duplicate rows from same-day reruns (last write wins)
+    '''
+    CREATE TABLE stock_rankings_v2 (
+        date TEXT NOT NULL,
+        ticker TEXT NOT NULL,
+        earnings_yield REAL,
+        roc REAL,
+        rank INTEGER,
+        PRIMARY KEY (date, ticker)
+    ) WITHOUT ROWID;
+    INSERT OR REPLACE INTO stock_rankings_v2 (date, ticker, earnings_yield, roc, rank)
+        SELECT date, ticker, earnings_yield, roc, rank FROM stock_rankings
+        WHERE date IS NOT NULL AND ticker IS NOT NULL
+        ORDER BY rowid;
+    DROP TABLE stock_rankings;
+    ALTER TABLE stock_rankings_v2 RENAME TO stock_rankings;
+    CREATE INDEX idx_stock_rankings_ticker_rank ON stock_rankings (ticker, rank);
+    CREATE INDEX idx_stock_rankings_date_rank ON stock_rankings (date, rank);
+    ''',
+    # 3: news articles stored once per URL, linked to every ticker and day they were found for
+    '''
+    CREATE TABLE news_articles (
+        url_hash TEXT PRIMARY KEY,
+        url TEXT NOT NULL,
+        title TEXT,
+        source TEXT,
+        published_at TEXT,
+        first_seen TEXT NOT NULL
+    ) WITHOUT ROWID;
+    CREATE TABLE ticker_news (
+        ticker TEXT NOT NULL,
+        date TEXT NOT NULL,
+        url_hash TEXT NOT NULL REFERENCES news_articles (url_hash),
+        PRIMARY KEY (ticker, date, url_hash)
+    ) WITHOUT ROWID;
+    CREATE INDEX idx_ticker_news_date ON ticker_news (date);
+    ''',
+    # 4: pipeline checkpoints, and per-ticker metrics so ranking can resume without refetching
+    '''
+    CREATE TABLE pipeline_stages (
+        run_id TEXT NOT NULL,
+        stage TEXT NOT NULL,
+        status TEXT NOT NULL,
+        started_at TEXT,
+        finished_at TEXT,
+        error TEXT,
+        PRIMARY KEY (run_id, stage)
+    ) WITHOUT ROWID;
+    CREATE TABLE pipeline_tickers (
+        run_id TEXT NOT NULL,
+        stage TEXT NOT NULL,
+        ticker TEXT NOT NULL,
+        PRIMARY KEY (run_id, stage, ticker)
+    ) WITHOUT ROWID;
+    CREATE TABLE ticker_metrics (
+        date TEXT NOT NULL,
+        ticker TEXT NOT NULL,
+        price REAL,
+        pct_change REAL,
+        earnings_yield REAL,
+        roc REAL,
+        PRIMARY KEY (date, ticker)
+    ) WITHOUT ROWID;
+    ''',
+    # 5: materialized top-10 day counts and streaks, and the daily entries and dropouts
+    '''
+    CREATE TABLE ticker_streaks (
+        ticker TEXT PRIMARY KEY,
+        top10_days INTEGER NOT NULL,
+        streak INTEGER NOT NULL,
+        last_top10_date TEXT NOT NULL,
+        previous_top10_date TEXT,
+        previous_streak INTEGER NOT NULL DEFAULT 0
+    ) WITHOUT ROWID;
+    CREATE INDEX idx_ticker_streaks_last_top10_date ON ticker_streaks (last_top10_date);
+    CREATE TABLE top10_changes (
+        date TEXT NOT NULL,
+        ticker TEXT NOT NULL,
+        change TEXT NOT NULL,
+        PRIMARY KEY (date, ticker)
+    ) WITHOUT ROWID;
+    ''' + BACKFILL_STREAKS,
+]
+
+UPSERT_RANKING = '''
+    INSERT INTO stock_rankings (date, ticker, earnings_yield, roc, rank)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (date, ticker) DO UPDATE SET
+        earnings_yield = excluded.earnings_yield,
+        roc = excluded.roc,
+        rank = excluded.rank
+'''
+
+def migrate(conn: sqlite3.Connection):
+    '''Apply any migrations the database has not seen yet, each in its own transaction.'''
+    version = conn.execute('PRAGMA user_version').fetchone()[0]
+    for number, script in enumerate(MIGRATIONS[version:], start=version + 1):
+        conn.executescript(f'BEGIN; {script} PRAGMA user_version = {number}; COMMIT;')
+
+def connect(db_path: str = DB_PATH) -> sqlite3.Connection:
+    '''Open the history database in WAL mode with the schema migrated to the latest version.'''
     db_path = Path(db_path)
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    with sqlite3.connect(db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            CREATE TABLE IF NOT EXISTS stock_rankings (
-                date TEXT,
-                ticker TEXT,
-                earnings_yield REAL,
-                roc REAL,
-                rank INTEGER
-            );
-        ''')
-        conn.commit()
+    conn = sqlite3.connect(db_path)
+    # WAL lets the digest read while a run is still writing rankings
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    migrate(conn)
+    return conn
+
+@contextmanager
+def open_db(db_path: str = DB_PATH) -> Iterator[sqlite3.Connection]:
+    '''Connection that commits on success, rolls back on error and is always closed.'''
+    conn = connect(db_path)
+    try:
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def init_db(db_path: str = DB_PATH):
+    '''Initialize the SQLite database and bring its schema up to date.'''
+    connect(db_path).close()
+
+def upsert_rankings(conn: sqlite3.Connection, rows: Iterable[RankingRow]):
+    '''Insert ranking rows, overwriting any existing row for the same date and ticker.'''
+    cursor = conn.executemany(UPSERT_RANKING, rows)
+    count('db_rows_written', cursor.rowcount, table='stock_rankings')
+
+def replace_day_rankings(conn: sqlite3.Connection, date: str, rows: List[RankingRow]):
+    '''Make `rows` the complete ranking for `date`, dropping tickers a rerun no longer ranks.'''
+    upsert_rankings(conn, rows)
+    tickers = json.dumps([row[1] for row in rows])
+    cursor = conn.execute(
+        'DELETE FROM stock_rankings WHERE date = ? AND ticker NOT IN (SELECT value FROM json_each(?))',
+        (date, tickers),
+    )
+    count('db_rows_deleted', cursor.rowcount, table='stock_rankings')
+    update_top10_streaks(conn, date, [row[1] for row in rows if row[4] <= TOP_N])
+
+def rebuild_top10_streaks(conn: sqlite3.Connection):
+    '''Recompute streaks and daily top-10 changes from the whole ranking history.'''
+    conn.execute('DELETE FROM ticker_streaks')
+    conn.execute('DELETE FROM top10_changes')
+    for statement in BACKFILL_STREAKS.split(';'):
+        if statement.strip():
+            conn.execute(statement)
+
+def update_top10_streaks(conn: sqlite3.Connection, date: str, tickers: List[str]) -> Tuple[List[str], List[str]]:
+    '''Fold one day's top-10 tickers into ticker_streaks. Returns the (entered, dropped) tickers.
+
+    Touches only the day's top tickers and those that were top 10 on the
+    previous ranking date, however long the history is. Rerunning a date first
+    undoes its earlier run; a date older than the latest one triggers a rebuild.
+    '''
+    if conn.execute('SELECT 1 FROM stock_rankings WHERE date > ? LIMIT 1', (date,)).fetchone():
+        rebuild_top10_streaks(conn)
+    else:
+        # Undo an earlier run for the same date, so a rerun is counted once
+        conn.execute('DELETE FROM ticker_streaks WHERE last_top10_date = ? AND top10_days = 1', (date,))
+        conn.execute('''
+            UPDATE ticker_streaks SET
+                top10_days = top10_days - 1,
+                streak = previous_streak,
+                last_top10_date = previous_top10_date,
+                previous_top10_date = NULL,
+                previous_streak = 0
+            WHERE last_top10_date = ?
+        ''', (date,))
+        previous_date = conn.execute('SELECT MAX(date) FROM stock_rankings WHERE date < ?', (date,)).fetchone()[0]
+        conn.execute('''
+            INSERT INTO ticker_streaks (ticker, top10_days, streak, last_top10_date, previous_top10_date, previous_streak)
+            SELECT value, 1, 1, ?, NULL, 0 FROM json_each(?) WHERE true
+            ON CONFLICT (ticker) DO UPDATE SET
+                top10_days = top10_days + 1,
+                streak = CASE WHEN last_top10_date = ? THEN streak + 1 ELSE 1 END,
+                previous_top10_date = last_top10_date,
+                previous_streak = streak,
+                last_top10_date = excluded.last_top10_date
+        ''', (date, json.dumps(sorted(set(tickers))), previous_date))
+        conn.execute('DELETE FROM top10_changes WHERE date = ?', (date,))
+        conn.execute('''
+            INSERT INTO top10_changes (date, ticker, change)
+            SELECT ?, ticker, 'entered' FROM ticker_streaks WHERE last_top10_date = ? AND streak = 1
+            UNION ALL
+            SELECT ?, ticker, 'dropped' FROM ticker_streaks WHERE last_top10_date = ?
+        ''', (date, date, date, previous_date))
+    return load_top10_changes(conn, date)
+
+def load_top10_changes(conn: sqlite3.Connection, date: str) -> Tuple[List[str], List[str]]:
+    '''Tickers that entered and that dropped out of the top 10 on `date`.'''
+    changes = {'entered': [], 'dropped': []}
+    for ticker, change in conn.execute('SELECT ticker, change FROM top10_changes WHERE date = ? ORDER BY ticker', (date,)):
+        changes[change].append(ticker)
+    return changes['entered'], changes['dropped']
+
+def save_ticker_metrics(conn: sqlite3.Connection, date: str, stocks: Iterable[Dict]):
+    '''Store processed per-ticker metrics (as built by processor.process_stock_data) for a day.'''
+    cursor = conn.executemany(
+        '''
+        INSERT OR REPLACE INTO ticker_metrics (date, ticker, price, pct_change, earnings_yield, roc)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''',
+        [(date, stock['Ticker'], stock['Price'], stock['PctChange'], stock['EarningsYield'], stock['ROC']) for stock in stocks],
+    )
+    count('db_rows_written', cursor.rowcount, table='ticker_metrics')
+
+def load_ticker_metrics(conn: sqlite3.Connection, date: str) -> Dict[str, Dict]:
+    '''Load a day's per-ticker metrics in the shape processor.rank_stocks expects.'''
+    rows = conn.execute(
+        'SELECT ticker, price, pct_change, earnings_yield, roc FROM ticker_metrics WHERE date = ?',
+        (date,),
+    ).fetchall()
+    return {
+        ticker: {'Ticker': ticker, 'Price': price, 'PctChange': pct_change, 'EarningsYield': earnings_yield, 'ROC': roc}
+        for ticker, price, pct_change, earnings_yield, roc in rows
+    }
+
+class RankingWriter:
+    '''Buffer ranking rows and write them in batches inside a single transaction.
+
+    Use as a context manager: everything added is committed together on exit,
+    or rolled back if the block raises.
+    '''
+
+    def __init__(self, db_path: str = DB_PATH, batch_size: int = 5000, conn: Optional[sqlite3.Connection] = None):
+        self.batch_size = batch_size
+        self.owns_conn = conn is None
+        self.conn = conn or connect(db_path)
+        self.buffer: List[RankingRow] = []
+        self.rows_written = 0
+
+    def add(self, date: str, ticker: str, earnings_yield: float, roc: float, rank: int):
+        self.buffer.append((date, ticker, earnings_yield, roc, rank))
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def add_many(self, rows: Iterable[RankingRow]):
+        for row in rows:
+            self.add(*row)
+
+    def flush(self):
+        if self.buffer:
+            upsert_rankings(self.conn, self.buffer)
+            self.rows_written += len(self.buffer)
+            self.buffer = []
+
+    def __enter__(self):
+        self.conn.execute('BEGIN')
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.flush()
+                # A bulk load can touch any date, so recompute streaks once at the end
+                rebuild_top10_streaks(self.conn)
+                self.conn.commit()
+            else:
+                self.conn.rollback()
+        finally:
+            if self.owns_conn:
+                self.conn.close()
@@ -0,0 +1,110 @@
+from dataclasses import dataclass, field
+import json
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+from utils.config import WATCHLISTS_FILE
+from utils.db import DB_PATH, load_top10_changes, open_db
+from utils.news_client import load_news
+
+@dataclass
+class DigestStock:
+    ticker: str
+    earnings_yield: float
+    roc: float
+    rank: int
+    top10_days: int = 0
+    streak: int = 0  # Consecutive ranking dates in the top 10, up to and including this one
+    news: List[Dict] = field(default_factory=list)
+
+@dataclass
+class DigestData:
+    '''Everything the digest renders, assembled up front so rendering does no I/O.
+
+    `watchlist` holds the latest ranking of every ticker on any recipient's
+    watchlist, whether or not it made the top list. `entered` and `dropped`
+    are the tickers that joined and left the top 10 on `date`.
+    '''
+    date: Optional[str]
+    stocks: List[DigestStock]
+    watchlist: Dict[str, DigestStock] = field(default_factory=dict)
+    entered: List[str] = field(default_factory=list)
+    dropped: List[str] = field(default_factory=list)
+
+def fetch_top_rankings(conn: sqlite3.Connection, limit: int = 10) -> tuple[Optional[str], List[tuple]]:
+    '''Return the latest ranking date and its top `limit` (ticker, earnings_yield, roc, rank) rows.'''
+    date = conn.execute('SELECT MAX(date) FROM stock_rankings').fetchone()[0]
+    if date is None:
+        return None, []
+    rows = conn.execute('''
+        SELECT ticker, earnings_yield, roc, rank
+        FROM stock_rankings
+        WHERE date = ?
+        ORDER BY rank
+        LIMIT ?
+    ''', (date, limit)).fetchall()
+    return date, rows
+
+def fetch_top10_days(conn: sqlite3.Connection, tickers: List[str]) -> Dict[str, int]:
+    '''The days each ticker was ranked in the top 10, read from the maintained ticker_streaks table.'''
+    return {ticker: top10_days for ticker, (top10_days, _) in fetch_streaks(conn, None, tickers).items()}
+
+def fetch_streaks(conn: sqlite3.Connection, date: Optional[str], tickers: List[str]) -> Dict[str, Tuple[int, int]]:
+    '''(top10_days, streak) per ticker, by primary key; a streak counts only if it is still running on `date`.'''
+    rows = conn.execute('''
+        SELECT ticker, top10_days, CASE WHEN last_top10_date = ? THEN streak ELSE 0 END
+        FROM ticker_streaks
+        WHERE ticker IN (SELECT value FROM json_each(?))
+    ''', (date, json.dumps(tickers))).fetchall()
+    return {ticker: (top10_days, streak) for ticker, top10_days, streak in rows}
+
+def fetch_rankings(conn: sqlite3.Connection, date: str, tickers: Iterable[str]) -> List[tuple]:
+    '''(ticker, earnings_yield, roc, rank) rows for the given tickers on `date`, for all tickers in one query.'''
+    return conn.execute('''
+        SELECT ticker, earnings_yield, roc, rank
+        FROM stock_rankings
+        WHERE date = ? AND ticker IN (SELECT value FROM json_each(?))
+        ORDER BY rank
+    ''', (date, json.dumps(sorted(set(tickers))))).fetchall()
+
+def load_digest_data(db_path: str = DB_PATH, limit: int = 10, watchlist_tickers: Iterable[str] = ()) -> DigestData:
+    '''Assemble the top stocks and watchlist stocks, their top-10 streaks and their stored news.
+
+    Uses a fixed number of queries over one connection however many stocks
+    are shown, and reads news stored by the run instead of calling NewsAPI.
+    '''
+    with open_db(db_path) as conn:
+        date, rows = fetch_top_rankings(conn, limit)
+        watchlist_rows = fetch_rankings(conn, date, watchlist_tickers) if date else []
+        tickers = sorted({row[0] for row in [*rows, *watchlist_rows]})
+        streaks = fetch_streaks(conn, date, tickers)
+        entered, dropped = load_top10_changes(conn, date) if date else ([], [])
+        news = load_news(conn, date, tickers) if date else {}
+
+    def stock(row: tuple) -> DigestStock:
+        ticker, earnings_yield, roc, rank = row
+        top10_days, streak = streaks.get(ticker, (0, 0))
+        return DigestStock(
+            ticker=ticker,
+            earnings_yield=earnings_yield,
+            roc=roc,
+            rank=rank,
+            top10_days=top10_days,
+            streak=streak,
+            news=news.get(ticker, []),
+        )
+    return DigestData(
+        date=date,
+        stocks=[stock(row) for row in rows],
+        watchlist={row[0]: stock(row) for row in watchlist_rows},
+        entered=entered,
+        dropped=dropped,
+    )
+
+def load_watchlists(path: str = WATCHLISTS_FILE) -> Dict[str, List[str]]:
+    '''Per-recipient watchlists from a JSON file of {"email": ["TICKER", ...]}; empty if there is none.'''
+    try:
+        with open(path) as f:
+            watchlists = json.load(f)
+    except FileNotFoundError:
+        return {}
+    return {recipient: [ticker.upper() for ticker in tickers] for recipient, tickers in watchlists.items()}
@@ -1,12 +1,19 @@
+import heapq
+import itertools
+import logging
 import smtplib
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
 from datetime import datetime
 import time
-from utils.config import SMTP_USER, SMTP_PASSWORD
+from typing import Callable, Dict, Iterable, List, Optional, Union
+from utils.config import SMTP_HOST, SMTP_PASSWORD, SMTP_PORT, SMTP_USE_SSL, SMTP_USER
+from utils.digest import load_digest_data, load_watchlists
+from utils.email_template import DigestRenderer, generate_email_content
+from utils.instrumentation import count
 
-def send_email(to: str, subject: str, plain_text: str, html_content: str) -> bool:
-    '''Send an email with both plain text and HTML content.'''
+def build_message(to: str, subject: str, plain_text: str, html_content: str) -> MIMEMultipart:
+    '''Build a message with both plain text and HTML content.'''
     msg = MIMEMultipart('alternative')
     msg['Subject'] = subject
     msg['From'] = SMTP_USER
@@ -15,23 +22,156 @@ def send_email(to: str, subject: str, plain_text: str, html_content: str) -> boo
     # Attach plain text and HTML content
     msg.attach(MIMEText(plain_text, 'plain'))
     msg.attach(MIMEText(html_content, 'html'))
+    return msg
+
+class Mailer:
+    '''Send batches of messages over one authenticated SMTP session.
+
+    Failed messages are put back on a retry schedule with exponential backoff
+    while the rest of the batch keeps sending; the mailer only waits when
+    nothing but retries are left. The connection is reopened after it drops.
+    '''
+
+    def __init__(
+        self,
+        host: str = SMTP_HOST,
+        port: int = SMTP_PORT,
+        user: Optional[str] = SMTP_USER,
+        password: Optional[str] = SMTP_PASSWORD,
+        use_ssl: bool = SMTP_USE_SSL,
+        max_attempts: int = 3,
+        retry_delay: float = 30.0,
+        timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.host = host
+        self.port = port
+        self.user = user
+        self.password = password
+        self.use_ssl = use_ssl
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.timeout = timeout
+        self.clock = clock
+        self.sleep = sleep
+        self.server: Optional[smtplib.SMTP] = None
+
+    def connect(self) -> smtplib.SMTP:
+        '''Return the open session, connecting and logging in if needed.'''
+        if self.server is None:
+            smtp_class = smtplib.SMTP_SSL if self.use_ssl else smtplib.SMTP
+            server = smtp_class(self.host, self.port, timeout=self.timeout)
+            try:
+                if self.user and self.password:
+                    server.login(self.user, self.password)
+            except Exception:
+                server.close()
+                raise
+            self.server = server
+        return self.server
+
+    def close(self):
+        if self.server is not None:
+            try:
+                self.server.quit()
+            except smtplib.SMTPException:
+                self.server.close()
+            except OSError:
+                pass
+            self.server = None
+
+    def __enter__(self):
+        return self
 
-    # Retry once after 5 minutes if the first attempt fails
-    for attempt in range(2):
-        try:
-            with smtplib.SMTP_SSL('smtp.gmail.com', 465) as server:
-                server.login(SMTP_USER, SMTP_PASSWORD)
-                server.sendmail(SMTP_USER, to, msg.as_string())
-            return True
-        except smtplib.SMTPException as e:
-            if attempt == 0:
-                time.sleep(300)  # Wait 5 minutes before retrying
+    def __exit__(self, *exc):
+        self.close()
+
+    def _drop_connection(self):
+        if self.server is not None:
+            try:
+                self.server.close()
+            except OSError:
+                pass
+            self.server = None
+
+    def send_batch(self, messages: Iterable[MIMEMultipart]) -> Dict[str, bool]:
+        '''Send every message, retrying failures with backoff. Returns delivery status by recipient.'''
+        results: Dict[str, bool] = {}
+        order = itertools.count()
+        now = self.clock()
+        # (due time, sequence, attempt, message); the sequence keeps heap ordering stable
+        schedule = [(now, next(order), 1, msg) for msg in messages]
+        heapq.heapify(schedule)
+
+        while schedule:
+            due, _, attempt, msg = heapq.heappop(schedule)
+            wait = due - self.clock()
+            if wait > 0:
+                self.sleep(wait)  # Only retries are left, and none is due yet
+            recipient = msg['To']
+            try:
+                self.connect().send_message(msg)
+                results[recipient] = True
+                continue
+            except smtplib.SMTPRecipientsRefused as e:
+                if any(code >= 500 for code, _ in e.recipients.values()):
+                    logging.error(f'Recipient refused, not retrying {recipient}: {e}')
+                    results[recipient] = False
+                    continue
+                # 4xx replies are temporary (greylisting, mailbox busy)
+                logging.error(f'Recipient temporarily refused {recipient}: {e}')
+                error = e
+            except smtplib.SMTPAuthenticationError as e:
+                # Every later login would fail the same way, so give up on the whole batch
+                logging.error(f'SMTP login failed, not sending to {len(schedule) + 1} remaining recipients: {e}')
+                self._drop_connection()
+                results[recipient] = False
+                for _, _, _, pending in schedule:
+                    results[pending['To']] = False
+                break
+            except (smtplib.SMTPServerDisconnected, smtplib.SMTPConnectError) as e:
+                logging.error(f'SMTP connection failed while sending to {recipient}: {e}')
+                self._drop_connection()
+                error = e
+            except smtplib.SMTPException as e:
+                logging.error(f'Failed to send email to {recipient}: {e}')
+                error = e
+            except OSError as e:
+                # Socket-level failure; SMTPException also derives from OSError, so this comes last
+                logging.error(f'SMTP connection failed while sending to {recipient}: {e}')
+                self._drop_connection()
+                error = e
+
+            if attempt < self.max_attempts:
+                count('email_retries')
+                delay = self.retry_delay * 2 ** (attempt - 1)
+                heapq.heappush(schedule, (self.clock() + delay, next(order), attempt + 1, msg))
             else:
-                raise e
-    return False
+                logging.error(f'Giving up on {recipient} after {attempt} attempts: {error}')
+                results[recipient] = False
+        for delivered in results.values():
+            count('emails', status='sent' if delivered else 'failed')
+        return results
+
+def send_email(to: str, subject: str, plain_text: str, html_content: str) -> bool:
+    '''Send an email with both plain text and HTML content.'''
+    with Mailer() as mailer:
+        return mailer.send_batch([build_message(to, subject, plain_text, html_content)])[to]
+
+def send_daily_digest(to: Union[str, List[str]], watchlists: Optional[Dict[str, List[str]]] = None) -> bool:
+    '''Send the daily digest email to one recipient or a distribution list.
 
-def send_daily_digest(to: str) -> bool:
-    '''Send the daily digest email.'''
+    Recipients with a watchlist (from WATCHLISTS_FILE by default) also get a
+    section for their own tickers; every digest is rendered from one snapshot.
+    '''
+    recipients = [to] if isinstance(to, str) else list(to)
+    watchlists = load_watchlists() if watchlists is None else watchlists
     subject = f'Magic Formula Daily Digest – {datetime.now().strftime('%Y-%m-%d')}'
-    plain_text, html_content = generate_email_content()
-    return send_email(to, subject, plain_text, html_content)
+    digest = load_digest_data(watchlist_tickers={ticker for recipient in recipients for ticker in watchlists.get(recipient, [])})
+    renderer = DigestRenderer(digest)
+    with Mailer() as mailer:
+        results = mailer.send_batch(
+            build_message(recipient, subject, *renderer.render(watchlists.get(recipient, []))) for recipient in recipients
+        )
+    return bool(results) and all(results.values())
@@ -1,84 +1,103 @@
-from datetime import datetime, timedelta
-import sqlite3
-from typing import List, Dict
-from pathlib import Path
+from html import escape as html_escape
+from typing import Dict, Iterable, Optional, Tuple
+from utils.digest import DigestData, DigestStock, load_digest_data
 
-def fetch_top_stocks(db_path: str = 'data/history.db') -> List[Dict]:
-    '''Fetch the top 10 stocks from the SQLite database.'''
-    with sqlite3.connect(db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT ticker, earnings_yield, roc, rank
-            FROM stock_rankings
-            WHERE date = (SELECT MAX(date) FROM stock_rankings)
-            ORDER BY rank
-            LIMIT 10
-        ''')
-        return [
-            {'ticker': row[0], 'earnings_yield': row[1], 'roc': row[2], 'rank': row[3]}
-            for row in cursor.fetchall()
-        ]
+TABLE_HEADER = '''    <tr>
+        <th>Ticker</th>
+        <th>Earnings Yield</th>
+        <th>ROC</th>
+        <th>Why This Stock?</th>
+        <th>News</th>
+    </tr>
+'''
 
-def fetch_consistency(ticker: str, db_path: str = 'data/history.db') -> int:
-    '''Fetch the number of days a stock has been in the top 10.'''
-    with sqlite3.connect(db_path) as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT COUNT(DISTINCT date)
-            FROM stock_rankings
-            WHERE ticker = ? AND rank <= 10
-        ''', (ticker,))
-        return cursor.fetchone()[0]
+def escape(value) -> str:
+    '''html.escape for any value, skipping its replace passes when there is nothing to escape.'''
+    value = str(value)
+    if '&' in value or '<' in value or '>' in value or '"' in value or "'" in value:
+        return html_escape(value, quote=True)
+    return value
 
-def generate_email_content() -> tuple[str, str]:
-    '''Generate plain text and HTML email content for the top 10 stocks.'''
-    top_stocks = fetch_top_stocks()
-    email_text = 'Top 10 Stocks Today:\n\n'
-    email_html = '''
-        <h1>Top 10 Stocks Today</h1>
-        <table border='1'>
-            <tr>
-                <th>Ticker</th>
-                <th>Earnings Yield</th>
-                <th>ROC</th>
-                <th>Why This Stock?</th>
-                <th>News</th>
-            </tr>
+def safe_url(url: str) -> str:
+    '''Pass through http(s) links only, so a stored URL cannot smuggle in javascript: and the like.'''
+    return url if url.startswith(('https://', 'http://')) or url.lower().startswith(('http://', 'https://')) else '#'
+
+def render_stock(stock: DigestStock) -> Tuple[str, str]:
+    '''One stock's plain text block and HTML table row; the HTML escapes everything from the database or news API.'''
+    earnings_yield, roc, roc_short = f'{stock.earnings_yield:.2f}', f'{stock.roc:.2f}', f'{stock.roc:.1f}'
+    streak = f', the last {stock.streak} in a row' if stock.streak else ''
+    recommendation = f'Ranked top 10 for {stock.top10_days} days{streak}'
+    news_text, news_html = [], []
+    for article in stock.news:
+        title, source = article['title'], article['source']['name']
+        news_text.append(f'- {title} ({source})\n')
+        news_html.append(f'<li>{escape(title)} (<a href="{escape(safe_url(article['url']))}">{escape(source)}</a>)</li>')
+    text = f'''Ticker: {stock.ticker}
+Earnings Yield: {earnings_yield}
+ROC: {roc}%
+Why This Stock?: High ROC of {roc_short}%
+Recommendation: {recommendation}
+News:
+{''.join(news_text)}
+'''
+    html = f'''    <tr>
+        <td>{escape(stock.ticker)}</td>
+        <td>{earnings_yield}</td>
+        <td>{roc}%</td>
+        <td>High ROC of {roc_short}%<br>{recommendation}</td>
+        <td><ul>{''.join(news_html)}</ul></td>
+    </tr>
+'''
+    return text, html
+
+class DigestRenderer:
+    '''Render personalized digests for many recipients from one shared DigestData snapshot.
+
+    The top-stocks section is rendered once up front, and each stock's row the
+    first time any recipient needs it, so each further recipient only costs
+    joining their own watchlist rows into the layout.
     '''
 
-    for stock in top_stocks:
-        consistency = fetch_consistency(stock['ticker'])
-        why_stock = f'High ROC of {stock['roc']:.1f}%'
-        recommendation = f'Ranked top 10 for {consistency} days'
+    def __init__(self, digest: DigestData):
+        self.digest = digest
+        self.rows: Dict[str, Tuple[str, str]] = {}
+        self.top_text, self.top_html = self._section(digest.stocks)
+        self.changes_text = self.changes_html = ''
+        for label, tickers in [('New in the top 10', digest.entered), ('Dropped out of the top 10', digest.dropped)]:
+            if tickers:
+                self.changes_text += f'{label}: {', '.join(tickers)}\n'
+                self.changes_html += f'<p>{label}: {escape(', '.join(tickers))}</p>\n'
+
+    def _row(self, stock: DigestStock) -> Tuple[str, str]:
+        row = self.rows.get(stock.ticker)
+        if row is None:
+            row = self.rows[stock.ticker] = render_stock(stock)
+        return row
 
-        # Fetch news headlines
-        news = fetch_news(stock['ticker'])
-        news_text = '\n'.join(f'- {article['title']} ({article['source']['name']})' for article in news)
-        news_html = '<ul>' + ''.join(
-            f'<li>{article['title']} (<a href='{article['url']}'>{article['source']['name']}</a>)</li>'
-            for article in news
-        ) + '</ul>'
+    def _section(self, stocks: Iterable[DigestStock]) -> Tuple[str, str]:
+        rows = [self._row(stock) for stock in stocks]
+        return ''.join(text for text, _ in rows), ''.join(html for _, html in rows)
 
-        # Add to email content
-        email_text += f'''
-            Ticker: {stock['ticker']}
-            Earnings Yield: {stock['earnings_yield']:.2f}
-            ROC: {stock['roc']:.2f}%
-            Why This Stock?: {why_stock}
-            Recommendation: {recommendation}
-            News:
-            {news_text}
-            \n
-        '''
-        email_html += f'''
-            <tr>
-                <td>{stock['ticker']}</td>
-                <td>{stock['earnings_yield']:.2f}</td>
-                <td>{stock['roc']:.2f}%</td>
-                <td>{why_stock}<br>{recommendation}</td>
-                <td>{news_html}</td>
-            </tr>
-        '''
+    def render(self, watchlist: Iterable[str] = ()) -> Tuple[str, str]:
+        '''Plain text and HTML for a recipient following `watchlist` (tickers, in their order).'''
+        text = f'Top 10 Stocks Today:\n\n{self.top_text}\n{self.changes_text}'
+        html = f'<h1>Top 10 Stocks Today</h1>\n<table border="1">\n{TABLE_HEADER}{self.top_html}</table>\n{self.changes_html}'
+        watchlist = list(watchlist)
+        if watchlist:
+            watchlist_text, watchlist_html = self._section(
+                self.digest.watchlist[ticker] for ticker in watchlist if ticker in self.digest.watchlist
+            )
+            text += f'Your Watchlist:\n\n{watchlist_text}\n'
+            html += f'<h2>Your Watchlist</h2>\n<table border="1">\n{TABLE_HEADER}{watchlist_html}</table>\n'
+            missing = ', '.join(ticker for ticker in watchlist if ticker not in self.digest.watchlist)
+            if missing:
+                text += f'Not ranked today: {missing}\n'
+                html += f'<p>Not ranked today: {escape(missing)}</p>\n'
+        return text, html
 
-    email_html += '</table>'
-    return email_text, email_html
+def generate_email_content(digest: Optional[DigestData] = None, watchlist: Iterable[str] = ()) -> Tuple[str, str]:
+    '''Generate plain text and HTML email content for the top 10 stocks and an optional watchlist.'''
+    watchlist = list(watchlist)
+    if digest is None:
+        digest = load_digest_data(watchlist_tickers=watchlist)
+    return DigestRenderer(digest).render(watchlist)
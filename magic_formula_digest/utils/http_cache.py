@@ -0,0 +1,125 @@
+from datetime import datetime, time as dt_time, timedelta
+import hashlib
+import json
+from pathlib import Path
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from zoneinfo import ZoneInfo
+import zlib
+from utils.instrumentation import count
+
+MARKET_TZ = ZoneInfo('America/New_York')
+MARKET_CLOSE = dt_time(16, 0)
+
+# Query parameters that identify the caller rather than the resource
+UNKEYED_PARAMS = {'apikey', 'apiKey'}
+
+def cache_key(url: str, params: Dict) -> str:
+    '''Key a request on its endpoint and parameters, ignoring credentials.'''
+    keyed = sorted((k, str(v)) for k, v in params.items() if k not in UNKEYED_PARAMS)
+    return hashlib.sha256(json.dumps([url, keyed]).encode()).hexdigest()
+
+def seconds_until_market_close(now: Optional[datetime] = None) -> float:
+    '''Seconds until the next weekday 4pm New York close, when a new daily bar appears.'''
+    now = (now or datetime.now(MARKET_TZ)).astimezone(MARKET_TZ)
+    close = datetime.combine(now.date(), MARKET_CLOSE, tzinfo=MARKET_TZ)
+    if now >= close:
+        close += timedelta(days=1)
+    while close.weekday() >= 5:
+        close += timedelta(days=1)
+    return (close - now).total_seconds()
+
+def encode_payload(payload: Dict) -> bytes:
+    '''Compress a payload the way ResponseCache stores it.'''
+    return zlib.compress(json.dumps(payload, separators=(',', ':')).encode())
+
+def decode_payload(blob: bytes) -> Dict:
+    '''Decode a payload as stored by ResponseCache.'''
+    return json.loads(zlib.decompress(blob))
+
+class ResponseCache:
+    '''On-disk cache of JSON API responses with per-entry TTLs and LRU eviction by size.'''
+
+    def __init__(self, db_path: str = 'data/http_cache.db', max_bytes: int = 256 * 1024 * 1024):
+        db_path = Path(db_path)
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('''
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                payload BLOB NOT NULL,
+                size INTEGER NOT NULL,
+                expires_at REAL NOT NULL,
+                accessed_at REAL NOT NULL
+            )
+        ''')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS idx_responses_accessed_at ON responses (accessed_at)')
+        self.conn.commit()
+        self.total_bytes = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+
+    def get(self, key: str) -> Optional[Dict]:
+        '''Return the cached payload for `key`, or None if missing or expired.'''
+        blob = self.get_raw(key)
+        return None if blob is None else decode_payload(blob)
+
+    def get_raw(self, key: str) -> Optional[bytes]:
+        '''Return the still-compressed payload for `key`, leaving decoding to the caller (e.g. another process).'''
+        now = time.time()
+        with self.lock:
+            row = self.conn.execute('SELECT payload, size, expires_at FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            payload, size, expires_at = row
+            if expires_at <= now:
+                self.conn.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self.conn.commit()
+                self.total_bytes -= size
+                return None
+            self.conn.execute('UPDATE responses SET accessed_at = ? WHERE key = ?', (now, key))
+            self.conn.commit()
+        return payload
+
+    def set(self, key: str, payload: Dict, ttl: float):
+        '''Store `payload` under `key` for `ttl` seconds, evicting least recently used entries if over size.'''
+        blob = encode_payload(payload)
+        now = time.time()
+        with self.lock:
+            previous = self.conn.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            self.conn.execute(
+                'INSERT OR REPLACE INTO responses (key, payload, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                (key, blob, len(blob), now + ttl, now),
+            )
+            self.total_bytes += len(blob) - (previous[0] if previous else 0)
+            if self.total_bytes > self.max_bytes:
+                self._evict(now)
+            self.conn.commit()
+
+    def _evict(self, now: float):
+        '''Drop expired entries, then the least recently used ones, until 90% of max_bytes.'''
+        self.conn.execute('DELETE FROM responses WHERE expires_at <= ?', (now,))
+        target = self.max_bytes * 0.9
+        total = self.conn.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        if total > target:
+            evict = []
+            for key, size in self.conn.execute('SELECT key, size FROM responses ORDER BY accessed_at'):
+                if total <= target:
+                    break
+                evict.append((key,))
+                total -= size
+            self.conn.executemany('DELETE FROM responses WHERE key = ?', evict)
+            count('http_cache_evictions', len(evict))
+        self.total_bytes = total
+
+    def clear(self):
+        with self.lock:
+            self.conn.execute('DELETE FROM responses')
+            self.conn.commit()
+            self.total_bytes = 0
+
+    def close(self):
+        self.conn.close()
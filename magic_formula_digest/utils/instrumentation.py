@@ -0,0 +1,196 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+import itertools
+import json
+import logging
+import os
+from pathlib import Path
+import threading
+import time
+from typing import Dict, Iterator, Optional, Tuple
+
+METRIC_PREFIX = 'magic_formula_'
+# Upper bounds in seconds, from a cache hit to a rate-limited ticker fetch
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300)
+LOG_FORMAT = '%(asctime)s - %(levelname)s - %(threadName)s - %(message)s'
+
+Labels = Tuple[Tuple[str, str], ...]
+
+_current_span: ContextVar[Optional[int]] = ContextVar('current_span', default=None)
+_span_ids = itertools.count(1)
+
+def setup_logging(log_path: str = 'data/system.log', error_path: str = 'data/error.log', level: int = logging.INFO):
+    '''Send INFO and above to `log_path` and errors to `error_path`. Call once, from the entry point.'''
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+        handler.close()
+    for path, handler_level in ((log_path, level), (error_path, logging.ERROR)):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        handler = logging.FileHandler(path)
+        handler.setLevel(handler_level)
+        handler.setFormatter(logging.Formatter(LOG_FORMAT))
+        root.addHandler(handler)
+    root.setLevel(level)
+
+def _labels(labels: Dict) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+def _format_labels(labels: Labels, extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = [*labels, *extra]
+    if not pairs:
+        return ''
+    escaped = (value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + '}'
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+class Instrumentation:
+    '''Counters, latency histograms and spans for one process.
+
+    Finished spans are appended to a JSON-lines file as they happen, so a run
+    that dies still leaves its trace. Counters and histograms are written on
+    export() to the same file and to a Prometheus textfile.
+    '''
+
+    def __init__(self, events_path: Optional[str] = None, prometheus_path: Optional[str] = None):
+        self.events_path = events_path
+        self.prometheus_path = prometheus_path
+        self.lock = threading.Lock()
+        self.counters: Dict[Tuple[str, Labels], float] = {}
+        self.histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self.events_file = None
+        if events_path:
+            Path(events_path).parent.mkdir(parents=True, exist_ok=True)
+            self.events_file = open(events_path, 'a', buffering=1)
+
+    def count(self, name: str, value: float = 1, **labels):
+        key = (name, _labels(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _labels(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def emit(self, event: Dict):
+        if self.events_file is None:
+            return
+        line = json.dumps(event, default=str)
+        with self.lock:
+            self.events_file.write(line + '\n')
+
+    @contextmanager
+    def span(self, name: str, metric_labels: Optional[Dict] = None, **attributes) -> Iterator[Dict]:
+        '''Time a block as a named span nested under the current one.
+
+        The duration goes into the `<name>_seconds` histogram, labelled only by
+        `metric_labels` so that per-ticker attributes stay out of the metrics.
+        The yielded dict can be updated with attributes discovered inside the block.
+        '''
+        span_id = next(_span_ids)
+        parent = _current_span.get()
+        token = _current_span.set(span_id)
+        started_at = time.time()
+        start = time.perf_counter()
+        status = 'ok'
+        try:
+            yield attributes
+        except BaseException as e:
+            status = 'error'
+            attributes['error'] = f'{type(e).__name__}: {e}'
+            raise
+        finally:
+            duration = time.perf_counter() - start
+            _current_span.reset(token)
+            self.observe(f'{name}_seconds', duration, **(metric_labels or {}))
+            self.emit({
+                'type': 'span', 'name': name, 'id': span_id, 'parent': parent,
+                'start': started_at, 'duration': round(duration, 6), 'status': status,
+                **(metric_labels or {}), **attributes,
+            })
+
+    def snapshot(self) -> Dict:
+        with self.lock:
+            return {
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value} for (name, labels), value in sorted(self.counters.items())],
+                'histograms': [
+                    {'name': name, 'labels': dict(labels), 'count': histogram.count, 'sum': histogram.sum,
+                     'buckets': dict(zip([*map(str, histogram.buckets), '+Inf'], itertools.accumulate(histogram.counts)))}
+                    for (name, labels), histogram in sorted(self.histograms.items())
+                ],
+            }
+
+    def prometheus_text(self) -> str:
+        '''Counters and histograms in the Prometheus text exposition format.'''
+        lines = []
+        with self.lock:
+            typed = set()
+            for (name, labels), value in sorted(self.counters.items()):
+                metric = f'{METRIC_PREFIX}{name}_total'
+                if metric not in typed:
+                    lines.append(f'# TYPE {metric} counter')
+                    typed.add(metric)
+                lines.append(f'{metric}{_format_labels(labels)} {value:g}')
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                metric = f'{METRIC_PREFIX}{name}'
+                if metric not in typed:
+                    lines.append(f'# TYPE {metric} histogram')
+                    typed.add(metric)
+                for bound, cumulative in zip([*map(str, histogram.buckets), '+Inf'], itertools.accumulate(histogram.counts)):
+                    lines.append(f'{metric}_bucket{_format_labels(labels, (("le", bound),))} {cumulative}')
+                lines.append(f'{metric}_sum{_format_labels(labels)} {histogram.sum:.6f}')
+                lines.append(f'{metric}_count{_format_labels(labels)} {histogram.count}')
+        return '\n'.join(lines) + '\n'
+
+    def export(self):
+        '''Append a metrics snapshot to the events file and rewrite the Prometheus textfile.'''
+        self.emit({'type': 'metrics', 'time': time.time(), **self.snapshot()})
+        if self.prometheus_path:
+            path = Path(self.prometheus_path)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            # The textfile collector may read at any moment, so swap the file in whole
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_text(self.prometheus_text())
+            os.replace(tmp_path, path)
+
+    def close(self):
+        if self.events_file is not None:
+            self.events_file.close()
+            self.events_file = None
+
+_instrumentation = Instrumentation()
+
+def get_instrumentation() -> Instrumentation:
+    return _instrumentation
+
+def configure(events_path: Optional[str] = None, prometheus_path: Optional[str] = None) -> Instrumentation:
+    '''Replace the process-wide instrumentation, e.g. to start writing a run's trace.'''
+    global _instrumentation
+    _instrumentation.close()
+    _instrumentation = Instrumentation(events_path, prometheus_path)
+    return _instrumentation
+
+def count(name: str, value: float = 1, **labels):
+    _instrumentation.count(name, value, **labels)
+
+def observe(name: str, value: float, **labels):
+    _instrumentation.observe(name, value, **labels)
+
+def span(name: str, metric_labels: Optional[Dict] = None, **attributes):
+    return _instrumentation.span(name, metric_labels, **attributes)
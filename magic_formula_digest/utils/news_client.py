@@ -1,49 +1,133 @@
-import requests
-import csv
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from pathlib import Path
+import hashlib
+import json
 import logging
-from utils.config import NEWS_API_KEY
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit, urlunsplit
+import pandas as pd
+import requests
+from utils.api_client import NEWS_API, create_session, get_json, get_session
+from utils.config import NEWS_API_KEY, NEWS_API_URL
+from utils.instrumentation import count
+from utils.rate_limiter import QuotaExceededError
 
-# Configure logging
-logging.basicConfig(
-    filename='data/error.log',
-    level=logging.ERROR,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-)
+NEWS_CACHE_TTL = 6 * 3600
 
-def fetch_news(ticker: str):
+def fetch_news(ticker: str, session: Optional[requests.Session] = None):
     '''Fetch news headlines for a stock ticker using NewsAPI.'''
-    url = 'https://newsapi.org/v2/everything'
     params = {
         'q': ticker,
         'sources': 'bloomberg,reuters,cnbc,marketwatch',
         'apiKey': NEWS_API_KEY,
     }
 
-    try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        return response.json().get('articles', [])
-    except requests.exceptions.RequestException as e:
-        logging.error(f'Failed to fetch news for {ticker}: {e}')
+    payload = get_json(
+        session or get_session(), NEWS_API_URL, params, f'news for {ticker}',
+        provider=NEWS_API, cache_ttl=NEWS_CACHE_TTL,
+    )
+    if payload is None:
         return []
+    return payload.get('articles', [])
+
+def fetch_news_many(tickers: Iterable[str], concurrency: int = 4) -> Dict[str, List[Dict]]:
+    '''Fetch news for many tickers concurrently over one pooled session.
+
+    Tickers that could not be fetched because the daily NewsAPI quota is spent
+    are left out of the result.
+    '''
+    tickers = list(tickers)
+    session = create_session(pool_size=concurrency)
+
+    def fetch(ticker: str) -> Optional[List[Dict]]:
+        try:
+            return fetch_news(ticker, session)
+        except QuotaExceededError as e:
+            logging.error(f'Skipped news for {ticker}: {e}')
+            return None
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='news-fetch') as executor:
+        results = executor.map(fetch, tickers)
+        # Tickers skipped for quota are left out so a later run fetches them
+        return {ticker: articles for ticker, articles in zip(tickers, results) if articles is not None}
+
+def url_hash(url: str) -> str:
+    '''Identify an article by its URL, ignoring case in the host, fragments and trailing slashes.'''
+    parts = urlsplit(url.strip())
+    normalized = urlunsplit((parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/'), parts.query, ''))
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+def dedupe_articles(news: Dict[str, List[Dict]]) -> Tuple[Dict[str, Dict], List[Tuple[str, str]]]:
+    '''Collapse articles returned for several tickers into one copy per URL.
+
+    Returns the unique articles keyed by URL hash, and (ticker, url_hash) links.
+    '''
+    articles: Dict[str, Dict] = {}
+    links = set()
+    for ticker, ticker_articles in news.items():
+        for article in ticker_articles:
+            if not article.get('url'):
+                continue
+            key = url_hash(article['url'])
+            articles.setdefault(key, article)
+            links.add((ticker, key))
+    return articles, sorted(links)
+
+def store_news(conn: sqlite3.Connection, news: Dict[str, List[Dict]], date: Optional[str] = None) -> int:
+    '''Store fetched news, one row per unique article linked to each ticker. Returns new links stored.'''
+    date = date or datetime.now().strftime('%Y%m%d')
+    articles, links = dedupe_articles(news)
+    cursor = conn.executemany(
+        '''
+        INSERT OR IGNORE INTO news_articles (url_hash, url, title, source, published_at, first_seen)
+        VALUES (?, ?, ?, ?, ?, ?)
+        ''',
+        [
+            (key, article['url'], article.get('title'), (article.get('source') or {}).get('name'), article.get('publishedAt'), date)
+            for key, article in articles.items()
+        ],
+    )
+    count('db_rows_written', cursor.rowcount, table='news_articles')
+    before = conn.total_changes
+    conn.executemany(
+        'INSERT OR IGNORE INTO ticker_news (ticker, date, url_hash) VALUES (?, ?, ?)',
+        [(ticker, date, key) for ticker, key in links],
+    )
+    stored = conn.total_changes - before
+    count('db_rows_written', stored, table='ticker_news')
+    return stored
+
+def load_news(conn: sqlite3.Connection, date: str, tickers: List[str], limit: int = 5) -> Dict[str, List[Dict]]:
+    '''Load stored news for many tickers in one query, newest first, in NewsAPI article shape.'''
+    rows = conn.execute('''
+        SELECT ticker_news.ticker, news_articles.title, news_articles.source, news_articles.url
+        FROM ticker_news
+        JOIN news_articles ON news_articles.url_hash = ticker_news.url_hash
+        WHERE ticker_news.date = ? AND ticker_news.ticker IN (SELECT value FROM json_each(?))
+        ORDER BY ticker_news.ticker, news_articles.published_at DESC
+    ''', (date, json.dumps(tickers))).fetchall()
+    news: Dict[str, List[Dict]] = {}
+    for ticker, title, source, url in rows:
+        ticker_news = news.setdefault(ticker, [])
+        if len(ticker_news) < limit:
+            ticker_news.append({'title': title, 'source': {'name': source}, 'url': url})
+    return news
+
+def tickers_with_news(conn: sqlite3.Connection, date: str, tickers: List[str]) -> set:
+    '''Tickers whose news for `date` is already stored, so a rerun need not fetch it again.'''
+    rows = conn.execute(
+        'SELECT DISTINCT ticker FROM ticker_news WHERE date = ? AND ticker IN (SELECT value FROM json_each(?))',
+        (date, json.dumps(tickers)),
+    ).fetchall()
+    return {row[0] for row in rows}
 
-def save_news(ticker: str, news: list, output_dir: str = 'data/processed'):
-    '''Save relevant news to a CSV file.'''
-    output_dir = Path(output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
-    date_str = datetime.now().strftime('%Y%m%d')
-    output_file = output_dir / f'news_{date_str}.csv'
-
-    with open(output_file, 'a', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=['Ticker', 'Headline', 'Source', 'URL'])
-        if not output_file.exists():
-            writer.writeheader()
-        for article in news:
-            writer.writerow({
-                'Ticker': ticker,
-                'Headline': article['title'],
-                'Source': article['source']['name'],
-                'URL': article['url'],
-            })
+def news_frame(conn: sqlite3.Connection, date: str) -> pd.DataFrame:
+    '''All stored news links for `date` as a flat frame, one row per (ticker, article).'''
+    return pd.read_sql_query('''
+        SELECT ticker_news.ticker, news_articles.title, news_articles.source, news_articles.url, news_articles.published_at
+        FROM ticker_news
+        JOIN news_articles ON news_articles.url_hash = ticker_news.url_hash
+        WHERE ticker_news.date = ?
+        ORDER BY ticker_news.ticker, news_articles.published_at DESC
+    ''', conn, params=(date,))
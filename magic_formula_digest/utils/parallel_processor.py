@@ -0,0 +1,108 @@
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import itertools
+import logging
+import multiprocessing
+import os
+from typing import Iterable, Iterator, List, Optional, Tuple
+import zlib
+import numpy as np
+import pandas as pd
+from utils.config import PROCESS_WORKERS
+from utils.data_lake import DataLake
+from utils.http_cache import decode_payload
+from utils.price_store import PriceStore
+from utils.processor import RANKED_FIELDS, payload_closes, process_closes
+from utils.stock_client import RawPayload
+from utils.universe import iter_chunks, passes_market_cap
+
+# Columns of the metric arrays returned by workers; the ticker is kept alongside
+METRIC_FIELDS = RANKED_FIELDS[1:-1]
+
+ChunkResult = Tuple[List[str], List[str], np.ndarray]
+
+def process_raw_chunk(
+    chunk: List[RawPayload],
+    min_market_cap: float = 0,
+    lake: Optional[DataLake] = None,
+    date: Optional[str] = None,
+    price_store: Optional[PriceStore] = None,
+) -> Tuple[List[str], np.ndarray]:
+    '''Decode and process one chunk of compressed payloads, typically in a worker process.
+
+    Latest closes come from the price store's close column; a time series
+    payload is only decompressed and parsed for tickers the store lacks.
+    Returns the tickers that produced metrics and a (n, len(METRIC_FIELDS))
+    float64 array of their metrics, which pickles as one buffer. The chunk's
+    overviews are written to the lake from the worker rather than sent back.
+    '''
+    price_store = price_store or PriceStore()
+    tickers, rows, overviews = [], [], []
+    for ticker, overview_blob, time_series_blob in chunk:
+        try:
+            overview = decode_payload(overview_blob)
+            overviews.append(overview)
+            if not passes_market_cap(overview, min_market_cap):
+                continue
+            closes = price_store.last_closes(ticker)
+            if len(closes) < 2:
+                try:
+                    closes = payload_closes(decode_payload(time_series_blob))
+                except (KeyError, StopIteration):
+                    continue
+            processed_data = process_closes(ticker, overview, closes)
+        except (ValueError, zlib.error) as e:
+            logging.error(f'Failed to decode cached data for {ticker}: {e}')
+            continue
+        if processed_data:
+            tickers.append(ticker)
+            rows.append([processed_data[name] for name in METRIC_FIELDS])
+    if lake is not None and overviews:
+        lake.append('overview', date, pd.DataFrame(overviews, dtype=str), part=chunk[0][0])
+    return tickers, np.array(rows, dtype=np.float64).reshape(len(rows), len(METRIC_FIELDS))
+
+def process_many(
+    payloads: Iterable[RawPayload],
+    workers: int = PROCESS_WORKERS,
+    chunk_size: int = 200,
+    min_market_cap: float = 0,
+    lake: Optional[DataLake] = None,
+    date: Optional[str] = None,
+    price_store: Optional[PriceStore] = None,
+) -> Iterator[ChunkResult]:
+    '''Fan compressed payloads out to worker processes in chunks.
+
+    Yields (chunk_tickers, tickers, metrics) per chunk in input order, where
+    chunk_tickers are all tickers sent and tickers/metrics are those that
+    produced metrics. Only a couple of chunks per worker are in flight, so
+    payloads are read lazily. Chunks are processed inline instead when there
+    is only one worker or CPU, or the batch is under two chunks per worker,
+    since spawning the pool would cost more than it saves.
+    '''
+    workers = min(workers, os.cpu_count() or 1)
+    chunks = iter_chunks(payloads, chunk_size)
+    head = list(itertools.islice(chunks, workers * 2)) if workers > 1 else []
+    chunks = itertools.chain(head, chunks)
+    if len(head) < workers * 2:
+        for chunk in chunks:
+            yield ([ticker for ticker, _, _ in chunk], *process_raw_chunk(chunk, min_market_cap, lake, date, price_store))
+        return
+
+    # Spawn rather than fork: the parent runs fetch and rate-limiter threads
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as executor:
+        pending = deque()
+        for chunk in chunks:
+            pending.append(([ticker for ticker, _, _ in chunk], executor.submit(process_raw_chunk, chunk, min_market_cap, lake, date, price_store)))
+            if len(pending) >= workers * 2:
+                chunk_tickers, future = pending.popleft()
+                yield (chunk_tickers, *future.result())
+        while pending:
+            chunk_tickers, future = pending.popleft()
+            yield (chunk_tickers, *future.result())
+
+def metrics_records(tickers: List[str], metrics: np.ndarray) -> List[dict]:
+    '''Turn a worker's metric array back into processor.process_closes dicts.'''
+    return [
+        {'Ticker': ticker, **dict(zip(METRIC_FIELDS, row))}
+        for ticker, row in zip(tickers, metrics.tolist())
+    ]
@@ -0,0 +1,172 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass, field
+from datetime import datetime
+import json
+import logging
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+from utils.db import DB_PATH, open_db
+from utils.instrumentation import span
+
+PENDING, RUNNING, DONE, FAILED, SKIPPED = 'pending', 'running', 'done', 'failed', 'skipped'
+
+@dataclass
+class Stage:
+    name: str
+    run: Callable[['StageContext'], None]
+    depends_on: Tuple[str, ...] = ()
+
+@dataclass
+class StageContext:
+    '''Handed to each stage: which run it belongs to and its per-ticker checkpoints.'''
+    run_id: str
+    stage: str
+    db_path: str = DB_PATH
+    values: Dict = field(default_factory=dict)
+
+    def completed_tickers(self) -> Set[str]:
+        '''Tickers this stage already finished in an earlier attempt at the same run.'''
+        with open_db(self.db_path) as conn:
+            rows = conn.execute(
+                'SELECT ticker FROM pipeline_tickers WHERE run_id = ? AND stage = ?',
+                (self.run_id, self.stage),
+            ).fetchall()
+        return {row[0] for row in rows}
+
+    def mark_tickers_done(self, tickers: Iterable[str], conn=None):
+        '''Checkpoint finished tickers; pass `conn` to commit them with the stage's own writes.'''
+        rows = [(self.run_id, self.stage, ticker) for ticker in tickers]
+        sql = 'INSERT OR IGNORE INTO pipeline_tickers (run_id, stage, ticker) VALUES (?, ?, ?)'
+        if conn is not None:
+            conn.executemany(sql, rows)
+            return
+        with open_db(self.db_path) as conn:
+            conn.executemany(sql, rows)
+
+class Pipeline:
+    '''Run stages as a DAG, each as soon as its dependencies are done, checkpointing in history.db.
+
+    A stage that finished in an earlier attempt at the same run is skipped, so a
+    crashed run resumes where it stopped. `from_stage` forces that stage and
+    everything downstream of it to run again, and requires the stages it
+    depends on to have finished. Stages with no path between them run at the
+    same time.
+    '''
+
+    def __init__(self, stages: List[Stage], run_id: str, db_path: str = DB_PATH, max_workers: int = 4):
+        self.stages = {stage.name: stage for stage in stages}
+        self.run_id = run_id
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self.values: Dict = {}
+        for stage in stages:
+            for dependency in stage.depends_on:
+                if dependency not in self.stages:
+                    raise ValueError(f'Stage {stage.name} depends on unknown stage {dependency}')
+
+    def downstream(self, name: str) -> Set[str]:
+        '''A stage and every stage that depends on it, directly or not.'''
+        result = {name}
+        changed = True
+        while changed:
+            changed = False
+            for stage in self.stages.values():
+                if stage.name not in result and result.intersection(stage.depends_on):
+                    result.add(stage.name)
+                    changed = True
+        return result
+
+    def upstream(self, name: str) -> Set[str]:
+        '''Every stage a stage depends on, directly or not.'''
+        result: Set[str] = set()
+        pending = list(self.stages[name].depends_on)
+        while pending:
+            dependency = pending.pop()
+            if dependency not in result:
+                result.add(dependency)
+                pending.extend(self.stages[dependency].depends_on)
+        return result
+
+    def _statuses(self) -> Dict[str, str]:
+        with open_db(self.db_path) as conn:
+            rows = conn.execute('SELECT stage, status FROM pipeline_stages WHERE run_id = ?', (self.run_id,)).fetchall()
+        return dict(rows)
+
+    def _set_status(self, stage: str, status: str, error: Optional[str] = None):
+        now = datetime.now().isoformat(timespec='seconds')
+        with open_db(self.db_path) as conn:
+            conn.execute('''
+                INSERT INTO pipeline_stages (run_id, stage, status, started_at, finished_at, error)
+                VALUES (?, ?, ?, ?, NULL, ?)
+                ON CONFLICT (run_id, stage) DO UPDATE SET
+                    status = excluded.status,
+                    started_at = CASE WHEN excluded.status = 'running' THEN excluded.started_at ELSE started_at END,
+                    finished_at = CASE WHEN excluded.status = 'running' THEN NULL ELSE excluded.started_at END,
+                    error = excluded.error
+            ''', (self.run_id, stage, status, now, error))
+
+    def _reset(self, stages: Set[str]):
+        with open_db(self.db_path) as conn:
+            names = json.dumps(sorted(stages))
+            conn.execute('DELETE FROM pipeline_stages WHERE run_id = ? AND stage IN (SELECT value FROM json_each(?))', (self.run_id, names))
+            conn.execute('DELETE FROM pipeline_tickers WHERE run_id = ? AND stage IN (SELECT value FROM json_each(?))', (self.run_id, names))
+
+    def _run_stage(self, name: str):
+        self._set_status(name, RUNNING)
+        logging.info(f'Stage {name} started')
+        with span('stage', metric_labels={'stage': name}, run_id=self.run_id):
+            self.stages[name].run(StageContext(self.run_id, name, self.db_path, self.values))
+        self._set_status(name, DONE)
+        logging.info(f'Stage {name} finished')
+
+    def _schedule(self, statuses: Dict[str, str], running: Dict[Future, str], executor: ThreadPoolExecutor):
+        '''Start every pending stage whose dependencies are done; skip those whose dependencies failed.'''
+        progressed = True
+        while progressed:
+            progressed = False
+            for name, stage in self.stages.items():
+                if statuses[name] != PENDING:
+                    continue
+                dependency_statuses = {statuses[dependency] for dependency in stage.depends_on}
+                if dependency_statuses & {FAILED, SKIPPED}:
+                    statuses[name] = SKIPPED
+                    logging.error(f'Stage {name} skipped because a dependency did not finish')
+                    progressed = True
+                elif dependency_statuses <= {DONE}:
+                    statuses[name] = RUNNING
+                    running[executor.submit(self._run_stage, name)] = name
+
+    def run(self, from_stage: Optional[str] = None) -> Dict[str, str]:
+        '''Run every stage that is not already done. Returns the final status of each stage.'''
+        stored = self._statuses()
+        statuses = {name: (DONE if stored.get(name) == DONE else PENDING) for name in self.stages}
+        if from_stage is not None:
+            if from_stage not in self.stages:
+                raise ValueError(f'Unknown stage {from_stage}')
+            # Starting later only makes sense on top of stages that really finished for this run
+            unfinished = sorted(name for name in self.upstream(from_stage) if statuses[name] != DONE)
+            if unfinished:
+                raise ValueError(
+                    f"Cannot start run {self.run_id} from stage {from_stage}: {', '.join(unfinished)} has not finished; "
+                    'run without a start stage to resume'
+                )
+            rerun = self.downstream(from_stage)
+            self._reset(rerun)
+            statuses.update(dict.fromkeys(rerun, PENDING))
+
+        running: Dict[Future, str] = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='stage') as executor:
+            while True:
+                self._schedule(statuses, running, executor)
+                if not running:
+                    break
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    error = future.exception()
+                    if error is None:
+                        statuses[name] = DONE
+                    else:
+                        statuses[name] = FAILED
+                        logging.error(f'Stage {name} failed: {error}')
+                        self._set_status(name, FAILED, str(error))
+        return statuses
@@ -0,0 +1,89 @@
+from datetime import date, datetime, timedelta
+import os
+from pathlib import Path
+from typing import Dict, Optional
+import numpy as np
+
+# Rows of a ticker's price array; each row is one contiguous column of daily values
+COLUMNS = ('date', 'open', 'high', 'low', 'close', 'volume')
+DATE, OPEN, HIGH, LOW, CLOSE, VOLUME = range(len(COLUMNS))
+PAYLOAD_FIELDS = ('1. open', '2. high', '3. low', '4. close', '5. volume')
+
+# outputsize=compact returns the latest 100 bars, roughly 140 calendar days
+COMPACT_WINDOW = timedelta(days=140)
+
+def parse_time_series(time_series: Dict) -> np.ndarray:
+    '''Convert a TIME_SERIES_DAILY payload into a (len(COLUMNS), n) array sorted by date.'''
+    bars = time_series.get('Time Series (Daily)', {})
+    prices = np.empty((len(COLUMNS), len(bars)), dtype=np.float64)
+    for i, (day, bar) in enumerate(bars.items()):
+        prices[DATE, i] = int(day.replace('-', ''))
+        for row, field in enumerate(PAYLOAD_FIELDS, start=OPEN):
+            prices[row, i] = float(bar[field])
+    return prices[:, np.argsort(prices[DATE], kind='stable')]
+
+def merge_prices(existing: Optional[np.ndarray], new: np.ndarray) -> np.ndarray:
+    '''Union two price arrays by date, preferring bars from `new` where both have a date.'''
+    if existing is None or existing.shape[1] == 0:
+        return new
+    combined = np.concatenate([new, existing], axis=1)
+    # np.unique keeps the first occurrence of each date, which is the one from `new`
+    _, first = np.unique(combined[DATE], return_index=True)
+    return combined[:, first]
+
+def to_date(value: float) -> date:
+    return datetime.strptime(str(int(value)), '%Y%m%d').date()
+
+class PriceStore:
+    '''Per-ticker daily price history kept as memory-mappable column arrays.
+
+    Each ticker lives in one .npy file, so reading the last few closes touches
+    only the tail of a single column instead of parsing a JSON history.
+    '''
+
+    def __init__(self, root: str = 'data/prices'):
+        self.root = Path(root)
+
+    def path(self, ticker: str) -> Path:
+        return self.root / f'{ticker}.npy'
+
+    def load(self, ticker: str) -> Optional[np.ndarray]:
+        '''Memory-map a ticker's price array, or None if it has never been stored.'''
+        path = self.path(ticker)
+        if not path.exists():
+            return None
+        return np.load(path, mmap_mode='r')
+
+    def last_date(self, ticker: str) -> Optional[date]:
+        prices = self.load(ticker)
+        if prices is None or prices.shape[1] == 0:
+            return None
+        return to_date(prices[DATE, -1])
+
+    def outputsize(self, ticker: str, today: Optional[date] = None) -> str:
+        '''Request only the compact window once a ticker has been backfilled and is not too stale.'''
+        last = self.last_date(ticker)
+        today = today or date.today()
+        if last is not None and today - last < COMPACT_WINDOW:
+            return 'compact'
+        return 'full'
+
+    def merge(self, ticker: str, time_series: Dict) -> int:
+        '''Merge a TIME_SERIES_DAILY payload into the store. Returns the number of new bars.'''
+        new = parse_time_series(time_series)
+        existing = self.load(ticker)
+        before = 0 if existing is None else existing.shape[1]
+        merged = merge_prices(None if existing is None else np.array(existing), new)
+        self.root.mkdir(parents=True, exist_ok=True)
+        # Write to a temporary file and swap it in, so readers never see a partial array
+        tmp_path = self.path(ticker).with_suffix('.tmp.npy')
+        np.save(tmp_path, merged)
+        os.replace(tmp_path, self.path(ticker))
+        return merged.shape[1] - before
+
+    def last_closes(self, ticker: str, n: int = 2) -> np.ndarray:
+        '''The last `n` closing prices, oldest first.'''
+        prices = self.load(ticker)
+        if prices is None:
+            return np.empty(0, dtype=np.float64)
+        return np.array(prices[CLOSE, -n:])
@@ -1,8 +1,11 @@
-from pathlib import Path
-import csv
 from datetime import datetime
-from typing import Dict, Optional, List
-import sqlite3
+from typing import Dict, Optional, List, Sequence
+import pandas as pd
+from utils.data_lake import DataLake
+from utils.db import DB_PATH, open_db, replace_day_rankings
+from utils.ranking import rank_frame
+
+RANKED_FIELDS = ['Ticker', 'Price', 'PctChange', 'EarningsYield', 'ROC', 'Rank']
 
 def compute_earnings_yield(ebit: float, enterprise_value: float) -> Optional[float]:
     '''Compute earnings yield (EBIT / Enterprise Value).'''
@@ -17,15 +20,24 @@ def compute_roc(ebit: float, net_fixed_assets: float, working_capital: float) ->
         return None
     return ebit / denominator
 
-def process_stock_data(ticker: str, overview: Dict, time_series: Dict) -> Optional[Dict]:
-    '''Process stock data to compute metrics.'''
+def payload_closes(time_series: Dict) -> List[float]:
+    '''The last two closes of a TIME_SERIES_DAILY payload, oldest first like PriceStore.last_closes.'''
+    # Bars are ordered newest first; only the first two are needed
+    bars = iter(time_series['Time Series (Daily)'].values())
+    latest_close = float(next(bars)['4. close'])
+    prev_close = float(next(bars)['4. close'])
+    return [prev_close, latest_close]
+
+def process_closes(ticker: str, overview: Dict, closes: Sequence[float]) -> Optional[Dict]:
+    '''Compute metrics from an overview and the last two closing prices, oldest first.'''
     try:
         ebit = float(overview.get('EBIT', 0))
         enterprise_value = float(overview.get('EnterpriseValue', 0))
         net_fixed_assets = float(overview.get('NetFixedAssets', 0))
         working_capital = float(overview.get('WorkingCapital', 0))
-        latest_close = float(list(time_series['Time Series (Daily)'].values())[0]['4. close'])
-        prev_close = float(list(time_series['Time Series (Daily)'].values())[1]['4. close'])
+        if len(closes) < 2:
+            return None
+        prev_close, latest_close = float(closes[-2]), float(closes[-1])
         pct_change = (latest_close - prev_close) / prev_close * 100
 
         earnings_yield = compute_earnings_yield(ebit, enterprise_value)
@@ -41,46 +53,42 @@ def process_stock_data(ticker: str, overview: Dict, time_series: Dict) -> Option
             'EarningsYield': earnings_yield,
             'ROC': roc,
         }
-    except (KeyError, ValueError):
+    except (ValueError, ZeroDivisionError):
+        return None
+
+def process_stock_data(ticker: str, overview: Dict, time_series: Dict) -> Optional[Dict]:
+    '''Process stock data to compute metrics.'''
+    try:
+        closes = payload_closes(time_series)
+    except (KeyError, ValueError, StopIteration):
         return None
+    return process_closes(ticker, overview, closes)
 
 def rank_stocks(stocks: Dict[str, Dict]) -> List[Dict]:
-    '''Rank stocks by earnings yield and return on capital.'''
-    ranked_stocks = sorted(
-        [stock for stock in stocks.values() if stock],
-        key=lambda x: (x['EarningsYield'], x['ROC']),
-        reverse=True,
-    )
-    for rank, stock in enumerate(ranked_stocks, start=1):
-        stock['Rank'] = rank
-    return ranked_stocks
+    '''Rank stocks by the sum of their earnings yield rank and return on capital rank.'''
+    frame = pd.DataFrame([stock for stock in stocks.values() if stock], columns=RANKED_FIELDS[:-1])
+    ranked = rank_frame(frame)
+    return ranked[RANKED_FIELDS].to_dict('records')
 
-def save_ranked_stocks(stocks: Dict[str, Dict], output_dir: str = 'data/processed'):
-    '''Save processed stock data to a CSV file and SQLite database.'''
+def save_ranked_stocks(stocks: Dict[str, Dict], db_path: str = DB_PATH, date: Optional[str] = None) -> List[Dict]:
+    '''Rank processed stock data and save it to the SQLite database under `date` (default today).'''
     ranked_stocks = rank_stocks(stocks)
-    date_str = datetime.now().strftime('%Y%m%d')
+    date_str = date or datetime.now().strftime('%Y%m%d')
 
-    # Save to CSV
-    output_dir = Path(output_dir)
-    output_dir.mkdir(parents=True, exist_ok=True)
-    output_file = output_dir / f'ranked_stocks_{date_str}.csv'
+    # Save to SQLite, replacing any earlier run from the same day
+    with open_db(db_path) as conn:
+        replace_day_rankings(conn, date_str, [
+            (date_str, stock['Ticker'], stock['EarningsYield'], stock['ROC'], stock['Rank'])
+            for stock in ranked_stocks
+        ])
+    return ranked_stocks
 
-    with open(output_file, 'w', newline='') as f:
-        writer = csv.DictWriter(f, fieldnames=['Ticker', 'Price', 'PctChange', 'EarningsYield', 'ROC', 'Rank'])
-        writer.writeheader()
-        writer.writerows(ranked_stocks)
+def export_ranked_stocks(stocks: Dict[str, Dict], lake: Optional[DataLake] = None, date: Optional[str] = None) -> List[Dict]:
+    '''Rank processed stock data and write it to the lake's rankings dataset under `date` (default today).'''
+    ranked_stocks = rank_stocks(stocks)
+    date_str = date or datetime.now().strftime('%Y%m%d')
 
-    # Save to SQLite
-    with sqlite3.connect('data/history.db') as conn:
-        cursor = conn.cursor()
-        cursor.executemany(
-            '''
-            INSERT INTO stock_rankings (date, ticker, earnings_yield, roc, rank)
-            VALUES (?, ?, ?, ?, ?)
-            ''',
-            [
-                (date_str, stock['Ticker'], stock['EarningsYield'], stock['ROC'], stock['Rank'])
-                for stock in ranked_stocks
-            ],
-        )
-        conn.commit()
+    # Replace any earlier run from the same day
+    lake = lake or DataLake()
+    lake.write('rankings', date_str, pd.DataFrame(ranked_stocks, columns=RANKED_FIELDS))
+    return ranked_stocks
@@ -0,0 +1,71 @@
+from typing import Tuple
+import numpy as np
+import pandas as pd
+
+FUNDAMENTAL_COLUMNS = ['EBIT', 'EnterpriseValue', 'NetFixedAssets', 'WorkingCapital']
+
+def compute_metrics(
+    ebit: np.ndarray,
+    enterprise_value: np.ndarray,
+    net_fixed_assets: np.ndarray,
+    working_capital: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    '''Compute earnings yield and return on capital for whole arrays of tickers.
+
+    Entries with a non-positive denominator come back as NaN, mirroring the
+    None returned by processor.compute_earnings_yield and compute_roc.
+    '''
+    ebit = np.asarray(ebit, dtype=np.float64)
+    enterprise_value = np.asarray(enterprise_value, dtype=np.float64)
+    capital = np.asarray(net_fixed_assets, dtype=np.float64) + np.asarray(working_capital, dtype=np.float64)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        earnings_yield = np.where(enterprise_value > 0, ebit / enterprise_value, np.nan)
+        roc = np.where(capital > 0, ebit / capital, np.nan)
+    return earnings_yield, roc
+
+def valid_mask(earnings_yield: np.ndarray, roc: np.ndarray) -> np.ndarray:
+    '''Tickers eligible for ranking: both metrics defined and non-negative.'''
+    return (earnings_yield >= 0) & (roc >= 0)
+
+def _descending_ranks(values: np.ndarray) -> np.ndarray:
+    '''1-based ranks with the largest value first; ties share the lowest rank.'''
+    order = np.argsort(-values, kind='stable')
+    sorted_values = values[order]
+    # Start a new rank wherever the value changes, otherwise repeat the previous one
+    is_new = np.empty(len(values), dtype=bool)
+    is_new[:1] = True
+    is_new[1:] = sorted_values[1:] != sorted_values[:-1]
+    positions = np.arange(1, len(values) + 1)
+    ranks = np.empty(len(values), dtype=np.int64)
+    ranks[order] = np.maximum.accumulate(np.where(is_new, positions, 0))
+    return ranks
+
+def magic_formula_ranks(earnings_yield: np.ndarray, roc: np.ndarray) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    '''Greenblatt ranking over arrays that have already been filtered with valid_mask.
+
+    Returns (ey_rank, roc_rank, order): each ticker's rank by earnings yield and
+    by return on capital, and the indices that sort tickers by the sum of those
+    two ranks. Ties on the combined score go to the higher earnings yield.
+    '''
+    ey_rank = _descending_ranks(earnings_yield)
+    roc_rank = _descending_ranks(roc)
+    order = np.lexsort((ey_rank, ey_rank + roc_rank))
+    return ey_rank, roc_rank, order
+
+def rank_frame(stocks: pd.DataFrame) -> pd.DataFrame:
+    '''Rank a frame with EarningsYield and ROC columns by the Magic Formula.
+
+    Invalid rows are dropped. The result is sorted best first and gains
+    EarningsYieldRank, ROCRank and Rank (1-based) columns.
+    '''
+    earnings_yield = stocks['EarningsYield'].to_numpy(dtype=np.float64)
+    roc = stocks['ROC'].to_numpy(dtype=np.float64)
+    mask = valid_mask(earnings_yield, roc)
+    ey_rank, roc_rank, order = magic_formula_ranks(earnings_yield[mask], roc[mask])
+    ranked = stocks[mask].assign(EarningsYieldRank=ey_rank, ROCRank=roc_rank).iloc[order]
+    return ranked.assign(Rank=np.arange(1, len(ranked) + 1)).reset_index(drop=True)
+
+def rank_fundamentals(fundamentals: pd.DataFrame) -> pd.DataFrame:
+    '''Compute metrics from raw fundamentals columns, then rank the valid tickers.'''
+    earnings_yield, roc = compute_metrics(*(fundamentals[column].to_numpy() for column in FUNDAMENTAL_COLUMNS))
+    return rank_frame(fundamentals.assign(EarningsYield=earnings_yield, ROC=roc))
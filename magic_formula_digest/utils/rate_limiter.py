@@ -0,0 +1,139 @@
+from dataclasses import dataclass
+from datetime import datetime, timezone
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+class QuotaExceededError(Exception):
+    '''Raised when a provider's daily request budget has been spent.'''
+
+@dataclass(frozen=True)
+class Quota:
+    requests_per_minute: int
+    requests_per_day: int
+
+class TokenBucket:
+    '''Classic token bucket: holds up to `capacity` tokens, refilled continuously.'''
+
+    def __init__(self, capacity: float, refill_per_second: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.clock = clock
+        self.tokens = capacity
+        self.updated = clock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.refill_per_second)
+        self.updated = now
+
+    def try_acquire(self) -> float:
+        '''Take a token if one is available. Returns 0, or the seconds to wait for the next token.'''
+        self._refill()
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.refill_per_second
+
+    def drain(self):
+        '''Empty the bucket, e.g. after the provider reported throttling.'''
+        self._refill()
+        self.tokens = min(self.tokens, 0.0)
+
+class RateLimiter:
+    '''Enforce per-provider requests-per-minute and requests-per-day budgets.
+
+    acquire() blocks until the minute budget allows another request, so callers
+    simply queue up behind it and the pipeline runs at the highest allowed rate.
+    The daily budget resets at midnight UTC, matching the providers' quotas.
+    '''
+
+    def __init__(self, quotas: Dict[str, Quota], clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        self.quotas = quotas
+        self.clock = clock
+        self.sleep = sleep
+        self.lock = threading.Lock()
+        self.buckets = {
+            provider: TokenBucket(quota.requests_per_minute, quota.requests_per_minute / 60, clock)
+            for provider, quota in quotas.items()
+        }
+        self.daily_counts: Dict[str, int] = {provider: 0 for provider in quotas}
+        self.paused_until: Dict[str, float] = {provider: 0.0 for provider in quotas}
+        self.day = self._today()
+
+    @staticmethod
+    def _today() -> str:
+        return datetime.now(timezone.utc).strftime('%Y-%m-%d')
+
+    def _check_day(self):
+        today = self._today()
+        if today != self.day:
+            self.day = today
+            self.daily_counts = {provider: 0 for provider in self.quotas}
+
+    def remaining_today(self, provider: str) -> int:
+        with self.lock:
+            self._check_day()
+            return self.quotas[provider].requests_per_day - self.daily_counts[provider]
+
+    def acquire(self, provider: str):
+        '''Block until a request to `provider` is allowed. Raises QuotaExceededError if the day's budget is spent.'''
+        if provider not in self.quotas:
+            return
+        while True:
+            with self.lock:
+                self._check_day()
+                if self.daily_counts[provider] >= self.quotas[provider].requests_per_day:
+                    raise QuotaExceededError(f'Daily request budget for {provider} is exhausted')
+                wait = self.paused_until[provider] - self.clock()
+                if wait <= 0:
+                    wait = self.buckets[provider].try_acquire()
+                    if wait == 0:
+                        self.daily_counts[provider] += 1
+                        return
+            self.sleep(wait)
+
+    def pause(self, provider: str, seconds: float):
+        '''Hold back all requests to `provider` for `seconds`, e.g. after a throttle response.'''
+        if provider not in self.quotas:
+            return
+        with self.lock:
+            self.paused_until[provider] = max(self.paused_until[provider], self.clock() + seconds)
+            self.buckets[provider].drain()
+
+    def exhaust(self, provider: str):
+        '''Mark the daily budget as spent, e.g. when the provider says so before we counted it.'''
+        if provider not in self.quotas:
+            return
+        with self.lock:
+            self.daily_counts[provider] = self.quotas[provider].requests_per_day
+
+def backoff_delay(attempt: int, base: float = 2.0, cap: float = 60.0) -> float:
+    '''Exponential backoff with full jitter for the given zero-based attempt.'''
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+def throttle_message(payload: Optional[Dict]) -> Optional[str]:
+    '''Return the provider's throttle message if a response body reports rate limiting.'''
+    if not isinstance(payload, dict):
+        return None
+    # Alpha Vantage answers 200 OK with a 'Note' or 'Information' body instead of data
+    for key in ('Note', 'Information'):
+        message = payload.get(key)
+        if isinstance(message, str) and ('call frequency' in message or 'rate limit' in message):
+            return message
+    # NewsAPI reports errors as {'status': 'error', 'code': 'rateLimited', ...}
+    if payload.get('status') == 'error' and payload.get('code') in ('rateLimited', 'apiKeyExhausted'):
+        return f"{payload['code']}: {payload.get('message', '')}"
+    return None
+
+def is_daily_limit(message: str) -> bool:
+    '''Whether a throttle message refers to the daily rather than the per-minute quota.
+
+    Alpha Vantage's per-minute Note also quotes the daily allowance ("5 calls
+    per minute and 500 calls per day"), so per-minute wording wins.
+    '''
+    message = message.lower()
+    if any(marker in message for marker in ('per minute', 'call frequency')):
+        return False
+    return any(marker in message for marker in ('per day', 'daily', '24 hour', 'exhausted'))
@@ -1,60 +1,129 @@
-from requests import get
-from requests.exceptions import RequestException
-import json
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 import logging
-from time import sleep
-from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, Iterator, Optional, Tuple
+import requests
+from utils.api_client import ALPHA_VANTAGE, ALPHA_VANTAGE_URL, create_session, get_json, get_response_cache, get_session
 from utils.config import ALPHA_VANTAGE_API_KEY
+from utils.http_cache import ResponseCache, cache_key, seconds_until_market_close
+from utils.instrumentation import count, span
+from utils.price_store import PriceStore
+
+StockResult = Tuple[str, Optional[Dict], Optional[Dict]]
+RawPayload = Tuple[str, bytes, bytes]
+
+OVERVIEW_CACHE_TTL = 7 * 24 * 3600  # Fundamentals only change with quarterly filings
+
+def cache_ttl(function: str) -> float:
+    '''How long a response for an Alpha Vantage function stays fresh.'''
+    if function == 'OVERVIEW':
+        return OVERVIEW_CACHE_TTL
+    # Daily prices only change once a new bar is published at the close
+    return seconds_until_market_close()
+
+def request_params(function: str, ticker: str, **extra_params) -> Dict:
+    return {'apikey': ALPHA_VANTAGE_API_KEY, 'function': function, 'symbol': ticker, **extra_params}
+
+def fetch_function(session: requests.Session, function: str, ticker: str, **extra_params) -> Optional[Dict]:
+    '''Fetch a single Alpha Vantage endpoint for a ticker.'''
+    params = request_params(function, ticker, **extra_params)
+    return get_json(
+        session, ALPHA_VANTAGE_URL, params, f'{function} data for {ticker}',
+        provider=ALPHA_VANTAGE, cache_ttl=cache_ttl(function),
+    )
+
+def iter_cached_raw_payloads(tickers: Iterable[str], cache: Optional[ResponseCache] = None) -> Iterator[RawPayload]:
+    '''Yield (ticker, overview, time_series) for every ticker with both payloads still cached.
+
+    The payloads stay compressed so that decoding can happen in worker processes.
+    '''
+    cache = cache or get_response_cache()
+    for ticker in tickers:
+        overview = cache.get_raw(cache_key(ALPHA_VANTAGE_URL, request_params('OVERVIEW', ticker)))
+        if overview is None:
+            continue
+        for outputsize in ('compact', 'full'):
+            time_series = cache.get_raw(cache_key(ALPHA_VANTAGE_URL, request_params('TIME_SERIES_DAILY', ticker, outputsize=outputsize)))
+            if time_series is not None:
+                yield ticker, overview, time_series
+                break
+
+def save_stock_data(ticker: str, time_series_data: Dict, price_store: PriceStore):
+    '''Merge a fetched ticker's new daily bars into the price store.'''
+    try:
+        price_store.merge(ticker, time_series_data)
+    except (KeyError, ValueError) as e:
+        logging.error(f'Failed to merge TIME_SERIES_DAILY data for {ticker}: {e}')
+
+def fetch_stock_data(ticker: str, session: Optional[requests.Session] = None, price_store: Optional[PriceStore] = None):
+    session = session or get_session()
+    price_store = price_store or PriceStore()
+    overview_data = fetch_function(session, 'OVERVIEW', ticker)
+    # After the first full backfill only the latest 100 bars are needed
+    time_series_data = fetch_function(session, 'TIME_SERIES_DAILY', ticker, outputsize=price_store.outputsize(ticker))
 
-# Configure logging
-logging.basicConfig(
-    filename='data/error.log',
-    level=logging.ERROR,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-)
-
-def fetch_stock_data(ticker):
-    base_url = 'https://www.alphavantage.co/query'
-    params = {'apikey': ALPHA_VANTAGE_API_KEY}
-
-    # Fetch OVERVIEW data
-    overview_data = None
-    for attempt in range(3):
-        try:
-            response = get(
-                base_url,
-                params={**params, 'function': 'OVERVIEW', 'symbol': ticker},
-            )
-            response.raise_for_status()
-            overview_data = response.json()
-            break
-        except RequestException as e:
-            logging.error(f'Failed to fetch OVERVIEW data for {ticker}: {e}')
-            if attempt < 2:
-                sleep(2)  # Wait before retrying
-
-    # Fetch TIME_SERIES_DAILY data
-    time_series_data = None
-    for attempt in range(3):
-        try:
-            response = get(
-                base_url,
-                params={**params, 'function': 'TIME_SERIES_DAILY', 'symbol': ticker},
-            )
-            response.raise_for_status()
-            time_series_data = response.json()
-            break
-        except RequestException as e:
-            logging.error(f'Failed to fetch TIME_SERIES_DAILY data for {ticker}: {e}')
-            if attempt < 2:
-                sleep(2)  # Wait before retrying
-
-    # Save raw data to file
     if overview_data and time_series_data:
-        raw_data = {'OVERVIEW': overview_data, 'TIME_SERIES_DAILY': time_series_data}
-        raw_file = Path(f'data/raw_stocks/{ticker}.json')
-        raw_file.parent.mkdir(parents=True, exist_ok=True)
-        with open(raw_file, 'w') as f:
-            json.dump(raw_data, f, indent=4)
+        save_stock_data(ticker, time_series_data, price_store)
 
     return overview_data, time_series_data
+
+async def fetch_many_async(
+    tickers: Iterable[str],
+    concurrency: int = 8,
+    session: Optional[requests.Session] = None,
+    price_store: Optional[PriceStore] = None,
+) -> AsyncIterator[StockResult]:
+    '''Fetch OVERVIEW and TIME_SERIES_DAILY for many tickers concurrently.
+
+    At most `concurrency` requests are in flight at once, all sharing one
+    connection pool. Results are yielded as (ticker, overview, time_series)
+    in completion order, not input order. Tickers already in the price store
+    only request the compact latest-100-bars window.
+    '''
+    session = session or create_session(pool_size=concurrency)
+    price_store = price_store or PriceStore()
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix='stock-fetch')
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def fetch(function: str, ticker: str, **extra_params) -> Optional[Dict]:
+        async with semaphore:
+            return await loop.run_in_executor(executor, partial(fetch_function, session, function, ticker, **extra_params))
+
+    async def fetch_ticker(ticker: str) -> StockResult:
+        with span('ticker_fetch', ticker=ticker) as attributes:
+            outputsize = price_store.outputsize(ticker)
+            overview_data, time_series_data = await asyncio.gather(
+                fetch('OVERVIEW', ticker),
+                fetch('TIME_SERIES_DAILY', ticker, outputsize=outputsize),
+            )
+            complete = bool(overview_data and time_series_data)
+            if complete:
+                await loop.run_in_executor(executor, save_stock_data, ticker, time_series_data, price_store)
+            attributes.update(outputsize=outputsize, complete=complete)
+        count('tickers_fetched', status='complete' if complete else 'missing')
+        return ticker, overview_data, time_series_data
+
+    tasks = [asyncio.create_task(fetch_ticker(ticker)) for ticker in tickers]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+def fetch_many(tickers: Iterable[str], concurrency: int = 8, price_store: Optional[PriceStore] = None) -> Iterator[StockResult]:
+    '''Synchronous wrapper around fetch_many_async that streams results as they finish.'''
+    loop = asyncio.new_event_loop()
+    stream = fetch_many_async(tickers, concurrency=concurrency, price_store=price_store)
+    try:
+        while True:
+            try:
+                yield loop.run_until_complete(anext(stream))
+            except StopAsyncIteration:
+                break
+    finally:
+        loop.run_until_complete(stream.aclose())
+        loop.close()
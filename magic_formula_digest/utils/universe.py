@@ -0,0 +1,90 @@
+import csv
+from datetime import datetime
+from itertools import islice
+import logging
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional
+import requests
+from utils.api_client import ALPHA_VANTAGE, ALPHA_VANTAGE_URL, REQUEST_TIMEOUT, get_rate_limiter, get_session
+from utils.config import ALPHA_VANTAGE_API_KEY
+
+DEFAULT_EXCHANGES = ('NYSE', 'NASDAQ')
+DEFAULT_ASSET_TYPES = ('Stock',)
+
+def fetch_listing_status(session: Optional[requests.Session] = None, output_dir: str = 'data/universe') -> Path:
+    '''Download today's LISTING_STATUS CSV of active listings, reusing it if already fetched today.
+
+    The bulk CSV is streamed straight to disk so it is never held in memory.
+    '''
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    output_file = output_dir / f'listing_status_{datetime.now().strftime("%Y%m%d")}.csv'
+    if output_file.exists():
+        return output_file
+
+    session = session or get_session()
+    get_rate_limiter().acquire(ALPHA_VANTAGE)
+    params = {'function': 'LISTING_STATUS', 'state': 'active', 'apikey': ALPHA_VANTAGE_API_KEY}
+    partial_file = output_file.with_suffix('.part')
+    with session.get(ALPHA_VANTAGE_URL, params=params, timeout=REQUEST_TIMEOUT, stream=True) as response:
+        response.raise_for_status()
+        with open(partial_file, 'wb') as f:
+            for block in response.iter_content(chunk_size=64 * 1024):
+                f.write(block)
+
+    # Alpha Vantage reports errors as a JSON body rather than a CSV
+    with open(partial_file) as f:
+        if not f.readline().startswith('symbol,'):
+            partial_file.unlink()
+            raise ValueError('LISTING_STATUS did not return a CSV listing')
+    partial_file.replace(output_file)
+    return output_file
+
+def iter_listings(listing_file: Path) -> Iterator[Dict]:
+    '''Stream rows of a LISTING_STATUS CSV one at a time.'''
+    with open(listing_file, newline='') as f:
+        yield from csv.DictReader(f)
+
+def filter_listings(
+    listings: Iterable[Dict],
+    exchanges: Iterable[str] = DEFAULT_EXCHANGES,
+    asset_types: Iterable[str] = DEFAULT_ASSET_TYPES,
+) -> Iterator[str]:
+    '''Yield the symbols of active listings on the given exchanges and of the given asset types.'''
+    exchanges, asset_types = set(exchanges), set(asset_types)
+    seen = set()
+    for listing in listings:
+        symbol = listing.get('symbol', '').strip()
+        if (
+            symbol
+            and symbol not in seen
+            and listing.get('exchange') in exchanges
+            and listing.get('assetType') in asset_types
+            and listing.get('status', 'Active') == 'Active'
+        ):
+            seen.add(symbol)
+            yield symbol
+
+def passes_market_cap(overview: Optional[Dict], min_market_cap: float) -> bool:
+    '''Whether a company's OVERVIEW reports a market capitalization of at least min_market_cap.'''
+    if not min_market_cap:
+        return True
+    try:
+        return float(overview.get('MarketCapitalization', 0)) >= min_market_cap
+    except (AttributeError, TypeError, ValueError):
+        return False
+
+def iter_chunks(items: Iterable, size: int) -> Iterator[List]:
+    '''Split an iterable into lists of at most `size` items without materializing it.'''
+    iterator = iter(items)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+def build_universe(
+    exchanges: Iterable[str] = DEFAULT_EXCHANGES,
+    asset_types: Iterable[str] = DEFAULT_ASSET_TYPES,
+) -> Iterator[str]:
+    '''Stream the filtered ticker universe from today's LISTING_STATUS snapshot.'''
+    listing_file = fetch_listing_status()
+    logging.info(f'Building ticker universe from {listing_file}')
+    return filter_listings(iter_listings(listing_file), exchanges, asset_types)
@@ -1,28 +1,29 @@
+import sys
+from pathlib import Path
 from dotenv import load_dotenv
-import datasets
 from smolagents import Tool
-from langchain.docstore.document import Document
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.retrievers import BM25Retriever
+from bm25_index import BM25Index, build_index
+from dense_index import DenseIndex, build_dense_index, reciprocal_rank_fusion
+from ingest import ChunkStore, stream_documents, text_splitter
 
 load_dotenv()
 
-knowledge_base = datasets.load_dataset("m-ric/huggingface_doc", split="train")
-knowledge_base = knowledge_base.filter(lambda row: row["source"].startswith("huggingface/transformers"))
+# Built on the first run; later runs map it from disk instead of re-splitting the dataset
+CHUNKS_PATH = Path(__file__).parent / "data" / "transformers_chunks.db"
+INDEX_PATH = Path(__file__).parent / "data" / "transformers_bm25"
+DENSE_INDEX_PATH = Path(__file__).parent / "data" / "transformers_dense"
 
-source_docs = [
-    Document(page_content=doc["text"], metadata={"source": doc["source"].split("/")[1]})
-    for doc in knowledge_base
-]
-
-text_splitter = RecursiveCharacterTextSplitter(
-    chunk_size=500,
-    chunk_overlap=50,
-    add_start_index=True,
-    strip_whitespace=True,
-    separators=["\n\n", "\n", ".", " ", ""],
-)
-docs_processed = text_splitter.split_documents(source_docs)
+# Streams the dataset and re-splits only changed documents; pass --refresh to pick up corpus updates
+if "--refresh" in sys.argv or not BM25Index.exists(INDEX_PATH):
+    with ChunkStore(CHUNKS_PATH) as store:
+        stats = store.sync(stream_documents(), text_splitter())
+        print(f"Synced knowledge base: {stats}")
+        if stats.modified or not BM25Index.exists(INDEX_PATH):
+            build_index(store.chunks(), INDEX_PATH)
+bm25_index = BM25Index(INDEX_PATH)
+# Re-embeds only chunks whose text changed since the last build
+if not DenseIndex.exists(DENSE_INDEX_PATH) or DenseIndex(DENSE_INDEX_PATH).version != bm25_index.version:
+    build_dense_index(bm25_index.texts(), DENSE_INDEX_PATH, version=bm25_index.version)
 
 class RetrieverTool(Tool):
     name = "retriever"
@@ -35,37 +36,43 @@ class RetrieverTool(Tool):
     }
     output_type = "string"
 
-    def __init__(self, docs, **kwargs):
+    def __init__(self, bm25_index, dense_index, k=10, candidates=50, **kwargs):
         super().__init__(**kwargs)
-        self.retriever = BM25Retriever.from_documents(
-            docs, k=10
-        )
+        self.bm25_index = bm25_index
+        self.dense_index = dense_index
+        self.k = k
+        self.candidates = candidates
 
     def forward(self, query: str) -> str:
         assert isinstance(query, str), "Your search query must be a string"
 
-        docs = self.retriever.invoke(
-            query,
-        )
+        # Keyword and embedding matches each rank their own candidates; fuse by rank
+        fused = reciprocal_rank_fusion([
+            [hit.doc_id for hit in self.bm25_index.search(query, self.candidates)],
+            [doc_id for doc_id, _ in self.dense_index.search(query, self.candidates)],
+        ])
+        hits = [self.bm25_index.hit(doc_id, score) for doc_id, score in fused[:self.k]]
         return "\nRetrieved documents:\n" + "".join(
             [
-                f"\n\n===== Document {str(i)} =====\n" + doc.page_content
-                for i, doc in enumerate(docs)
+                f"\n\n===== Document {str(i)} =====\n" + hit.text
+                for i, hit in enumerate(hits)
             ]
         )
 
-retriever_tool = RetrieverTool(docs_processed)
+retriever_tool = RetrieverTool(bm25_index, DenseIndex(DENSE_INDEX_PATH))
 
 import os
 from smolagents import AzureOpenAIServerModel, CodeAgent
+from llm_cache import cached_model
 
 # use Azure OpenAI with gpt-4o-mini
-model = AzureOpenAIServerModel(
+# Repeated prompts are answered from tutorial/data/llm_cache.db; LLM_CACHE_MODE=replay runs fully offline
+model = cached_model(AzureOpenAIServerModel(
     model_id = "gpt-4o-mini",
     azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
     api_key=os.getenv("AZURE_OPENAI_API_KEY"),
     api_version=os.getenv("OPENAI_API_VERSION")    
-)
+))
 
 agent = CodeAgent(
     tools=[retriever_tool], model=model, max_steps=4, verbosity_level=2
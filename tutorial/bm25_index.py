@@ -0,0 +1,183 @@
+"""A BM25 index that is built once, saved to disk, and memory-mapped on load.
+
+The layout is a classic inverted index held in flat numpy arrays:
+
+    vocab.json        term -> term id, the scoring parameters and a version hash of the texts
+    term_offsets.npy  postings of term t are postings_*[term_offsets[t]:term_offsets[t + 1]]
+    postings_docs.npy doc ids, sorted within each term
+    postings_tf.npy   term frequency of the term in that doc
+    doc_lengths.npy   tokens per doc
+    doc_offsets.npy   text of doc d is texts.bin[doc_offsets[d]:doc_offsets[d + 1]] (UTF-8)
+    doc_sources.npy   index into the "sources" list in vocab.json
+    texts.bin
+
+Loading maps the arrays instead of reading them, so a RetrieverTool starts in
+milliseconds and only the postings a query touches are paged in.
+"""
+import hashlib
+import json
+import os
+import re
+import shutil
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Iterable, List, Sequence, Tuple
+
+import numpy as np
+
+TOKEN = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> List[str]:
+    return TOKEN.findall(text.lower())
+
+
+@dataclass
+class Hit:
+    doc_id: int
+    score: float
+    text: str
+    source: str
+
+
+def build_index(docs: Iterable[Tuple[str, str]], path: str, k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+    """Build an index over (text, source) pairs at `path`, replacing any index already there."""
+    vocab = {}
+    sources = {}
+    term_ids, doc_ids, tfs = [], [], []
+    version = hashlib.sha1()
+    doc_lengths, doc_sources, doc_offsets = [], [], [0]
+    path = Path(path)
+    tmp_path = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+
+    with open(tmp_path / "texts.bin", "wb") as texts:
+        for doc_id, (text, source) in enumerate(docs):
+            tokens = tokenize(text)
+            counts = Counter(vocab.setdefault(token, len(vocab)) for token in tokens)
+            term_ids.extend(counts.keys())
+            tfs.extend(counts.values())
+            doc_ids.extend([doc_id] * len(counts))
+            doc_lengths.append(len(tokens))
+            doc_sources.append(sources.setdefault(source, len(sources)))
+            encoded = text.encode("utf-8")
+            version.update(hashlib.sha1(encoded).digest())
+            doc_offsets.append(doc_offsets[-1] + texts.write(encoded))
+
+    term_ids = np.asarray(term_ids, dtype=np.int32)
+    # Group postings by term; a stable sort keeps doc ids ascending within each term
+    order = np.argsort(term_ids, kind="stable")
+    term_offsets = np.zeros(len(vocab) + 1, dtype=np.int64)
+    np.cumsum(np.bincount(term_ids, minlength=len(vocab)), out=term_offsets[1:])
+    doc_lengths = np.asarray(doc_lengths, dtype=np.int32)
+
+    arrays = {
+        "term_offsets": term_offsets,
+        "postings_docs": np.asarray(doc_ids, dtype=np.int32)[order],
+        "postings_tf": np.asarray(tfs, dtype=np.int32)[order],
+        "doc_lengths": doc_lengths,
+        "doc_offsets": np.asarray(doc_offsets, dtype=np.int64),
+        "doc_sources": np.asarray(doc_sources, dtype=np.int32),
+    }
+    for name, array in arrays.items():
+        np.save(tmp_path / f"{name}.npy", array)
+    meta = {
+        "k1": k1,
+        "b": b,
+        "avgdl": float(doc_lengths.mean()) if len(doc_lengths) else 0.0,
+        "sources": list(sources),
+        "version": version.hexdigest(),
+        "vocab": vocab,
+    }
+    (tmp_path / "vocab.json").write_text(json.dumps(meta))
+
+    # Swap the finished index in whole, so an interrupted build never leaves a half-written one
+    old_path = path.with_name(path.name + ".old")
+    if path.exists():
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return BM25Index(path)
+
+
+class DocTexts(Sequence):
+    """Doc texts decoded from the mapped file on access, so passing them on does not copy the corpus."""
+
+    def __init__(self, index: "BM25Index"):
+        self.index = index
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __getitem__(self, doc_id: int) -> str:
+        if not 0 <= doc_id < len(self):
+            raise IndexError(doc_id)
+        return self.index.text(doc_id)
+
+
+class BM25Index:
+    """Okapi BM25 over an index written by build_index, memory-mapped from disk."""
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        meta = json.loads((self.path / "vocab.json").read_text())
+        self.vocab = meta["vocab"]
+        self.sources = meta["sources"]
+        self.k1, self.b, self.avgdl = meta["k1"], meta["b"], meta["avgdl"]
+        # Changes whenever any doc text changes, so derived indexes can tell they are stale
+        self.version = meta["version"]
+        load = lambda name: np.load(self.path / f"{name}.npy", mmap_mode="r")
+        self.term_offsets = load("term_offsets")
+        self.postings_docs = load("postings_docs")
+        self.postings_tf = load("postings_tf")
+        self.doc_lengths = load("doc_lengths")
+        self.doc_offsets = load("doc_offsets")
+        self.doc_sources = load("doc_sources")
+        self.text_bytes = np.memmap(self.path / "texts.bin", dtype=np.uint8, mode="r") if self.doc_offsets[-1] else b""
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return (Path(path) / "vocab.json").exists()
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def text(self, doc_id: int) -> str:
+        start, end = self.doc_offsets[doc_id], self.doc_offsets[doc_id + 1]
+        return bytes(self.text_bytes[start:end]).decode("utf-8")
+
+    def texts(self) -> DocTexts:
+        return DocTexts(self)
+
+    def hit(self, doc_id: int, score: float) -> Hit:
+        return Hit(int(doc_id), float(score), self.text(doc_id), self.sources[self.doc_sources[doc_id]])
+
+    def scores(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """(doc ids, scores) of every doc containing at least one query term, unsorted."""
+        term_ids = [self.vocab[token] for token in set(tokenize(query)) if token in self.vocab]
+        if not term_ids:
+            return np.empty(0, dtype=np.int32), np.empty(0, dtype=np.float32)
+        starts, ends = self.term_offsets[term_ids], self.term_offsets[np.add(term_ids, 1)]
+        doc_freqs = ends - starts
+        idf = np.log1p((len(self) - doc_freqs + 0.5) / (doc_freqs + 0.5))
+
+        # Gather every posting of every query term at once, then sum per doc
+        docs = np.concatenate([self.postings_docs[start:end] for start, end in zip(starts, ends)])
+        tf = np.concatenate([self.postings_tf[start:end] for start, end in zip(starts, ends)]).astype(np.float32)
+        weights = np.repeat(idf, doc_freqs).astype(np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[docs] / self.avgdl)
+        partial = weights * tf * (self.k1 + 1) / (tf + norm)
+
+        matched, inverse = np.unique(docs, return_inverse=True)
+        return matched, np.bincount(inverse, weights=partial).astype(np.float32)
+
+    def search(self, query: str, k: int = 10) -> List[Hit]:
+        """The `k` best-scoring docs for `query`, best first."""
+        docs, scores = self.scores(query)
+        if len(docs) > k:
+            top = np.argpartition(-scores, k - 1)[:k]
+            docs, scores = docs[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return [self.hit(doc_id, score) for doc_id, score in zip(docs[order], scores[order])]
@@ -0,0 +1,158 @@
+"""Bulk-load CSV, Parquet or in-memory rows into a SQLAlchemy table.
+
+Rows are streamed in batches and written with one executemany per batch,
+committing every `commit_rows` rows rather than once per row. Non-unique
+indexes on the table are dropped for the load and built once at the end,
+which is much cheaper than updating them row by row. On SQLite, journaling
+and syncing are relaxed for the duration of the load and restored after.
+"""
+import csv
+import time
+from dataclasses import dataclass
+from datetime import date, datetime, time as time_of_day
+from decimal import Decimal
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Iterator, List
+
+from sqlalchemy import Table, insert
+from sqlalchemy.engine import Engine
+
+BATCH_SIZE = 10_000
+COMMIT_ROWS = 100_000
+# Safe for a load that can simply be rerun if the process dies halfway
+SQLITE_LOAD_PRAGMAS = {"synchronous": "OFF", "journal_mode": "MEMORY", "temp_store": "MEMORY", "cache_size": "-262144"}
+
+Batch = List[Dict]
+
+
+@dataclass
+class LoadReport:
+    table: str
+    rows: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds else 0.0
+
+    def __str__(self) -> str:
+        return f"Loaded {self.rows:,} rows into {self.table} in {self.seconds:.2f}s ({self.rows_per_second:,.0f} rows/s)"
+
+
+def batched(rows: Iterable[Dict], batch_size: int = BATCH_SIZE) -> Iterator[Batch]:
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _converters(table: Table) -> Dict[str, Callable[[str], object]]:
+    """Parse CSV strings into each column's Python type; an empty field is NULL."""
+    converters = {}
+    for column in table.columns:
+        try:
+            python_type = column.type.python_type
+        except NotImplementedError:
+            python_type = str
+        if python_type is bool:
+            parse = lambda value: value.strip().lower() in ("1", "true", "t", "yes")
+        elif python_type in (int, float, Decimal):
+            parse = python_type
+        elif python_type in (date, datetime, time_of_day):
+            # SQLite's date types only accept these objects, not ISO strings
+            parse = python_type.fromisoformat
+        else:
+            parse = str
+        converters[column.name] = lambda value, parse=parse: parse(value) if value != "" else None
+    return converters
+
+
+def csv_batches(path: str, table: Table, batch_size: int = BATCH_SIZE, **reader_options) -> Iterator[Batch]:
+    """Stream a CSV with a header row as typed batches; columns the table does not have are skipped."""
+    converters = _converters(table)
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.DictReader(f, **reader_options)
+        columns = [name for name in reader.fieldnames or [] if name in converters]
+        rows = ({name: converters[name](row[name]) for name in columns} for row in reader)
+        yield from batched(rows, batch_size)
+
+
+def parquet_batches(path: str, table: Table, batch_size: int = BATCH_SIZE) -> Iterator[Batch]:
+    """Stream a Parquet file's row groups as batches, reading only the table's columns."""
+    import pyarrow.parquet as pq
+
+    parquet_file = pq.ParquetFile(path)
+    columns = [name for name in parquet_file.schema_arrow.names if name in table.columns]
+    for record_batch in parquet_file.iter_batches(batch_size=batch_size, columns=columns):
+        yield record_batch.to_pylist()
+
+
+def file_batches(path: str, table: Table, batch_size: int = BATCH_SIZE) -> Iterator[Batch]:
+    suffix = Path(path).suffix.lower()
+    if suffix == ".csv":
+        return csv_batches(path, table, batch_size)
+    if suffix in (".parquet", ".pq"):
+        return parquet_batches(path, table, batch_size)
+    raise ValueError(f"Unsupported file type {suffix!r}; expected .csv or .parquet")
+
+
+def bulk_load(
+    engine: Engine,
+    table: Table,
+    batches: Iterable[Batch],
+    commit_rows: int = COMMIT_ROWS,
+    tune_sqlite: bool = True,
+    defer_indexes: bool = True,
+) -> LoadReport:
+    """Insert `batches` of row dicts into `table` (which must exist) and report the load rate."""
+    start = time.perf_counter()
+    rows = 0
+    # Unique indexes enforce constraints, so they stay in place during the load
+    indexes = [index for index in table.indexes if not index.unique] if defer_indexes else []
+    with engine.connect() as connection:
+        saved: Dict[str, object] = {}
+        try:
+            if tune_sqlite and engine.dialect.name == "sqlite":
+                for pragma, value in SQLITE_LOAD_PRAGMAS.items():
+                    saved[pragma] = connection.exec_driver_sql(f"PRAGMA {pragma}").scalar()
+                    connection.exec_driver_sql(f"PRAGMA {pragma} = {value}")
+            for index in indexes:
+                index.drop(connection, checkfirst=True)
+            connection.commit()
+            try:
+                uncommitted = 0
+                for batch in batches:
+                    if not batch:
+                        continue
+                    # A list of parameter dicts makes this a single executemany
+                    connection.execute(insert(table), batch)
+                    rows += len(batch)
+                    uncommitted += len(batch)
+                    if uncommitted >= commit_rows:
+                        connection.commit()
+                        uncommitted = 0
+                connection.commit()
+            except BaseException:
+                # Batches already committed stay loaded
+                connection.rollback()
+                raise
+            finally:
+                for index in indexes:
+                    index.create(connection, checkfirst=True)
+                connection.commit()
+        finally:
+            # Restored even if rebuilding an index failed
+            connection.rollback()
+            for pragma, value in saved.items():
+                connection.exec_driver_sql(f"PRAGMA {pragma} = {value}")
+            connection.commit()
+    return LoadReport(table.name, rows, time.perf_counter() - start)
+
+
+def load_file(engine: Engine, table: Table, path: str, batch_size: int = BATCH_SIZE, **options) -> LoadReport:
+    """Bulk-load a .csv or .parquet file into `table`; see bulk_load for the options."""
+    return bulk_load(engine, table, file_batches(path, table, batch_size), **options)
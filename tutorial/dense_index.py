@@ -0,0 +1,212 @@
+"""Dense (embedding) retrieval over a memory-mapped, quantized vector matrix.
+
+Chunks are embedded once, in batches on CPU, and stored as a float16 or int8
+matrix that later runs map from disk. Rebuilding after the documents change
+only embeds chunks whose text is new: vectors are looked up by a hash of the
+chunk text in the previous index. An optional IVF (inverted file) index
+clusters the vectors so a query only scores the few closest clusters.
+
+    meta.json        model, dtype, version of the source texts, IVF size
+    embeddings.npy   one L2-normalized row per doc, float16 or int8 (scaled by 127)
+    hashes.npy       SHA-1 of each doc's text, to reuse vectors on rebuild
+    ivf_*.npy        centroids, and doc ids grouped by nearest centroid (optional)
+"""
+import hashlib
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+INT8_SCALE = 127
+# Rows converted to float32 at a time when scoring, to bound memory on large indexes
+BLOCK_ROWS = 65536
+
+Encoder = Callable[[List[str]], np.ndarray]
+
+
+def sentence_encoder(model_name: str = DEFAULT_MODEL) -> Encoder:
+    """Encode with a sentence-transformers model on CPU, loaded on first use."""
+    model = None
+
+    def encode(texts: List[str]) -> np.ndarray:
+        nonlocal model
+        if model is None:
+            from sentence_transformers import SentenceTransformer
+
+            model = SentenceTransformer(model_name, device="cpu")
+        return model.encode(texts, batch_size=len(texts), normalize_embeddings=True, convert_to_numpy=True)
+
+    return encode
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.sha1(text.encode("utf-8")).digest()
+
+
+def quantize(vectors: np.ndarray, dtype: str) -> np.ndarray:
+    if dtype == "int8":
+        return np.clip(np.round(vectors * INT8_SCALE), -INT8_SCALE, INT8_SCALE).astype(np.int8)
+    return vectors.astype(np.float16)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def build_dense_index(
+    texts: Sequence[str],
+    path: str,
+    version: str = "",
+    model_name: str = DEFAULT_MODEL,
+    encoder: Optional[Encoder] = None,
+    dtype: str = "float16",
+    batch_size: int = 64,
+    nlist: int = 0,
+) -> "DenseIndex":
+    """Embed `texts` into an index at `path`, reusing vectors from the index already there.
+
+    `version` identifies the source texts (e.g. BM25Index.version) so callers
+    can check whether the index is current. `nlist` > 0 also builds an IVF
+    index with that many clusters.
+    """
+    if dtype not in ("float16", "int8"):
+        raise ValueError(f"dtype must be float16 or int8, got {dtype!r}")
+    path = Path(path)
+    encoder = encoder or sentence_encoder(model_name)
+    hashes = np.array([text_hash(text) for text in texts], dtype="S20")
+
+    # Vectors from the previous build, if it used the same model and storage type
+    previous: Dict[bytes, int] = {}
+    old = DenseIndex(path) if DenseIndex.exists(path) else None
+    if old is not None and (old.model_name, old.dtype) == (model_name, dtype):
+        previous = {digest: row for row, digest in enumerate(old.hashes)}
+
+    tmp_path = path.with_name(path.name + ".tmp")
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    tmp_path.mkdir(parents=True)
+    missing = [row for row, digest in enumerate(hashes) if digest not in previous]
+    batches = (missing[start:start + batch_size] for start in range(0, len(missing), batch_size))
+    first = next(batches, [])
+    vectors = quantize(normalize(encoder([texts[row] for row in first])), dtype) if first else None
+    dim = vectors.shape[1] if vectors is not None else old.dim if old is not None else 0
+    embeddings = np.lib.format.open_memmap(tmp_path / "embeddings.npy", mode="w+", dtype=dtype, shape=(len(texts), dim))
+    reused = [row for row, digest in enumerate(hashes) if digest in previous]
+    if reused:
+        embeddings[reused] = old.embeddings[[previous[hashes[row]] for row in reused]]
+    if first:
+        embeddings[first] = vectors
+    for rows in batches:
+        embeddings[rows] = quantize(normalize(encoder([texts[row] for row in rows])), dtype)
+    embeddings.flush()
+    np.save(tmp_path / "hashes.npy", hashes)
+    if nlist and len(texts):
+        build_ivf(embeddings, tmp_path, nlist, INT8_SCALE if dtype == "int8" else 1)
+    del embeddings, old
+
+    meta = {"model": model_name, "dtype": dtype, "dim": dim, "version": version, "nlist": nlist, "embedded": len(missing)}
+    (tmp_path / "meta.json").write_text(json.dumps(meta))
+    old_path = path.with_name(path.name + ".old")
+    if path.exists():
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return DenseIndex(path, encoder)
+
+
+def build_ivf(embeddings: np.ndarray, path: Path, nlist: int, scale: float, iterations: int = 10, seed: int = 0):
+    """Spherical k-means over a sample of the vectors, then every doc filed under its nearest centroid."""
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(embeddings))
+    sample = np.sort(rng.choice(len(embeddings), size=min(len(embeddings), 256 * nlist), replace=False))
+    vectors = np.asarray(embeddings[sample], dtype=np.float32) / scale
+    centroids = vectors[rng.choice(len(vectors), size=nlist, replace=False)]
+    for _ in range(iterations):
+        assignment = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        # A cluster that lost all its points keeps its old centroid
+        empty = ~np.bincount(assignment, minlength=nlist).astype(bool)
+        sums[empty] = centroids[empty]
+        centroids = normalize(sums)
+
+    assignment = np.concatenate([
+        np.argmax((np.asarray(embeddings[start:start + BLOCK_ROWS], dtype=np.float32) / scale) @ centroids.T, axis=1)
+        for start in range(0, len(embeddings), BLOCK_ROWS)
+    ])
+    offsets = np.zeros(nlist + 1, dtype=np.int64)
+    np.cumsum(np.bincount(assignment, minlength=nlist), out=offsets[1:])
+    np.save(path / "ivf_centroids.npy", centroids)
+    np.save(path / "ivf_offsets.npy", offsets)
+    np.save(path / "ivf_docs.npy", np.argsort(assignment, kind="stable").astype(np.int32))
+
+
+class DenseIndex:
+    """Cosine-similarity search over an index written by build_dense_index."""
+
+    def __init__(self, path: str, encoder: Optional[Encoder] = None):
+        self.path = Path(path)
+        meta = json.loads((self.path / "meta.json").read_text())
+        self.model_name, self.dtype, self.dim = meta["model"], meta["dtype"], meta["dim"]
+        self.version = meta["version"]
+        self.encoder = encoder or sentence_encoder(self.model_name)
+        self.scale = INT8_SCALE if self.dtype == "int8" else 1
+        self.embeddings = np.load(self.path / "embeddings.npy", mmap_mode="r")
+        self.hashes = np.load(self.path / "hashes.npy", mmap_mode="r")
+        self.ivf = None
+        if meta["nlist"] and (self.path / "ivf_centroids.npy").exists():
+            self.ivf = tuple(np.load(self.path / f"ivf_{name}.npy", mmap_mode="r") for name in ("centroids", "offsets", "docs"))
+
+    @classmethod
+    def exists(cls, path: str) -> bool:
+        return (Path(path) / "meta.json").exists()
+
+    def __len__(self) -> int:
+        return len(self.embeddings)
+
+    def _candidates(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        centroids, offsets, docs = self.ivf
+        probes = np.argsort(-(centroids @ query))[:nprobe]
+        return np.sort(np.concatenate([docs[offsets[probe]:offsets[probe + 1]] for probe in probes]))
+
+    def search(self, query: str, k: int = 10, nprobe: Optional[int] = None) -> List[Tuple[int, float]]:
+        """(doc id, cosine similarity) of the `k` nearest docs, best first.
+
+        With an IVF index and `nprobe`, only docs in the `nprobe` closest
+        clusters are scored; otherwise every doc is.
+        """
+        if not len(self):
+            return []
+        vector = normalize(self.encoder([query]))[0]
+        if self.ivf is not None and nprobe:
+            docs = self._candidates(vector, nprobe)
+            scores = np.asarray(self.embeddings[docs], dtype=np.float32) @ vector
+        else:
+            docs = None
+            scores = np.concatenate([
+                np.asarray(self.embeddings[start:start + BLOCK_ROWS], dtype=np.float32) @ vector
+                for start in range(0, len(self), BLOCK_ROWS)
+            ])
+        scores /= self.scale
+        top = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top], kind="stable")]
+        ids = top if docs is None else docs[top]
+        return [(int(doc_id), float(score)) for doc_id, score in zip(ids, scores[top])]
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[int]], k: int = 60) -> List[Tuple[int, float]]:
+    """Merge ranked lists of doc ids by summing 1 / (k + rank); best first.
+
+    Only ranks are used, so BM25 scores and cosine similarities need no
+    calibration against each other.
+    """
+    fused: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking, start=1):
+            fused[doc_id] = fused.get(doc_id, 0.0) + 1 / (k + rank)
+    return sorted(fused.items(), key=lambda item: -item[1])
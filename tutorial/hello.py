@@ -1,16 +1,18 @@
 import os
 from smolagents import CodeAgent, AzureOpenAIServerModel
+from llm_cache import cached_model
 from dotenv import load_dotenv
 
 
 load_dotenv()
 
-model = AzureOpenAIServerModel(
+# Repeated prompts are answered from tutorial/data/llm_cache.db; LLM_CACHE_MODE=replay runs fully offline
+model = cached_model(AzureOpenAIServerModel(
     model_id = "gpt-4o-mini",
     azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
     api_key=os.getenv("AZURE_OPENAI_API_KEY"),
     api_version=os.getenv("OPENAI_API_VERSION")    
-)
+))
 
 print(os.getenv("OPENAI_API_VERSION"))
 
@@ -0,0 +1,134 @@
+"""Streaming ingestion of the RAG knowledge base into a SQLite chunk store.
+
+Documents are streamed from the dataset one at a time, split lazily, and
+written in batches, so memory holds one batch of chunks rather than several
+copies of the corpus. Each document's text hash is stored with its chunks,
+so a later sync only re-splits documents that are new or changed and drops
+those that disappeared.
+"""
+import hashlib
+import sqlite3
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    key TEXT PRIMARY KEY,
+    hash TEXT NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS chunks (
+    key TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    source TEXT NOT NULL,
+    text TEXT NOT NULL,
+    PRIMARY KEY (key, seq)
+);
+"""
+
+# (key, source, text): key identifies the document across syncs, source is shown with its chunks
+Document = Tuple[str, str, str]
+
+
+@dataclass
+class SyncStats:
+    added: int = 0
+    changed: int = 0
+    removed: int = 0
+    unchanged: int = 0
+    chunks_written: int = 0
+
+    @property
+    def modified(self) -> bool:
+        return bool(self.added or self.changed or self.removed)
+
+
+def stream_documents(dataset: str = "m-ric/huggingface_doc", prefix: str = "huggingface/transformers") -> Iterator[Document]:
+    """Stream documents whose source path starts with `prefix`, without downloading the whole dataset first."""
+    import datasets
+
+    seen = {}
+    for row in datasets.load_dataset(dataset, split="train", streaming=True):
+        path = row["source"]
+        if not path.startswith(prefix):
+            continue
+        # Paths are not guaranteed unique, so number repeats to keep keys stable
+        seen[path] = seen.get(path, 0) + 1
+        key = path if seen[path] == 1 else f"{path}#{seen[path]}"
+        yield key, path.split("/")[1], row["text"]
+
+
+def text_splitter(chunk_size: int = 500, chunk_overlap: int = 50) -> Callable[[str], List[str]]:
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        strip_whitespace=True,
+        separators=["\n\n", "\n", ".", " ", ""],
+    )
+    return splitter.split_text
+
+
+class ChunkStore:
+    def __init__(self, path: str):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def sync(self, documents: Iterable[Document], split: Callable[[str], Iterable[str]], batch_size: int = 1000) -> SyncStats:
+        """Bring the store in line with `documents`, re-splitting only what changed.
+
+        Chunks are written and committed every `batch_size` chunks. Documents
+        not seen in this pass are removed at the end, so `documents` must be
+        the whole corpus.
+        """
+        stats = SyncStats()
+        hashes = dict(self.conn.execute("SELECT key, hash FROM documents"))
+        seen = set()
+        pending: List[Tuple[str, int, str, str]] = []
+
+        def flush():
+            self.conn.executemany("INSERT INTO chunks (key, seq, source, text) VALUES (?, ?, ?, ?)", pending)
+            self.conn.commit()
+            stats.chunks_written += len(pending)
+            pending.clear()
+
+        for key, source, text in documents:
+            seen.add(key)
+            digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+            old = hashes.get(key)
+            if old == digest:
+                stats.unchanged += 1
+                continue
+            if old is None:
+                stats.added += 1
+            else:
+                stats.changed += 1
+                self.conn.execute("DELETE FROM chunks WHERE key = ?", (key,))
+            self.conn.execute("INSERT OR REPLACE INTO documents (key, hash) VALUES (?, ?)", (key, digest))
+            pending.extend((key, seq, source, chunk) for seq, chunk in enumerate(split(text)))
+            if len(pending) >= batch_size:
+                flush()
+        flush()
+
+        removed = [(key,) for key in hashes.keys() - seen]
+        self.conn.executemany("DELETE FROM chunks WHERE key = ?", removed)
+        self.conn.executemany("DELETE FROM documents WHERE key = ?", removed)
+        self.conn.commit()
+        stats.removed = len(removed)
+        return stats
+
+    def chunks(self) -> Iterator[Tuple[str, str]]:
+        """Stream (text, source) for every chunk, in document and chunk order."""
+        yield from self.conn.execute("SELECT text, source FROM chunks ORDER BY key, seq")
@@ -0,0 +1,208 @@
+"""A caching wrapper for smolagents models, with a strict replay mode for offline runs.
+
+Responses are stored in SQLite under a hash of the normalized messages, the
+model id and the generation parameters, so a repeated prompt is answered from
+disk. Entries expire after a TTL and the least recently used are evicted past
+`max_entries`. Modes:
+
+    read_write  serve hits, call the model on a miss and store the answer (default)
+    record      always call the model and overwrite what is stored
+    replay      serve hits only; a miss raises ReplayMissError instead of calling the model
+    off         pass everything through
+
+Set LLM_CACHE_MODE to pick the mode for the tutorial scripts, e.g. replay in
+tests and benchmarks so they never touch the network.
+"""
+import dataclasses
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from enum import Enum
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from smolagents.models import ChatMessage, Model
+
+MODES = ("read_write", "record", "replay", "off")
+DEFAULT_PATH = Path(__file__).parent / "data" / "llm_cache.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS responses (
+    key TEXT PRIMARY KEY,
+    model_id TEXT,
+    response TEXT NOT NULL,
+    input_tokens INTEGER,
+    output_tokens INTEGER,
+    created_at REAL NOT NULL,
+    last_used_at REAL NOT NULL,
+    hits INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_responses_last_used_at ON responses (last_used_at);
+"""
+
+
+class ReplayMissError(RuntimeError):
+    """A replay-mode call whose prompt was never recorded."""
+
+
+def _plain(value):
+    """Enums, dataclasses and other objects as JSON-friendly values, for hashing and storage."""
+    if isinstance(value, Enum):
+        return value.value
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return {key: _plain(item) for key, item in dataclasses.asdict(value).items()}
+    if isinstance(value, dict):
+        return {str(key): _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    return str(value)
+
+
+def normalize_messages(messages: List[Dict]) -> List[Dict]:
+    """Role and text of each message, with text parts joined and surrounding whitespace dropped.
+
+    Messages that only differ in how their content is chunked or padded hash
+    the same; anything that is not text (e.g. images) is kept as is.
+    """
+    normalized = []
+    for message in messages:
+        message = _plain(message)
+        content = message.get("content")
+        if isinstance(content, list) and all(isinstance(part, dict) and part.get("type") == "text" for part in content):
+            content = "".join(part.get("text", "") for part in content)
+        if isinstance(content, str):
+            content = content.strip()
+        normalized.append({"role": message.get("role"), "content": content})
+    return normalized
+
+
+def cache_key(model_id: Optional[str], messages: List[Dict], **parameters) -> str:
+    tools = parameters.pop("tools_to_call_from", None)
+    if tools:
+        parameters["tools"] = sorted([tool.name, tool.description, _plain(tool.inputs)] for tool in tools)
+    payload = {"model": model_id, "messages": normalize_messages(messages), "parameters": _plain(parameters)}
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+class ResponseStore:
+    """SQLite store of serialized responses with TTL expiry and LRU eviction."""
+
+    def __init__(self, path: str = DEFAULT_PATH, ttl: Optional[float] = 30 * 24 * 3600, max_entries: int = 10_000):
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Dict]:
+        now = time.time()
+        with self.lock, self.conn:
+            row = self.conn.execute(
+                "SELECT response, input_tokens, output_tokens, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            if self.ttl is not None and row[3] < now - self.ttl:
+                self.conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+            self.conn.execute("UPDATE responses SET last_used_at = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        return {"response": json.loads(row[0]), "input_tokens": row[1], "output_tokens": row[2]}
+
+    def put(self, key: str, model_id: Optional[str], response: Dict, input_tokens: Optional[int], output_tokens: Optional[int]):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO responses (key, model_id, response, input_tokens, output_tokens, created_at, last_used_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, model_id, json.dumps(response), input_tokens, output_tokens, now, now),
+            )
+            if self.ttl is not None:
+                self.conn.execute("DELETE FROM responses WHERE created_at < ?", (now - self.ttl,))
+            self.conn.execute(
+                "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def close(self):
+        self.conn.close()
+
+
+def _message_to_dict(message: ChatMessage) -> Dict:
+    return {"role": _plain(message.role), "content": message.content, "tool_calls": _plain(message.tool_calls)}
+
+
+def _message_from_dict(data: Dict) -> ChatMessage:
+    if hasattr(ChatMessage, "from_dict"):
+        return ChatMessage.from_dict(data)
+    from smolagents.models import ChatMessageToolCall, ChatMessageToolCallDefinition
+
+    tool_calls = [
+        ChatMessageToolCall(function=ChatMessageToolCallDefinition(**call["function"]), id=call["id"], type=call["type"])
+        for call in data.get("tool_calls") or []
+    ]
+    return ChatMessage(role=data["role"], content=data.get("content"), tool_calls=tool_calls or None)
+
+
+class CachedModel(Model):
+    """Wraps any smolagents Model; everything but the call itself is delegated to the wrapped model."""
+
+    def __init__(self, model: Model, store: Optional[ResponseStore] = None, mode: str = "read_write"):
+        if mode not in MODES:
+            raise ValueError(f"mode must be one of {', '.join(MODES)}, got {mode!r}")
+        super().__init__()
+        self.model = model
+        self.store = store if store is not None or mode == "off" else ResponseStore()
+        self.mode = mode
+        self.model_id = getattr(model, "model_id", None)
+        self.last_input_token_count = None
+        self.last_output_token_count = None
+        self.hits = 0
+        self.misses = 0
+
+    def __getattr__(self, name):
+        # Only reached for attributes this wrapper does not define itself
+        if "model" not in self.__dict__:
+            raise AttributeError(name)
+        return getattr(self.__dict__["model"], name)
+
+    def __call__(self, messages: List[Dict], **kwargs) -> ChatMessage:
+        return self.generate(messages, **kwargs)
+
+    def generate(self, messages: List[Dict], **kwargs) -> ChatMessage:
+        if self.mode == "off":
+            return self._call_model(messages, **kwargs)
+        key = cache_key(self.model_id, messages, **kwargs)
+        if self.mode != "record":
+            cached = self.store.get(key)
+            if cached is not None:
+                self.hits += 1
+                self.last_input_token_count = cached["input_tokens"]
+                self.last_output_token_count = cached["output_tokens"]
+                return _message_from_dict(cached["response"])
+            if self.mode == "replay":
+                raise ReplayMissError(f"No recorded response for this prompt (key {key[:12]}); record it with LLM_CACHE_MODE=read_write first")
+        self.misses += 1
+        message = self._call_model(messages, **kwargs)
+        self.store.put(key, self.model_id, _message_to_dict(message), self.last_input_token_count, self.last_output_token_count)
+        return message
+
+    def _call_model(self, messages: List[Dict], **kwargs) -> ChatMessage:
+        # Newer smolagents versions call generate(); older ones call the model directly
+        call = getattr(self.model, "generate", None) or self.model
+        message = call(messages, **kwargs)
+        self.last_input_token_count = getattr(self.model, "last_input_token_count", None)
+        self.last_output_token_count = getattr(self.model, "last_output_token_count", None)
+        return message
+
+
+def cached_model(model: Model, path: str = DEFAULT_PATH) -> CachedModel:
+    """Wrap `model` in the mode named by LLM_CACHE_MODE (default read_write), storing responses at `path`."""
+    mode = os.getenv("LLM_CACHE_MODE", "read_write")
+    return CachedModel(model, ResponseStore(path) if mode != "off" else None, mode)
@@ -0,0 +1,146 @@
+"""Reflect a database schema once, cache it by fingerprint, and pick the tables relevant to a question.
+
+The fingerprint is a hash of the schema as one cheap query returns it
+(sqlite_master, or information_schema.columns elsewhere), so a warm start
+skips reflection entirely and any DDL change invalidates the cache. Tables
+are ranked for a question by IDF-weighted overlap between the question's
+words and each table's name and column names, which keeps the SQL tool's
+description to a few tables however large the database is.
+"""
+import hashlib
+import json
+import math
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+WORD = re.compile(r"[a-z0-9]+")
+# A word in the table name counts this much more than one in a column name
+TABLE_NAME_WEIGHT = 2.0
+
+_catalogs: Dict[str, "SchemaCatalog"] = {}
+
+
+def words(name: str) -> List[str]:
+    """Lowercase words of a name or question, splitting snake_case and camelCase and dropping a plural s."""
+    spaced = re.sub(r"([a-z])([A-Z])", r"\1 \2", name).lower()
+    return [word[:-1] if len(word) > 3 and word.endswith("s") else word for word in WORD.findall(spaced)]
+
+
+@dataclass
+class TableInfo:
+    name: str
+    columns: List[List[str]]  # [name, type]
+    primary_key: List[str] = field(default_factory=list)
+    foreign_keys: List[List[str]] = field(default_factory=list)  # [column, referred table, referred column]
+
+    def describe(self) -> str:
+        keys = set(self.primary_key)
+        references = {column: f"{table}.{referred}" for column, table, referred in self.foreign_keys}
+        columns = []
+        for name, type_ in self.columns:
+            notes = (" PK" if name in keys else "") + (f" -> {references[name]}" if name in references else "")
+            columns.append(f"{name} {type_}{notes}")
+        return f"{self.name}({', '.join(columns)})"
+
+
+def schema_fingerprint(engine: Engine) -> str:
+    """Hash of the schema from a single query, without reflecting any table."""
+    with engine.connect() as connection:
+        if engine.dialect.name == "sqlite":
+            rows = connection.execute(text("SELECT type, name, sql FROM sqlite_master ORDER BY type, name"))
+        else:
+            rows = connection.execute(text(
+                "SELECT table_schema, table_name, column_name, data_type FROM information_schema.columns "
+                "ORDER BY table_schema, table_name, ordinal_position"
+            ))
+        schema = json.dumps([list(row) for row in rows])
+    return hashlib.sha1(f"{engine.url.render_as_string(hide_password=True)}\n{schema}".encode()).hexdigest()
+
+
+def reflect(engine: Engine) -> Dict[str, TableInfo]:
+    """All tables in the default schema, fetched with the bulk get_multi_* calls rather than table by table."""
+    inspector = inspect(engine)
+    columns = inspector.get_multi_columns()
+    primary_keys = inspector.get_multi_pk_constraint()
+    foreign_keys = inspector.get_multi_foreign_keys()
+    tables = {}
+    for key, table_columns in sorted(columns.items()):
+        name = key[1]
+        tables[name] = TableInfo(
+            name=name,
+            columns=[[column["name"], str(column["type"])] for column in table_columns],
+            primary_key=list(primary_keys.get(key, {}).get("constrained_columns") or []),
+            foreign_keys=[
+                [column, fk["referred_table"], referred]
+                for fk in foreign_keys.get(key, [])
+                for column, referred in zip(fk["constrained_columns"], fk["referred_columns"])
+            ],
+        )
+    return tables
+
+
+class SchemaCatalog:
+    def __init__(self, tables: Dict[str, TableInfo], fingerprint: str = ""):
+        self.tables = tables
+        self.fingerprint = fingerprint
+        self.terms: Dict[str, Dict[str, float]] = {}
+        for name, table in tables.items():
+            weights: Dict[str, float] = {}
+            for column, _ in table.columns:
+                for word in words(column):
+                    weights[word] = max(weights.get(word, 0.0), 1.0)
+            for word in words(name):
+                weights[word] = TABLE_NAME_WEIGHT
+            self.terms[name] = weights
+        document_frequency: Dict[str, int] = {}
+        for weights in self.terms.values():
+            for word in weights:
+                document_frequency[word] = document_frequency.get(word, 0) + 1
+        self.idf = {word: math.log1p(len(tables) / count) for word, count in document_frequency.items()}
+
+    @classmethod
+    def load(cls, engine: Engine, cache_dir: Optional[str] = None) -> "SchemaCatalog":
+        """The catalog for `engine`, reflected only if its schema fingerprint is not cached in memory or on disk."""
+        fingerprint = schema_fingerprint(engine)
+        if fingerprint in _catalogs:
+            return _catalogs[fingerprint]
+        cache_path = Path(cache_dir) / f"{fingerprint}.json" if cache_dir else None
+        if cache_path is not None and cache_path.exists():
+            tables = {name: TableInfo(**info) for name, info in json.loads(cache_path.read_text()).items()}
+        else:
+            tables = reflect(engine)
+            if cache_path is not None:
+                cache_path.parent.mkdir(parents=True, exist_ok=True)
+                cache_path.write_text(json.dumps({name: vars(table) for name, table in tables.items()}))
+        catalog = _catalogs[fingerprint] = cls(tables, fingerprint)
+        return catalog
+
+    def relevant_tables(self, question: str, k: int = 5) -> List[str]:
+        """Up to `k` tables ranked by lexical match with `question`, plus the tables their foreign keys refer to.
+
+        Falls back to the first `k` tables by name when nothing matches.
+        """
+        query = set(words(question))
+        scores = {
+            name: sum(self.idf[word] * weight for word, weight in terms.items() if word in query)
+            for name, terms in self.terms.items()
+        }
+        ranked = [name for name in sorted(scores, key=lambda name: (-scores[name], name)) if scores[name] > 0][:k]
+        if not ranked:
+            return sorted(self.tables)[:k]
+        # Joins need the referenced tables too
+        for name in list(ranked):
+            for _, referred, _ in self.tables[name].foreign_keys:
+                if referred in self.tables and referred not in ranked:
+                    ranked.append(referred)
+        return ranked
+
+    def describe(self, tables: Optional[Iterable[str]] = None) -> str:
+        """One line per table: name(column type [PK] [-> table.column], ...)."""
+        names = self.tables if tables is None else tables
+        return "\n".join(self.tables[name].describe() for name in names)
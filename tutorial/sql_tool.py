@@ -0,0 +1,139 @@
+"""A read-only SQL tool for agents that streams results and caps how much of them reaches the prompt.
+
+Rows are pulled from a server-side cursor in batches with fetchmany and
+stop at a row or byte limit, so `SELECT *` on a large table costs one batch
+of memory and a bounded prompt instead of the whole table. Results are
+printed column by column, which names each column once instead of on
+every row.
+"""
+from typing import Iterable, List, Optional, Sequence
+
+from smolagents import Tool
+from sqlalchemy import create_engine, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import StaticPool
+
+from schema_catalog import SchemaCatalog
+
+MAX_ROWS = 200
+MAX_BYTES = 8000
+BATCH_SIZE = 100
+
+
+def create_pooled_engine(url: str, pool_size: int = 5, max_overflow: int = 10, **kwargs) -> Engine:
+    """An engine whose connections are pooled and checked before reuse.
+
+    An in-memory SQLite database exists only on the connection that created
+    it, so it gets a single shared connection instead of a pool.
+    """
+    if url in ("sqlite://", "sqlite:///:memory:"):
+        return create_engine(url, poolclass=StaticPool, connect_args={"check_same_thread": False}, **kwargs)
+    return create_engine(url, pool_size=pool_size, max_overflow=max_overflow, pool_pre_ping=True, **kwargs)
+
+
+def format_columns(
+    columns: Sequence[str],
+    batches: Iterable[Sequence[Sequence]],
+    max_rows: int = MAX_ROWS,
+    max_bytes: int = MAX_BYTES,
+) -> str:
+    """Lay rows out as one line per column, stopping at `max_rows` rows or about `max_bytes` of output.
+
+    `batches` is consumed lazily and abandoned once a limit is hit, so the
+    rest of the result is never fetched.
+    """
+    values: List[List[str]] = [[] for _ in columns]
+    size = sum(len(column) + 2 for column in columns)
+    count = 0
+    truncated = None
+    for batch in batches:
+        for row in batch:
+            cells = [repr(value) if isinstance(value, str) else str(value) for value in row]
+            row_size = sum(len(cell) + 2 for cell in cells)
+            if count >= max_rows:
+                truncated = f"row limit of {max_rows}"
+            elif size + row_size > max_bytes:
+                truncated = f"size limit of {max_bytes} bytes"
+            if truncated:
+                break
+            for column_values, cell in zip(values, cells):
+                column_values.append(cell)
+            size += row_size
+            count += 1
+        if truncated:
+            break
+
+    lines = [f"{count} row{'s' if count != 1 else ''}" + (f" (truncated at the {truncated}; narrow the query)" if truncated else "")]
+    lines.extend(f"{column}: {', '.join(column_values)}" for column, column_values in zip(columns, values))
+    return "\n".join(lines)
+
+
+def run_query(
+    engine: Engine,
+    query: str,
+    max_rows: int = MAX_ROWS,
+    max_bytes: int = MAX_BYTES,
+    batch_size: int = BATCH_SIZE,
+) -> str:
+    """Run `query` read-only on a pooled connection and format at most `max_rows` rows of its result.
+
+    The statement's transaction is always rolled back, and on SQLite writes are
+    refused outright, since DDL there would otherwise commit on its own.
+    """
+    with engine.connect() as connection:
+        query_only = engine.dialect.name == "sqlite"
+        if query_only:
+            connection.exec_driver_sql("PRAGMA query_only = ON")
+        try:
+            # stream_results asks the driver for a server-side cursor where it has one
+            result = connection.execution_options(stream_results=True, max_row_buffer=batch_size).execute(text(query))
+            try:
+                if not result.returns_rows:
+                    return "The statement returned no rows and was rolled back; this tool is read-only."
+
+                def batches():
+                    while batch := result.fetchmany(batch_size):
+                        yield batch
+
+                return format_columns(list(result.keys()), batches(), max_rows, max_bytes)
+            finally:
+                result.close()
+        finally:
+            connection.rollback()
+            if query_only:
+                # In-memory engines share one connection, so leave it writable for the application
+                connection.exec_driver_sql("PRAGMA query_only = OFF")
+
+
+def describe_tables(engine: Engine, tables: Optional[Iterable[str]] = None) -> str:
+    """Compact descriptions of `tables` (default: all), from the cached schema catalog."""
+    return SchemaCatalog.load(engine).describe(tables)
+
+
+class SqlEngineTool(Tool):
+    name = "sql_engine"
+    description = """Allows you to perform read-only SQL queries on the database; nothing you run is committed. Returns the result column by column, with each column's values in row order.
+Results are capped; if the output says it was truncated, filter or aggregate in SQL instead of selecting everything."""
+    inputs = {"query": {"type": "string", "description": "The query to perform. This should be correct SQL."}}
+    output_type = "string"
+
+    def __init__(
+        self,
+        engine: Engine,
+        schema: Optional[str] = None,
+        max_rows: int = MAX_ROWS,
+        max_bytes: int = MAX_BYTES,
+        batch_size: int = BATCH_SIZE,
+        **kwargs,
+    ):
+        """`schema` describes the tables to offer, e.g. the catalog's tables relevant to the task; default all."""
+        super().__init__(**kwargs)
+        self.engine = engine
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        schema = describe_tables(engine) if schema is None else schema
+        self.description = f"{self.description}\nIt can use the following tables:\n{schema}"
+
+    def forward(self, query: str) -> str:
+        return run_query(self.engine, query, self.max_rows, self.max_bytes, self.batch_size)
@@ -0,0 +1,74 @@
+import math
+import tempfile
+import unittest
+from collections import Counter
+from pathlib import Path
+
+from bm25_index import BM25Index, build_index, tokenize
+
+DOCS = [
+    ("The quick brown fox jumps over the lazy dog.", "fables"),
+    ("A fox, a fox! The fox is quick.", "fables"),
+    ("Transformers use attention; attention is all you need.", "papers"),
+    ("Lazy evaluation delays work until a value is needed.", "papers"),
+    ("Über naïve café tokens stay intact.", "misc"),
+]
+
+
+def brute_force_scores(docs, query, k1=1.5, b=0.75):
+    """Okapi BM25 straight from the formula, one doc at a time."""
+    tokenized = [tokenize(text) for text, _ in docs]
+    avgdl = sum(map(len, tokenized)) / len(tokenized)
+    scores = {}
+    for doc_id, tokens in enumerate(tokenized):
+        counts = Counter(tokens)
+        score = 0.0
+        for term in set(tokenize(query)):
+            if term not in counts:
+                continue
+            df = sum(term in other for other in tokenized)
+            idf = math.log(1 + (len(tokenized) - df + 0.5) / (df + 0.5))
+            tf = counts[term]
+            score += idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(tokens) / avgdl))
+        if score:
+            scores[doc_id] = score
+    return scores
+
+
+class TestBM25Index(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name) / "bm25"
+        self.index = build_index(DOCS, self.path)
+
+    def test_scores_match_brute_force(self):
+        for query in ("quick fox", "lazy attention", "fox fox the", "café", "missing words"):
+            with self.subTest(query=query):
+                docs, scores = self.index.scores(query)
+                expected = brute_force_scores(DOCS, query)
+                self.assertEqual(sorted(docs.tolist()), sorted(expected))
+                for doc_id, score in zip(docs.tolist(), scores.tolist()):
+                    self.assertAlmostEqual(score, expected[doc_id], places=4)
+
+    def test_search_ranks_best_first(self):
+        expected = brute_force_scores(DOCS, "quick lazy fox")
+        hits = self.index.search("quick lazy fox", k=2)
+        self.assertEqual([hit.doc_id for hit in hits], sorted(expected, key=expected.get, reverse=True)[:2])
+        self.assertEqual(hits[0].text, DOCS[hits[0].doc_id][0])
+        self.assertEqual(hits[0].source, "fables")
+
+    def test_reload_from_disk(self):
+        index = BM25Index(self.path)
+        self.assertEqual(len(index), len(DOCS))
+        self.assertEqual(list(index.texts()), [text for text, _ in DOCS])
+        self.assertEqual(index.version, self.index.version)
+
+    def test_version_changes_with_the_texts(self):
+        rebuilt = build_index(DOCS[:-1] + [("Something else entirely.", "misc")], self.path)
+        self.assertNotEqual(rebuilt.version, self.index.version)
+        self.assertFalse(Path(f"{self.path}.tmp").exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,77 @@
+import csv
+import importlib.util
+import os
+import tempfile
+import unittest
+from datetime import date, datetime
+from decimal import Decimal
+
+HAS_SQLALCHEMY = importlib.util.find_spec("sqlalchemy") is not None
+
+if HAS_SQLALCHEMY:
+    from sqlalchemy import Column, Date, DateTime, Integer, MetaData, Numeric, String, Table, create_engine, select
+
+    from bulk_load import csv_batches, load_file
+
+
+@unittest.skipUnless(HAS_SQLALCHEMY, "sqlalchemy is not installed")
+class TestLoadFile(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.engine = create_engine(f"sqlite:///{os.path.join(self.tmp.name, 'load.db')}")
+        self.addCleanup(self.engine.dispose)
+        metadata = MetaData()
+        self.table = Table(
+            "prices", metadata,
+            Column("id", Integer, primary_key=True),
+            Column("ticker", String, unique=True),
+            Column("day", Date),
+            Column("updated_at", DateTime),
+            Column("close", Numeric(10, 2), index=True),
+        )
+        metadata.create_all(self.engine)
+
+    def write_csv(self, rows):
+        path = os.path.join(self.tmp.name, "prices.csv")
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow(["id", "ticker", "day", "updated_at", "close", "ignored"])
+            writer.writerows(rows)
+        return path
+
+    def test_parses_typed_columns(self):
+        path = self.write_csv([
+            [1, "AAPL", "2024-01-02", "2024-01-02T16:00:00", "185.64", "x"],
+            [2, "MSFT", "", "", "", "y"],
+        ])
+        batch, = csv_batches(path, self.table)
+        self.assertEqual(batch[0], {
+            "id": 1, "ticker": "AAPL", "day": date(2024, 1, 2),
+            "updated_at": datetime(2024, 1, 2, 16), "close": Decimal("185.64"),
+        })
+        self.assertEqual(batch[1], {"id": 2, "ticker": "MSFT", "day": None, "updated_at": None, "close": None})
+
+    def test_loads_a_csv_with_a_date_column(self):
+        path = self.write_csv([[i, f"T{i}", f"2024-01-{i:02d}", f"2024-01-{i:02d} 09:30:00", f"{i}.50", ""] for i in range(1, 11)])
+        report = load_file(self.engine, self.table, path, batch_size=4, commit_rows=4)
+        self.assertEqual(report.rows, 10)
+        with self.engine.connect() as connection:
+            rows = connection.execute(select(self.table).order_by(self.table.c.id)).all()
+            self.assertEqual(rows[-1].day, date(2024, 1, 10))
+            self.assertEqual(rows[-1].close, Decimal("10.50"))
+            # The deferred index is rebuilt, the unique one was never dropped, and the PRAGMAs are restored
+            indexes = {row[0] for row in connection.exec_driver_sql("SELECT name FROM sqlite_master WHERE type = 'index'")}
+            self.assertIn("ix_prices_close", indexes)
+            self.assertEqual(connection.exec_driver_sql("PRAGMA synchronous").scalar(), 2)
+
+    def test_unique_index_is_enforced_during_the_load(self):
+        path = self.write_csv([[1, "AAPL", "", "", "", ""], [2, "AAPL", "", "", "", ""]])
+        with self.assertRaises(Exception):
+            load_file(self.engine, self.table, path)
+        with self.engine.connect() as connection:
+            self.assertEqual(connection.exec_driver_sql("PRAGMA synchronous").scalar(), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import hashlib
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import numpy as np
+
+from dense_index import DenseIndex, build_dense_index, reciprocal_rank_fusion
+
+TEXTS = ["apples and pears", "stock market news", "neural networks", "fruit salad recipe", "bond yields rise"]
+
+
+class FakeEncoder:
+    """Deterministic vectors from a hash of each text; records what it was asked to embed."""
+
+    def __init__(self, dim=16):
+        self.dim = dim
+        self.calls = []
+
+    def __call__(self, texts):
+        self.calls.append(list(texts))
+        seeds = [int.from_bytes(hashlib.sha1(text.encode()).digest()[:4], "little") for text in texts]
+        return np.stack([np.random.default_rng(seed).standard_normal(self.dim) for seed in seeds]).astype(np.float32)
+
+    def embedded(self):
+        return [text for call in self.calls for text in call]
+
+
+class TestDenseIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = Path(self.tmp.name) / "dense"
+
+    def embedded_count(self):
+        return json.loads((self.path / "meta.json").read_text())["embedded"]
+
+    def test_rebuild_embeds_only_new_texts(self):
+        encoder = FakeEncoder()
+        first = build_dense_index(TEXTS, self.path, encoder=encoder, batch_size=2)
+        self.assertEqual(sorted(encoder.embedded()), sorted(TEXTS))
+        self.assertEqual(self.embedded_count(), len(TEXTS))
+        original = np.array(first.embeddings)
+        del first
+
+        encoder = FakeEncoder()
+        texts = TEXTS[1:] + ["a brand new text"]
+        index = build_dense_index(texts, self.path, encoder=encoder, batch_size=2)
+        self.assertEqual(encoder.embedded(), ["a brand new text"])
+        self.assertEqual(self.embedded_count(), 1)
+        # Reused rows follow their texts to their new positions
+        np.testing.assert_array_equal(np.array(index.embeddings[:4]), original[1:])
+
+        encoder = FakeEncoder()
+        build_dense_index(texts, self.path, encoder=encoder)
+        self.assertEqual(encoder.calls, [])
+        self.assertEqual(self.embedded_count(), 0)
+
+    def test_changing_dtype_re_embeds(self):
+        build_dense_index(TEXTS, self.path, encoder=FakeEncoder())
+        encoder = FakeEncoder()
+        build_dense_index(TEXTS, self.path, encoder=encoder, dtype="int8")
+        self.assertEqual(len(encoder.embedded()), len(TEXTS))
+
+    def test_search_finds_the_query_text(self):
+        for dtype in ("float16", "int8"):
+            with self.subTest(dtype=dtype):
+                index = build_dense_index(TEXTS, self.path, encoder=FakeEncoder(), dtype=dtype)
+                hits = index.search("neural networks", k=3)
+                self.assertEqual(len(hits), 3)
+                self.assertEqual(hits[0][0], 2)
+                self.assertAlmostEqual(hits[0][1], 1.0, places=2)
+
+    def test_ivf_search_with_every_cluster_matches_exact_search(self):
+        build_dense_index(TEXTS, self.path, encoder=FakeEncoder(), nlist=2)
+        index = DenseIndex(self.path, FakeEncoder())
+        self.assertIsNotNone(index.ivf)
+        self.assertEqual([doc for doc, _ in index.search("bond yields rise", k=3, nprobe=2)],
+                         [doc for doc, _ in index.search("bond yields rise", k=3)])
+
+
+class TestReciprocalRankFusion(unittest.TestCase):
+    def test_docs_ranked_well_in_both_lists_win(self):
+        fused = reciprocal_rank_fusion([[1, 2, 3], [3, 1, 4]], k=60)
+        self.assertEqual([doc for doc, _ in fused], [1, 3, 2, 4])
+        self.assertAlmostEqual(fused[0][1], 1 / 61 + 1 / 62)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from ingest import ChunkStore, SyncStats
+
+
+def split(text):
+    return [part for part in text.split("|") if part]
+
+
+class TestChunkStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = ChunkStore(str(Path(self.tmp.name) / "chunks.db"))
+        self.addCleanup(self.store.close)
+
+    def test_sync_counts(self):
+        documents = [("a", "docs", "one|two"), ("b", "docs", "three"), ("c", "blog", "four|five|six")]
+        self.assertEqual(self.store.sync(documents, split, batch_size=2), SyncStats(added=3, chunks_written=6))
+        self.assertEqual(len(list(self.store.chunks())), 6)
+
+        # Rerunning on the same corpus writes nothing
+        stats = self.store.sync(documents, split)
+        self.assertEqual(stats, SyncStats(unchanged=3))
+        self.assertFalse(stats.modified)
+
+        documents = [("a", "docs", "one|two|2b"), ("c", "blog", "four|five|six"), ("d", "docs", "seven")]
+        stats = self.store.sync(documents, split)
+        self.assertEqual(stats, SyncStats(added=1, changed=1, removed=1, unchanged=1, chunks_written=4))
+        self.assertTrue(stats.modified)
+        self.assertEqual(list(self.store.chunks()), [
+            ("one", "docs"), ("two", "docs"), ("2b", "docs"),
+            ("four", "blog"), ("five", "blog"), ("six", "blog"),
+            ("seven", "docs"),
+        ])
+
+    def test_only_changed_documents_are_split(self):
+        documents = [("a", "docs", "one"), ("b", "docs", "two")]
+        self.store.sync(documents, split)
+        seen = []
+        self.store.sync([("a", "docs", "one"), ("b", "docs", "two|more")], lambda text: seen.append(text) or split(text))
+        self.assertEqual(seen, ["two|more"])
+
+
+if __name__ == "__main__":
+    unittest.main()
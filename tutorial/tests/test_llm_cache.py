@@ -0,0 +1,118 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+
+HAS_SMOLAGENTS = importlib.util.find_spec("smolagents") is not None
+
+if HAS_SMOLAGENTS:
+    from smolagents.models import ChatMessage, Model
+
+    from llm_cache import CachedModel, ReplayMissError, ResponseStore, cache_key
+
+    class FakeModel(Model):
+        """Answers with a numbered reply and counts how often it was really called."""
+
+        def __init__(self):
+            super().__init__(model_id="fake-model")
+            self.calls = 0
+
+        def generate(self, messages, **kwargs):
+            self.calls += 1
+            self.last_input_token_count = 10
+            self.last_output_token_count = 2
+            return ChatMessage(role="assistant", content=f"reply {self.calls}")
+
+
+def user(content):
+    return {"role": "user", "content": content}
+
+
+@unittest.skipUnless(HAS_SMOLAGENTS, "smolagents is not installed")
+class TestCacheKey(unittest.TestCase):
+    def test_ignores_whitespace_and_chunking(self):
+        key = cache_key("m", [user("What is BM25?")])
+        self.assertEqual(cache_key("m", [user("  What is BM25?\n")]), key)
+        chunked = [{"type": "text", "text": "What is "}, {"type": "text", "text": "BM25?"}]
+        self.assertEqual(cache_key("m", [user(chunked)]), key)
+
+    def test_depends_on_what_changes_the_answer(self):
+        key = cache_key("m", [user("What is BM25?")], stop_sequences=["<end>"])
+        self.assertNotEqual(cache_key("m", [user("What is BM25?")], stop_sequences=["<stop>"]), key)
+        self.assertNotEqual(cache_key("m", [user("What is BM25?")]), key)
+        self.assertNotEqual(cache_key("other", [user("What is BM25?")], stop_sequences=["<end>"]), key)
+        self.assertNotEqual(cache_key("m", [user("What is TF-IDF?")], stop_sequences=["<end>"]), key)
+
+
+@unittest.skipUnless(HAS_SMOLAGENTS, "smolagents is not installed")
+class TestResponseStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.path = os.path.join(self.tmp.name, "cache.db")
+
+    def store(self, **options):
+        store = ResponseStore(self.path, **options)
+        self.addCleanup(store.close)
+        return store
+
+    def test_expires_after_ttl(self):
+        store = self.store(ttl=60)
+        store.put("old", "m", {"content": "stale"}, 1, 1)
+        store.put("new", "m", {"content": "fresh"}, 1, 1)
+        store.conn.execute("UPDATE responses SET created_at = created_at - 120 WHERE key = 'old'")
+        self.assertIsNone(store.get("old"))
+        self.assertEqual(store.get("new")["response"], {"content": "fresh"})
+
+    def test_evicts_least_recently_used(self):
+        store = self.store(max_entries=2)
+        store.put("a", "m", {"content": "a"}, 1, 1)
+        store.put("b", "m", {"content": "b"}, 1, 1)
+        # Make "b" the oldest use, then push past the limit
+        store.conn.execute("UPDATE responses SET last_used_at = last_used_at - 10 WHERE key = 'b'")
+        self.assertIsNotNone(store.get("a"))
+        store.put("c", "m", {"content": "c"}, 1, 1)
+        self.assertIsNone(store.get("b"))
+        self.assertIsNotNone(store.get("a"))
+        self.assertIsNotNone(store.get("c"))
+
+
+@unittest.skipUnless(HAS_SMOLAGENTS, "smolagents is not installed")
+class TestCachedModel(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.store = ResponseStore(os.path.join(self.tmp.name, "cache.db"))
+        self.addCleanup(self.store.close)
+
+    def test_serves_repeats_from_the_store(self):
+        fake = FakeModel()
+        model = CachedModel(fake, self.store)
+        first = model([user("hello")], stop_sequences=["<end>"])
+        again = model([user(" hello ")], stop_sequences=["<end>"])
+        self.assertEqual((first.content, again.content), ("reply 1", "reply 1"))
+        self.assertEqual((fake.calls, model.hits, model.misses), (1, 1, 1))
+        self.assertEqual(model.last_input_token_count, 10)
+
+    def test_replay_raises_on_a_miss(self):
+        fake = FakeModel()
+        CachedModel(fake, self.store)([user("recorded")])
+        replay = CachedModel(fake, self.store, mode="replay")
+        self.assertEqual(replay([user("recorded")]).content, "reply 1")
+        with self.assertRaises(ReplayMissError):
+            replay([user("never recorded")])
+        self.assertEqual(fake.calls, 1)
+
+    def test_record_overwrites(self):
+        fake = FakeModel()
+        CachedModel(fake, self.store)([user("hello")])
+        self.assertEqual(CachedModel(fake, self.store, mode="record")([user("hello")]).content, "reply 2")
+        self.assertEqual(CachedModel(fake, self.store)([user("hello")]).content, "reply 2")
+
+    def test_rejects_unknown_modes(self):
+        with self.assertRaises(ValueError):
+            CachedModel(FakeModel(), self.store, mode="sometimes")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,65 @@
+import importlib.util
+import os
+import tempfile
+import unittest
+
+HAS_SQLALCHEMY = importlib.util.find_spec("sqlalchemy") is not None
+
+if HAS_SQLALCHEMY:
+    from sqlalchemy import create_engine, text
+
+    import schema_catalog
+    from schema_catalog import SchemaCatalog, TableInfo, words
+
+
+@unittest.skipUnless(HAS_SQLALCHEMY, "sqlalchemy is not installed")
+class TestSchemaCatalog(unittest.TestCase):
+    def setUp(self):
+        self.catalog = SchemaCatalog({
+            "customers": TableInfo("customers", [["id", "INTEGER"], ["name", "TEXT"]], primary_key=["id"]),
+            "orders": TableInfo(
+                "orders", [["id", "INTEGER"], ["customer_id", "INTEGER"], ["totalPrice", "REAL"]],
+                primary_key=["id"], foreign_keys=[["customer_id", "customers", "id"]],
+            ),
+            "waiters": TableInfo("waiters", [["id", "INTEGER"], ["shift", "TEXT"]]),
+        })
+
+    def test_words(self):
+        self.assertEqual(words("totalPrice"), ["total", "price"])
+        self.assertEqual(words("order_items"), ["order", "item"])
+
+    def test_relevant_tables_include_referenced_tables(self):
+        self.assertEqual(self.catalog.relevant_tables("What is the total price of all orders?", k=1), ["orders", "customers"])
+        self.assertEqual(self.catalog.relevant_tables("Which waiter had the longest shift?", k=1), ["waiters"])
+        # Nothing matches, so fall back to the first tables by name
+        self.assertEqual(self.catalog.relevant_tables("hello", k=2), ["customers", "orders"])
+
+    def test_describe(self):
+        self.assertEqual(
+            self.catalog.describe(["orders"]),
+            "orders(id INTEGER PK, customer_id INTEGER -> customers.id, totalPrice REAL)",
+        )
+
+    def test_load_caches_by_fingerprint(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.addCleanup(schema_catalog._catalogs.clear)
+        engine = create_engine(f"sqlite:///{os.path.join(tmp.name, 'shop.db')}")
+        self.addCleanup(engine.dispose)
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE receipts (id INTEGER PRIMARY KEY, price REAL)"))
+
+        catalog = SchemaCatalog.load(engine, cache_dir=tmp.name)
+        self.assertEqual(list(catalog.tables), ["receipts"])
+        self.assertIs(SchemaCatalog.load(engine), catalog)
+        schema_catalog._catalogs.clear()
+        self.assertEqual(SchemaCatalog.load(engine, cache_dir=tmp.name).describe(), catalog.describe())
+
+        # DDL changes the fingerprint, so the new table is picked up
+        with engine.begin() as connection:
+            connection.execute(text("CREATE TABLE waiters (id INTEGER PRIMARY KEY)"))
+        self.assertEqual(sorted(SchemaCatalog.load(engine, cache_dir=tmp.name).tables), ["receipts", "waiters"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,51 @@
+import importlib.util
+import unittest
+
+HAS_DEPENDENCIES = all(importlib.util.find_spec(name) is not None for name in ("sqlalchemy", "smolagents"))
+
+if HAS_DEPENDENCIES:
+    from sqlalchemy import text
+
+    from sql_tool import create_pooled_engine, format_columns, run_query
+
+
+@unittest.skipUnless(HAS_DEPENDENCIES, "sqlalchemy and smolagents are not installed")
+class TestFormatColumns(unittest.TestCase):
+    def test_stops_at_the_row_limit(self):
+        batches = iter([[(1, "a"), (2, "b")], [(3, "c")], [(4, "d")]])
+        output = format_columns(["id", "name"], batches, max_rows=2)
+        self.assertEqual(output, "2 rows (truncated at the row limit of 2; narrow the query)\nid: 1, 2\nname: 'a', 'b'")
+        # The last batch was never pulled
+        self.assertEqual(next(batches), [(4, "d")])
+
+
+@unittest.skipUnless(HAS_DEPENDENCIES, "sqlalchemy and smolagents are not installed")
+class TestRunQuery(unittest.TestCase):
+    def setUp(self):
+        self.engine = create_pooled_engine("sqlite://")
+        self.addCleanup(self.engine.dispose)
+        with self.engine.begin() as connection:
+            connection.execute(text("CREATE TABLE receipts (id INTEGER PRIMARY KEY, price REAL)"))
+            connection.execute(text("INSERT INTO receipts (price) VALUES (1.5), (2.5)"))
+
+    def count(self):
+        with self.engine.connect() as connection:
+            return connection.execute(text("SELECT COUNT(*) FROM receipts")).scalar()
+
+    def test_select(self):
+        self.assertEqual(run_query(self.engine, "SELECT id, price FROM receipts ORDER BY id"), "2 rows\nid: 1, 2\nprice: 1.5, 2.5")
+
+    def test_writes_are_refused_and_never_reported_as_applied(self):
+        for statement in ("INSERT INTO receipts (price) VALUES (3.5)", "DELETE FROM receipts", "DROP TABLE receipts"):
+            with self.subTest(statement=statement):
+                with self.assertRaises(Exception):
+                    run_query(self.engine, statement)
+                self.assertEqual(self.count(), 2)
+        # The shared in-memory connection is writable again for the application
+        with self.engine.begin() as connection:
+            connection.execute(text("INSERT INTO receipts (price) VALUES (3.5)"))
+        self.assertEqual(self.count(), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
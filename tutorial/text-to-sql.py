@@ -1,18 +1,17 @@
 import os
 from sqlalchemy import (
-    create_engine,
     MetaData,
     Table,
     Column,
     String,
     Integer,
     Float,
-    insert,
-    inspect,
-    text,
 )
+from bulk_load import batched, bulk_load
+from schema_catalog import SchemaCatalog
+from sql_tool import SqlEngineTool, create_pooled_engine, run_query
 
-engine = create_engine("sqlite:///:memory:")
+engine = create_pooled_engine("sqlite:///:memory:")
 metadata_obj = MetaData()
 
 # create receipts SQL table
@@ -33,14 +32,12 @@ rows = [
     {"receipt_id": 3, "customer_name": "Woodrow Wilson", "price": 53.43, "tip": 5.43},
     {"receipt_id": 4, "customer_name": "Margaret James", "price": 21.11, "tip": 1.00},
 ]
-for row in rows:
-    stmt = insert(receipts).values(**row)
-    with engine.begin() as connection:
-        cursor = connection.execute(stmt)
-        
+# One executemany in one transaction; real CSV or Parquet extracts go through bulk_load.load_file
+print(bulk_load(engine, receipts, batched(rows)))
+
 # Create a waiters table
 table_name = "waiters"
-receipts = Table(
+waiters = Table(
     table_name,
     metadata_obj,
     Column("receipt_id", Integer, primary_key=True),
@@ -54,83 +51,57 @@ rows = [
     {"receipt_id": 3, "waiter_name": "Michael Watts"},
     {"receipt_id": 4, "waiter_name": "Margaret James"},
 ]
-for row in rows:
-    stmt = insert(receipts).values(**row)
-    with engine.begin() as connection:
-        cursor = connection.execute(stmt)
+print(bulk_load(engine, waiters, batched(rows)))
 #
 
 updated_description = """Allows you to perform SQL queries on the table. Beware that this tool's output is a string representation of the execution output.
 It can use the following tables:"""
 
-inspector = inspect(engine)
-for table in ["receipts", "waiters"]:
-    columns_info = [(col["name"], col["type"]) for col in inspector.get_columns(table)]
-
-    table_description = f"Table '{table}':\n"
-
-    table_description += "Columns:\n" + "\n".join([f"  - {name}: {col_type}" for name, col_type in columns_info])
-    updated_description += "\n\n" + table_description
+# Reflected once per schema; later calls reuse the catalog until the tables change
+catalog = SchemaCatalog.load(engine)
+updated_description += "\n\n" + catalog.describe()
 
 print(updated_description)
 
-from smolagents import tool, Tool
+from smolagents import tool
 
 @tool
 def sql_engine(query: str) -> str:
     """
-    Allows you to perform SQL queries on the table. Returns a string representation of the result.
-    The table is named 'receipts'. Its description is as follows:
-        Columns:
-        - receipt_id: INTEGER
-        - customer_name: VARCHAR(16)
-        - price: FLOAT
-        - tip: FLOAT
+    Allows you to perform read-only SQL queries on the database; nothing you run is committed. Returns the result column by column.
+    The tables are described below.
 
     Args:
         query: The query to perform. This should be correct SQL.
     """
-    output = ""
-    with engine.connect() as con:
-        rows = con.execute(text(query))
-        for row in rows:
-            output += "\n" + str(row)
-    return output
-
-from smolagents import CodeAgent, HfApiModel, AzureOpenAIServerModel
+    return run_query(engine, query)
 
-class SqlEngineTool(Tool):
-    name = "sql_engine"
-    description = """Allows you to perform SQL queries on the table. Returns a string representation of the result.
-    """
-    inputs = {"query": {"type": "string", "description": "The query to perform. This should be correct SQL."}}
-    output_type = "string"
+sql_engine.description += "\n" + catalog.describe()
 
-    def forward(self, query: str) -> str:
-        output = ""
-        with engine.connect() as con:
-            rows = con.execute(text(query))
-            for row in rows:
-                output += "\n" + str(row)
-        return output
+from smolagents import CodeAgent, HfApiModel, AzureOpenAIServerModel
+from llm_cache import cached_model
 
 
 # use Azure OpenAI with gpt-4o-mini
-model = AzureOpenAIServerModel(
+# Repeated prompts are answered from tutorial/data/llm_cache.db; LLM_CACHE_MODE=replay runs fully offline
+model = cached_model(AzureOpenAIServerModel(
     model_id = "gpt-4o-mini",
     azure_endpoint=os.getenv("AZURE_OPENAI_ENDPOINT"),
     api_key=os.getenv("AZURE_OPENAI_API_KEY"),
     api_version=os.getenv("OPENAI_API_VERSION")    
-)
+))
 # Try using a different model
-#model=HfApiModel("Qwen/Qwen2.5-Coder-32B-Instruct")
+#model=cached_model(HfApiModel("Qwen/Qwen2.5-Coder-32B-Instruct"))
+
+question = "Which waiter got most total money from tips? Show me the waiter's name and amount."
 
+# Only the tables that match the question go into the tool description
 agent = CodeAgent(
-    tools=[SqlEngineTool()],
+    tools=[SqlEngineTool(engine, schema=catalog.describe(catalog.relevant_tables(question)))],
     model=model
     )
 #
 #agent.run("Can you give me the name of the client who got the most expensive receipt?")
 #
 # Instead of showing the waiter's name, it's showing the customer name instead. Update comment to show waiter's name.
-agent.run("Which waiter got most total money from tips? Show me the waiter's name and amount.")
\ No newline at end of file
+agent.run(question)
\ No newline at end of file